@@ -0,0 +1,83 @@
+"""
+Caché de identidad (auth.CacheIdentidad): tokens decodificados y filas de
+usuario reutilizadas entre requests, sobre SQLite en memoria.
+"""
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy.orm import sessionmaker
+
+from votapp_app import auth, models
+from votapp_app.auth import CacheIdentidad, create_jwt_token, get_current_user, invalidar_usuario
+
+
+@pytest.fixture(autouse=True)
+def cache_identidad(monkeypatch):
+    cache_identidad = CacheIdentidad(ttl=60)
+    monkeypatch.setattr(auth, "cache_identidad", cache_identidad)
+    return cache_identidad
+
+
+@pytest.fixture
+def sesiones(db_sqlite, sembrar):
+    """Una sesión nueva por "request" sobre la misma base."""
+    db = db_sqlite("usuarios", "perfil_publico")
+    sembrar.usuarios(db, [1], sexo="F")
+    db.commit()
+    return sessionmaker(bind=db.get_bind())
+
+
+def test_usuario_cacheado_se_adjunta_sin_consultar(sesiones, consultas, cache_identidad):
+    token = create_jwt_token(1)
+    primera = sesiones()
+    with consultas(primera) as sentencias:
+        usuario = get_current_user(primera, token)
+    assert usuario.id == 1 and len(sentencias) == 1
+    assert primera.info["usuario_id"] == 1
+
+    # 👇 otro request: token y fila salen de la caché, merge(load=False) no hace SELECT
+    segunda = sesiones()
+    with consultas(segunda) as sentencias:
+        usuario = get_current_user(segunda, token)
+        assert get_current_user(segunda, token) is usuario   # 👈 identity map de la sesión
+    assert sentencias == []
+    assert usuario in segunda and usuario.sexo == "F"
+    assert cache_identidad.metricas()["hits"] == 1
+
+    # 👇 las relaciones se siguen cargando desde la sesión del request
+    with consultas(segunda) as sentencias:
+        assert usuario.perfil_publico is None
+    assert len(sentencias) == 1
+
+
+def test_invalidar_vuelve_a_leer_la_fila(sesiones, consultas):
+    token = create_jwt_token(1)
+    get_current_user(sesiones(), token)
+
+    db = sesiones()
+    db.get(models.Usuario, 1).sexo = "M"
+    db.commit()
+    invalidar_usuario(1)
+
+    db = sesiones()
+    with consultas(db) as sentencias:
+        assert get_current_user(db, token).sexo == "M"
+    assert len(sentencias) == 1
+
+
+def test_token_invalido_o_expirado(sesiones, cache_identidad):
+    with pytest.raises(HTTPException) as error:
+        get_current_user(sesiones(), "no-es-un-jwt")
+    assert error.value.status_code == 401
+
+    vencido = jwt.encode({"sub": "1", "exp": int(time.time()) - 10}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    with pytest.raises(HTTPException):
+        get_current_user(sesiones(), vencido)
+    assert cache_identidad.metricas()["tokens"] == 0
+
+    # 👇 usuario borrado con token válido
+    with pytest.raises(HTTPException) as error:
+        get_current_user(sesiones(), create_jwt_token(99))
+    assert error.value.detail == "Usuario no encontrado"
@@ -0,0 +1,117 @@
+"""
+Cache de resultados (cache.CacheResultados) y su invalidación por voto:
+POST /surveys/{id}/vote y GET /surveys/{id}/results sobre SQLite.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy.orm import Session
+
+from votapp_app import database, models
+from votapp_app.cache import CacheLocal, CacheResultados
+from votapp_app.utils import resultados
+
+
+@pytest.fixture
+def cache_resultados(monkeypatch):
+    cache_resultados = CacheResultados(CacheLocal(), ttl=60, workers=1)
+    monkeypatch.setattr(resultados, "cache_resultados", cache_resultados)
+    return cache_resultados
+
+
+def test_invalidar_cambia_la_clave(cache_resultados):
+    clave = cache_resultados.clave("web", 1, {"sexo": ["M", "F"], "ciudad": []})
+    assert clave == cache_resultados.clave("web", 1, {"sexo": ["F", "M"]})   # 👈 filtros normalizados
+    cache_resultados.guardar(clave, {"total": 1})
+    assert cache_resultados.obtener(clave) == {"total": 1}
+
+    cache_resultados.invalidar(1)
+    nueva = cache_resultados.clave("web", 1, {"sexo": ["F", "M"]})
+    assert nueva != clave and cache_resultados.obtener(nueva) is None
+    assert cache_resultados.clave("web", 2, None).split(":")[3] == "0"   # 👈 otras encuestas no se tocan
+    assert cache_resultados.metricas()["invalidaciones"] == 1
+
+
+def test_resultados_con_cache_recalcula_tras_invalidar(cache_resultados):
+    db = database.SesionEnHilo(Session())
+    llamadas = []
+
+    def calcular(_, survey_id):
+        llamadas.append(survey_id)
+        return {"llamada": len(llamadas)}
+
+    def leer():
+        return asyncio.run(resultados.resultados_con_cache(db, "movil", 1, None, calcular))
+
+    assert leer() == {"llamada": 1}
+    assert leer() == {"llamada": 1}
+    cache_resultados.invalidar(1)
+    assert leer() == {"llamada": 2}
+
+    # 👇 sesión de quien acaba de escribir: ni lee ni guarda
+    db.sync_session.info["origen_lectura"] = "escritura"
+    assert leer() == {"llamada": 3}
+    db.sync_session.info["origen_lectura"] = "primaria"
+    assert leer() == {"llamada": 2}
+
+
+# -------------------
+# Endpoints
+# -------------------
+@pytest.fixture
+def cliente(db_sqlite, sembrar, cache_resultados, monkeypatch):
+    # 👇 routers/surveys importa cloudinary al cargarse
+    pytest.importorskip("cloudinary")
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+
+    from votapp_app.routers import surveys
+
+    db = db_sqlite(
+        "usuarios", "perfil_publico", "surveys", "survey_targets", "questions", "options", "votes", "vote_tallies",
+        "participaciones", "gamificacion_eventos", "wallets", "wallet_movements", "sponsor_transactions",
+    )
+    sembrar.usuarios(db, [1, 2, 3], rol="user")
+    sembrar.encuesta(db, 1, {1: "sí", 2: "no"})
+    db.commit()
+    motor = db.get_bind()
+    monkeypatch.setattr(surveys, "cache_resultados", cache_resultados)
+
+    async def sesion():
+        sesion = database.SesionEnHilo(Session(bind=motor))
+        try:
+            yield sesion
+        finally:
+            await sesion.close()
+
+    app = FastAPI()
+    app.include_router(surveys.router)
+    app.dependency_overrides[surveys.get_async_db] = sesion
+    app.dependency_overrides[surveys.get_read_async_db] = sesion
+
+    def como(usuario_id):
+        async def usuario(db=Depends(surveys.get_async_db)):
+            return await db.run_sync(lambda s: s.get(models.Usuario, usuario_id))
+
+        app.dependency_overrides[surveys.get_current_user_async] = usuario
+        app.dependency_overrides[surveys.get_current_user_only_async] = usuario
+        return TestClient(app)
+
+    return como
+
+
+def _votos(respuesta):
+    return {o["id"]: o["votes"] for o in respuesta.json()["results"][0]["options"]}
+
+
+def test_voto_invalida_los_resultados_cacheados(cliente, cache_resultados):
+    assert _votos(cliente(1).get("/surveys/1/results")) == {1: 0, 2: 0}
+    assert _votos(cliente(3).get("/surveys/1/results")) == {1: 0, 2: 0}
+    assert cache_resultados.hits == 1
+
+    voto = cliente(2).post("/surveys/1/vote", json={"answers": [{"question_id": 1, "option_id": 2}]})
+    assert voto.status_code == 200
+
+    # 👇 sin invalidar, el segundo GET seguiría sirviendo el conteo viejo del cache
+    assert _votos(cliente(1).get("/surveys/1/results")) == {1: 0, 2: 1}
+    assert cache_resultados.metricas()["invalidaciones"] == 1
@@ -0,0 +1,117 @@
+"""
+Cola de tareas (cola.py): reintentos con backoff, dead-letter y métricas, sobre SQLite.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from votapp_app import cola, models
+
+hechas = []
+
+
+@cola.tarea("prueba_ok")
+def sumar(a, b):
+    hechas.append(a + b)
+
+
+@cola.tarea("prueba_falla", max_intentos=2)
+def fallar():
+    raise RuntimeError("sin red")
+
+
+@pytest.fixture
+def db(db_sqlite):
+    hechas.clear()
+    return db_sqlite("tasks")
+
+
+def _vencer(db):
+    """Adelanta el reloj de los reintentos pendientes."""
+    db.query(models.Tarea).update({models.Tarea.disponible_en: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def test_encolar_y_procesar(db):
+    sumar.encolar(db, a=1, b=2)
+    sumar.encolar(db, retraso=timedelta(hours=1), a=5, b=5)   # todavía no disponible
+    db.commit()
+
+    assert cola.procesar_pendientes(db) == 1
+    assert hechas == [3]
+    assert cola.procesar_pendientes(db) == 0
+
+    hecha = db.query(models.Tarea).filter(models.Tarea.estado == "ok").one()
+    assert hecha.intentos == 1 and hecha.duracion_ms is not None and hecha.worker == cola.INSTANCIA
+
+    with pytest.raises(ValueError):
+        cola.encolar(db, "no_existe")
+
+
+def test_reintentos_y_dead_letter(db):
+    fallar.encolar(db)
+    db.commit()
+
+    assert cola.procesar_pendientes(db) == 1
+    tarea = db.query(models.Tarea).one()
+    assert tarea.estado == "pendiente" and tarea.disponible_en > datetime.utcnow()   # backoff
+    assert cola.procesar_pendientes(db) == 0
+
+    _vencer(db)
+    cola.procesar_pendientes(db)
+    db.refresh(tarea)
+    assert tarea.estado == "muerta" and "sin red" in tarea.error
+
+    assert cola.metricas(db)["por_estado"]["muerta"] == 1
+    assert cola.reintentar_muertas(db) == 1
+    db.refresh(tarea)
+    assert (tarea.estado, tarea.intentos) == ("pendiente", 0)
+
+
+def test_rescata_tareas_de_workers_caidos(db):
+    sumar.encolar(db, a=1, b=1)
+    db.commit()
+    [tarea] = cola.reclamar(db)
+    assert cola.rescatar_vencidas(db) == 0   # reclamada hace un instante: su worker sigue vivo
+    tarea.vence_en = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert cola.rescatar_vencidas(db) == 1
+    assert cola.procesar_pendientes(db) == 1
+    assert hechas == [2]
+    metricas = cola.metricas(db)
+    assert metricas["ultima_hora"]["prueba_ok"]["ok"] == 1
+    assert metricas["atraso_segundos"] == 0
+
+
+def test_vencimiento_por_tipo_y_posicion_en_el_lote(db):
+    @cola.tarea("prueba_larga", timeout=3600)
+    def larga():
+        pass
+
+    cola.encolar(db, "prueba_larga")
+    sumar.encolar(db, a=2, b=2)
+    db.commit()
+    primera, segunda = cola.reclamar(db)
+    # 👇 la segunda espera detrás de la larga: vence cuando podrían haber terminado las dos
+    assert segunda.iniciado_en is None
+    assert segunda.vence_en - primera.vence_en == timedelta(seconds=cola.COLA_TIMEOUT_SEGUNDOS)
+
+    assert cola.ejecutar(db, primera) == "ok"
+    assert cola.ejecutar(db, segunda) == "ok"
+    assert segunda.vence_en - segunda.iniciado_en == timedelta(seconds=cola.COLA_TIMEOUT_SEGUNDOS)
+    assert hechas == [4]
+
+
+def test_no_corre_lo_rescatado_antes_de_empezar(db):
+    sumar.encolar(db, a=3, b=3)
+    db.commit()
+    [tarea] = cola.reclamar(db, worker="viejo")
+    tarea.vence_en = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert cola.rescatar_vencidas(db) == 1
+
+    # 👇 el worker viejo retoma su lote: la tarea ya no es suya y no se duplica
+    assert cola.ejecutar(db, tarea, worker="viejo") is None
+    assert cola.procesar_pendientes(db) == 1
+    assert hechas == [6]
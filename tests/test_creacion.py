@@ -0,0 +1,61 @@
+"""
+Creación masiva de encuestas (utils/creacion.py) sobre SQLite en memoria.
+"""
+import pytest
+
+from votapp_app import models
+from votapp_app.utils.creacion import crear_encuestas
+
+
+@pytest.fixture
+def db(db_sqlite):
+    sesion = db_sqlite("usuarios", "surveys", "survey_targets", "questions", "options")
+    sesion.add(models.Usuario(id=1, nombre="a", correo="a@x", contrasena_hash="x"))
+    sesion.commit()
+    return sesion
+
+
+def test_ids_en_orden_y_segmentacion(db):
+    encuestas = [
+        {
+            "title": f"e{i}",
+            "usuario_id": 1,
+            "segmentacion": {"sexo": ["F", " F ", ""], "ciudad": "Santiago"} if i == 1 else {},
+            "questions": [
+                {"text": f"e{i}p{j}", "options": [{"text": f"e{i}p{j}o{k}"} for k in range(j + 1)]}
+                for j in range(i)
+            ],
+        }
+        for i in range(3)
+    ]
+    creadas = crear_encuestas(db, encuestas)
+    db.commit()
+
+    assert [db.get(models.Survey, c["id"]).title for c in creadas] == ["e0", "e1", "e2"]
+    for c in creadas:
+        for pregunta in c["questions"]:
+            assert db.get(models.Question, pregunta["id"]).text == pregunta["text"]
+            assert [db.get(models.Option, o["id"]).text for o in pregunta["options"]] == [o["text"] for o in pregunta["options"]]
+
+    segmentada = db.get(models.Survey, creadas[1]["id"])
+    assert segmentada.segmentacion["sexo"] == ["F"]
+    assert segmentada.segmentacion["ciudad"] == ["Santiago"]
+    assert segmentada.sexo == '["F"]'
+    assert segmentada.active is True
+    assert creadas[0]["questions"] == []
+
+
+def test_salidas_leen_la_segmentacion_de_survey_targets(db):
+    # 👇 routers/surveys importa cloudinary al cargarse
+    pytest.importorskip("cloudinary")
+    from votapp_app.routers.surveys import to_survey_out
+
+    # 👇 sin columnas JSON legacy (NULL): la segmentación vive solo en survey_targets
+    survey = models.Survey(title="t", usuario_id=1)
+    survey.targets = [models.SurveyTarget(field="ciudad", value="Moca"), models.SurveyTarget(field="sexo", value="F")]
+    db.add(survey)
+    db.commit()
+    assert survey.ciudad is None
+
+    salida = to_survey_out(survey)
+    assert (salida.ciudad, salida.sexo, salida.religion, salida.media_urls) == (["Moca"], ["F"], [], [])
@@ -0,0 +1,132 @@
+"""
+Export de respuestas crudas (utils/exportacion.py y GET /web/{id}/export) sobre SQLite.
+"""
+import csv
+import hashlib
+import io
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from votapp_app import database, models
+from votapp_app.utils import exportacion
+from votapp_app.utils.exportacion import COLUMNAS, csv_texto, lotes_respuestas, ndjson
+
+AYER = datetime(2026, 10, 17, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def sal(monkeypatch):
+    monkeypatch.setattr(exportacion, "EXPORT_SAL", "secreto-de-prueba")
+
+
+@pytest.fixture
+def db(db_sqlite, sembrar):
+    sesion = db_sqlite("usuarios", "surveys", "questions", "options", "votes")
+    sembrar.usuarios(sesion, range(1, 7), demografia=True)
+    sembrar.encuesta(sesion, 1, {1: "sí", 2: "no"})
+    sembrar.votos(sesion, [(u, 1 if u % 3 else 2) for u in range(2, 7)], creado_en=AYER)
+    sesion.commit()
+    return sesion
+
+
+def _filas(db, filtros=None):
+    return [fila for lote in lotes_respuestas(db, 1, filtros or {}) for fila in lote]
+
+
+def test_filtros_y_seudonimos(db):
+    filas = _filas(db)
+    assert [f["vote_id"] for f in filas] == [1, 2, 3, 4, 5]
+    assert len({f["respondente"] for f in filas}) == 5
+    assert all("usuario_id" not in f for f in filas)
+
+    # 👇 mismos filtros que analizar_votos: IN por campo, AND entre campos
+    filtradas = _filas(db, {"sexo": ["F"], "ciudad": ["Moca"]})
+    assert [(f["sexo"], f["ciudad"], f["option"]) for f in filtradas] == [("F", "Moca", "sí")]
+
+
+def test_seudonimos_con_hmac_secreto(db, monkeypatch):
+    seudonimos = [f["respondente"] for f in _filas(db)]
+    # 👇 sin el secreto, hashear cada id candidato no reproduce el seudónimo
+    assert not {hashlib.sha256(f"votapp-export:1:{u}".encode()).hexdigest()[:16] for u in range(2, 7)} & set(seudonimos)
+
+    monkeypatch.setattr(exportacion, "EXPORT_SAL", "otro-secreto")
+    assert not set(seudonimos) & {f["respondente"] for f in _filas(db)}
+
+    monkeypatch.setattr(exportacion, "EXPORT_SAL", None)
+    with pytest.raises(HTTPException) as error:
+        _filas(db)
+    assert error.value.status_code == 503
+
+
+def test_formatos(db):
+    texto = "".join(csv_texto(lotes_respuestas(db, 1, {})))
+    lector = list(csv.DictReader(io.StringIO(texto)))
+    assert len(lector) == 5 and lector[0]["question"] == "¿q?"
+
+    lineas = "".join(ndjson(lotes_respuestas(db, 1, {}))).splitlines()
+    assert [json.loads(linea)["option_id"] for linea in lineas] == [1, 2, 1, 1, 2]
+
+
+def test_csv_vacio_trae_cabecera(db):
+    texto = "".join(csv_texto(lotes_respuestas(db, 1, {"ciudad": ["Ninguna"]})))
+    assert texto.splitlines() == [",".join(COLUMNAS)]
+
+
+# -------------------
+# Endpoint
+# -------------------
+@pytest.fixture
+def cliente(db, monkeypatch):
+    pytest.importorskip("cloudinary")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from votapp_app.routers import surveys
+
+    app = FastAPI()
+    app.include_router(surveys.router)
+    motor = db.get_bind()
+    # 👇 el streaming abre su propia sesión de lectura: la misma base del test
+    monkeypatch.setattr(database.enrutador_lectura, "sesion", lambda usuario_id=None: Session(bind=motor))
+    app.dependency_overrides[surveys.get_read_db] = lambda: db
+
+    def como(usuario_id, rol="user"):
+        usuario = models.Usuario(id=usuario_id, nombre="x", correo="x", contrasena_hash="x", rol=rol)
+        app.dependency_overrides[surveys.get_current_user] = lambda: usuario
+        return TestClient(app)
+
+    return como
+
+
+def test_export_solo_para_el_creador(cliente):
+    assert cliente(2).get("/surveys/web/1/export").status_code == 403
+    assert cliente(2, rol="admin").get("/surveys/web/1/export").status_code == 200
+
+    respuesta = cliente(1).get("/surveys/web/1/export", params={"formato": "csv", "ciudad": "Ninguna"})
+    assert respuesta.status_code == 200
+    assert respuesta.text.splitlines() == [",".join(COLUMNAS)]
+
+
+def test_export_sin_sal_no_empieza(cliente, monkeypatch):
+    monkeypatch.setattr(exportacion, "EXPORT_SAL", None)
+    assert cliente(1).get("/surveys/web/1/export").status_code == 503
+
+
+def test_export_acepta_los_filtros_de_results(cliente):
+    from votapp_app.routers import surveys
+
+    def parametros(ruta):
+        endpoint = next(r for r in surveys.router.routes if getattr(r, "path", None) == ruta)
+        return {p.name for p in endpoint.dependant.query_params} | {
+            p.name for d in endpoint.dependant.dependencies for p in d.query_params
+        }
+
+    filtros = parametros("/surveys/web/{survey_id}/results") - {"crosstab"}
+    assert filtros and filtros <= parametros("/surveys/web/{survey_id}/export")
+
+    respuesta = cliente(1).get("/surveys/web/1/export", params={"sexo": "F", "ciudad": "Moca"})
+    assert [json.loads(linea)["vote_id"] for linea in respuesta.text.splitlines()] == [4]
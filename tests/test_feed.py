@@ -0,0 +1,50 @@
+"""
+Feed personalizado (utils/feed.py): segmentación y "ya votó" resueltos en
+SQL, sobre SQLite en memoria.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from votapp_app import models
+from votapp_app.utils.feed import query_disponibles
+
+AHORA = datetime(2026, 10, 18, 12, 0)
+
+
+@pytest.fixture
+def db(db_sqlite, sembrar):
+    sesion = db_sqlite("usuarios", "surveys", "survey_targets", "questions", "options", "votes")
+    sembrar.usuarios(sesion, [1, 2])
+    sembrar.encuesta(sesion, 1, {1: "sí"})                                          # 👈 sin segmentación
+    sembrar.encuesta(sesion, 2, {2: "sí"}, segmentacion={"ciudad": ["Santiago", "La Vega"]})
+    sembrar.encuesta(sesion, 3, {3: "sí"}, segmentacion={"ciudad": ["Moca"]})
+    sembrar.encuesta(sesion, 4, {4: "sí"}, segmentacion={"sexo": ["f"], "ciudad": ["santiago"]})
+    sembrar.encuesta(sesion, 5, {5: "sí"})
+    sembrar.encuesta(sesion, 6, {6: "sí"}, active=False)
+    sembrar.encuesta(sesion, 7, {7: "sí"}, fecha_expiracion=AHORA - timedelta(hours=1))
+    sembrar.votos(sesion, [(1, 5)], survey_id=5)
+    sesion.commit()
+    return sesion
+
+
+def _disponibles(db, **perfil):
+    usuario = models.Usuario(id=1, **perfil)
+    return sorted(s.id for s in query_disponibles(db, usuario, AHORA))
+
+
+def test_segmentacion_sin_distinguir_mayusculas(db):
+    # 👇 valores del perfil con otra capitalización y espacios: igual que MatcherSegmentacion
+    assert _disponibles(db, sexo="F", ciudad="  SANTIAGO ") == [1, 2, 4]
+    assert _disponibles(db, sexo="M", ciudad="moca") == [1, 3]
+
+
+def test_campo_vacio_solo_ve_encuestas_que_no_filtran_por_el(db):
+    assert _disponibles(db, sexo="F") == [1]
+    assert _disponibles(db, sexo="", ciudad="la vega") == [1, 2]
+
+
+def test_excluye_votadas_inactivas_y_expiradas(db):
+    assert 5 not in _disponibles(db)
+    usuario = models.Usuario(id=2)
+    assert sorted(s.id for s in query_disponibles(db, usuario, AHORA)) == [1, 5]
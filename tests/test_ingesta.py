@@ -0,0 +1,89 @@
+"""
+Pipeline de ingesta (ingesta.py) con un LLM falso sobre SQLite en memoria.
+"""
+import json
+import threading
+import time
+
+import pytest
+
+from votapp_app import models
+from votapp_app.ingesta import Entrada, LimitadorTasa, ingerir
+from votapp_app.llm import ProveedorLLM
+
+LATENCIA = 0.2
+
+
+class LLMFalso(ProveedorLLM):
+    """Proveedor que tarda LATENCIA por llamada y anota qué se le pidió."""
+    nombre = "falso"
+
+    def __init__(self):
+        self.llamadas = []
+        self._lock = threading.Lock()
+
+    def completar(self, prompt):
+        titulo = prompt.split("Título: ")[1].split("\n")[0]
+        with self._lock:
+            self.llamadas.append(titulo)
+        time.sleep(LATENCIA)
+        if titulo == "roto":
+            raise RuntimeError("timeout")
+        return json.dumps({
+            "resumen": f"resumen de {titulo}",
+            "preguntas": [{"text": f"¿{titulo}?", "options": [{"text": "Sí"}, {"text": "No"}]}],
+        })
+
+
+@pytest.fixture
+def db(db_sqlite):
+    sesion = db_sqlite("usuarios", "surveys", "survey_targets", "questions", "options")
+    sesion.add(models.Usuario(id=9999, nombre="sistema", correo="s@x", contrasena_hash="x"))
+    sesion.add(models.Survey(title="vieja", usuario_id=9999, source_url="u0"))
+    sesion.commit()
+    return sesion
+
+
+def _entrada(i, titulo=None):
+    return Entrada(f"u{i}", titulo or f"t{i}", f"texto {i}", {"media_urls": json.dumps([f"img{i}"])})
+
+
+def test_lote_en_una_latencia_y_sin_llm_para_conocidas(db):
+    llm = LLMFalso()
+    entradas = [_entrada(i) for i in range(6)] + [_entrada(3)]   # u0 ya existe, u3 viene repetida
+
+    inicio = time.perf_counter()
+    encuestas = ingerir(
+        db, entradas, llm, "native",
+        hilos=16, limitador=LimitadorTasa(0),
+    )
+    db.commit()
+    duracion = time.perf_counter() - inicio
+
+    assert duracion < 3 * LATENCIA   # secuencial serían 2 * 5 latencias
+    assert sorted(llm.llamadas) == ["t1", "t2", "t3", "t4", "t5"]
+    assert "u0" not in {e["source_url"] for e in encuestas}
+    assert [e["source_url"] for e in encuestas] == ["u1", "u2", "u3", "u4", "u5"]
+
+    guardada = db.get(models.Survey, encuestas[0]["id"])
+    assert guardada.description == "resumen de t1"
+    assert [o.text for o in guardada.questions[0].options] == ["Sí", "No"]
+    assert encuestas[0]["questions"][0]["options"][0]["count"] == 0
+
+
+def test_fallo_de_llm_descarta_solo_esa_entrada(db):
+    llm = LLMFalso()
+    encuestas = ingerir(
+        db, [_entrada(1), _entrada(2, "roto")], llm, "native",
+        limitador=LimitadorTasa(0),
+    )
+    assert [e["source_url"] for e in encuestas] == ["u1"]
+
+
+def test_limitador_respeta_la_tasa():
+    limitador = LimitadorTasa(20, rafaga=2)
+    inicio = time.perf_counter()
+    for _ in range(6):
+        limitador.esperar()
+    # 2 de ráfaga + 4 a 20/s
+    assert time.perf_counter() - inicio >= 4 / 20 - 0.02
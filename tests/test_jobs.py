@@ -0,0 +1,54 @@
+"""
+Runner de jobs (jobs.py): registro de corridas e intervalo, sobre SQLite en memoria.
+"""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from votapp_app import database, jobs, models
+
+
+@pytest.fixture
+def sesiones(db_sqlite, monkeypatch):
+    motor = db_sqlite("job_runs").get_bind()
+    fabrica = sessionmaker(bind=motor)
+    monkeypatch.setattr(database, "engine", motor)
+    monkeypatch.setattr(database, "SessionLocal", fabrica)
+    return fabrica
+
+
+def _corridas(fabrica):
+    db = fabrica()
+    try:
+        return [(c.nombre, c.estado, c.resultado) for c in db.query(models.JobRun).order_by(models.JobRun.id)]
+    finally:
+        db.close()
+
+
+def test_una_vez_por_intervalo(sesiones):
+    llamadas = []
+    job = jobs.Job("prueba", lambda: llamadas.append(1) or {"n": len(llamadas)}, timedelta(hours=1))
+
+    assert jobs.ejecutar(job) == "ok"
+    assert jobs.ejecutar(job) is None             # otro worker/réplica en el mismo intervalo
+    assert jobs.ejecutar(job, forzar=True) == "ok"
+    assert len(llamadas) == 2
+    assert _corridas(sesiones) == [("prueba", "ok", '{"n": 1}'), ("prueba", "ok", '{"n": 2}')]
+
+
+def test_errores_se_registran_sin_propagarse(sesiones):
+    def falla():
+        raise RuntimeError("sin red")
+
+    assert jobs.ejecutar(jobs.Job("roto", falla, timedelta(hours=1))) == "error"
+    # 👇 los jobs sin registro solo dejan rastro cuando fallan
+    assert jobs.ejecutar(jobs.Job("frecuente", lambda: 3, timedelta(seconds=10), registrar=False)) == "ok"
+    assert jobs.ejecutar(jobs.Job("frecuente", falla, timedelta(seconds=10), registrar=False)) == "error"
+
+    db = sesiones()
+    errores = db.query(models.JobRun).filter(models.JobRun.estado == "error").all()
+    assert [c.nombre for c in errores] == ["roto", "frecuente"]
+    assert "sin red" in errores[0].error and errores[0].duracion_ms is not None
+    assert db.query(models.JobRun).count() == 2
+    db.close()
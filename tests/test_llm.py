@@ -0,0 +1,102 @@
+"""
+Extracción tolerante de JSON y resumen + preguntas en una llamada (llm.py).
+"""
+import json
+import time
+
+import pytest
+
+from votapp_app.cache import CacheLLM
+from votapp_app.llm import ExtractorJSON, ProveedorLLM, ProveedorLocal, extraer_json, generar_encuesta
+
+
+class Fragmentado(ProveedorLLM):
+    """Devuelve una respuesta fija en trozos de 7 caracteres y cuenta cuántos se pidieron."""
+
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
+        self.entregados = 0
+
+    def completar(self, prompt):
+        return self.respuesta
+
+    def fragmentos(self, prompt):
+        for i in range(0, len(self.respuesta), 7):
+            self.entregados += 1
+            yield self.respuesta[i:i + 7]
+
+
+def test_extrae_con_cercas_texto_y_coma_final():
+    texto = 'Claro, aquí está:\n```json\n{"resumen": "a {b}", "preguntas": [1, 2,],}\n```\nSaludos'
+    assert extraer_json(texto) == {"resumen": "a {b}", "preguntas": [1, 2]}
+    assert extraer_json("sin json") is None
+
+
+def test_repara_respuesta_cortada():
+    assert extraer_json('{"resumen": "x", "preguntas": [{"text": "¿a?", "options": [{"text": "S') == {
+        "resumen": "x", "preguntas": [{"text": "¿a?", "options": [{"text": "S"}]}],
+    }
+    # 👇 cortada en una clave: se vuelve al último elemento completo
+    assert extraer_json('{"resumen": "x", "pregun') == {"resumen": "x"}
+
+
+def test_extractor_entrega_el_valor_al_cerrarse():
+    extractor = ExtractorJSON()
+    assert extractor.alimentar('[{"a": "]"') is None
+    assert extractor.alimentar('}] y más texto') == [{"a": "]"}]
+
+
+def test_generar_encuesta_corta_el_stream_y_filtra_preguntas():
+    preguntas = [
+        {"text": "¿Bien?", "options": ["Sí", {"text": "No"}]},
+        {"text": "¿Sin opciones?", "options": [{"text": "Sí"}]},
+    ]
+    proveedor = Fragmentado(json.dumps({"resumen": " Corto. ", "preguntas": preguntas}) + " " * 700)
+    resumen, validas = generar_encuesta(proveedor, "t", "texto")
+    assert resumen == "Corto."
+    assert validas == [{"text": "¿Bien?", "options": [{"text": "Sí"}, {"text": "No"}]}]
+    assert proveedor.entregados < 30   # no se consumió la cola de relleno
+
+
+def test_respaldos_solo_para_lo_que_falta():
+    resumen, preguntas = generar_encuesta(Fragmentado("no sé"), "Título", "Texto largo de la noticia")
+    assert resumen == "Texto largo de la noticia"
+    assert preguntas[0]["text"] == "¿Qué opinas de la noticia 'Título'?"
+
+    resumen, preguntas = generar_encuesta(ProveedorLocal(), "T", "Una. Dos. Tres.")
+    assert resumen == "Una. Dos."
+    assert len(preguntas[0]["options"]) == 3
+
+
+def test_cache_evita_llamadas_repetidas(tmp_path):
+    cache = CacheLLM(str(tmp_path / "llm.db"))
+    respuesta = json.dumps({"resumen": "R.", "preguntas": [{"text": "¿a?", "options": ["Sí", "No"]}]})
+    proveedor = Fragmentado(respuesta)
+
+    primera = generar_encuesta(proveedor, "T", "Texto  de\nla noticia", cache=cache)
+    llamadas = proveedor.entregados
+    # 👇 mismo texto con otros espacios: otra corrida, otro origen
+    assert generar_encuesta(proveedor, "T", " Texto de la noticia ", cache=cache) == primera
+    assert proveedor.entregados == llamadas
+
+    # 👇 las respuestas con relleno no se guardan
+    generar_encuesta(Fragmentado("no sé"), "T", "otra", cache=cache)
+    generar_encuesta(Fragmentado("no sé"), "T", "otra", cache=cache)
+    assert cache.metricas()["hits"] == 1
+    assert cache.metricas()["entradas"] == 1
+
+
+def test_cache_vence_y_desaloja_lru():
+    cache = CacheLLM(":memory:", ttl=60, max_entradas=2)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    time.sleep(0.01)
+    assert cache.obtener("a") == 1   # "b" queda como la menos usada
+    cache.guardar("c", 3)
+    assert cache.obtener("b") is None
+    assert (cache.obtener("a"), cache.obtener("c")) == (1, 3)
+
+    vencido = CacheLLM(":memory:", ttl=0)
+    vencido.guardar("a", 1)
+    assert vencido.obtener("a") is None
+    assert vencido.metricas()["desalojos"] == 1
@@ -0,0 +1,56 @@
+"""
+Motor de logros (routers/logros.py): el INSERT ... ON CONFLICT informa si
+de verdad insertó y nada hace commit por su cuenta.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from votapp_app import models
+from votapp_app.routers.logros import MotorLogros, motor_logros, verificar_logros
+
+
+@pytest.fixture
+def db(db_sqlite, sembrar):
+    sesion = db_sqlite("usuarios", "logros", "usuario_logros", "participaciones")
+    sembrar.usuarios(sesion, [1])
+    sesion.execute(insert(models.Logro), [
+        {"id": 1, "nombre": "Primer voto", "metrica": "puntos", "umbral": 1},
+        {"id": 2, "nombre": "Cien puntos", "metrica": "puntos", "umbral": 100},
+        {"id": 3, "nombre": "Embajador"},   # 👈 sin métrica: solo manual
+    ])
+    sesion.commit()
+    motor_logros.recargar()
+    yield sesion
+    motor_logros.recargar()
+
+
+def _logros(db):
+    return db.scalar(select(func.count()).select_from(models.UsuarioLogro))
+
+
+def test_asignar_devuelve_false_si_ya_lo_tenia(db):
+    motor = MotorLogros()
+    assert motor.asignar(db, 1, "Embajador") is True
+    db.commit()
+    assert motor.asignar(db, 1, "Embajador") is False   # 👈 por la caché
+    assert motor.asignar(db, 1, "No existe") is False
+
+    # 👇 otro proceso (caché vacía): el ON CONFLICT no inserta y lo dice
+    assert MotorLogros().asignar(db, 1, "Embajador") is False
+    assert _logros(db) == 1
+
+
+def test_verificar_logros_no_hace_commit(db):
+    perfil = SimpleNamespace(puntos=150, racha_dias=0, nivel=1)
+    assert verificar_logros(db, 1, perfil) == 2
+
+    # 👇 sin commit del llamador, el rollback se lleva los logros
+    db.rollback()
+    assert _logros(db) == 0
+
+    assert verificar_logros(db, 1, perfil) == 2
+    db.commit()
+    assert _logros(db) == 2
+    assert verificar_logros(db, 1, None) == 0
@@ -0,0 +1,87 @@
+"""
+Paginación keyset de utils/paginacion.py sobre SQLite en memoria.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer
+from sqlalchemy.orm import declarative_base
+
+from votapp_app.utils.paginacion import (
+    ParametrosPagina,
+    codificar_cursor,
+    decodificar_cursor,
+    paginar,
+)
+
+Base = declarative_base()
+INICIO = datetime(2025, 1, 1)
+
+
+class Fila(Base):
+    __tablename__ = "filas"
+    id = Column(Integer, primary_key=True)
+    creado_en = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def db(db_sqlite):
+    sesion = db_sqlite(metadata=Base.metadata)
+    # 👇 fechas repetidas de a pares: el id desempata
+    sesion.add_all([Fila(id=i, creado_en=INICIO + timedelta(hours=i // 2)) for i in range(1, 12)])
+    sesion.commit()
+    return sesion
+
+
+def _params(limit, cursor=None, con_total=False):
+    return ParametrosPagina(limit=limit, cursor=cursor, con_total=con_total)
+
+
+def _recorrer(db, columnas, desc=True, limit=4):
+    ids, cursor = [], None
+    while True:
+        pagina = paginar(db.query(Fila), columnas, _params(limit, cursor), desc=desc)
+        ids += [f.id for f in pagina.items]
+        cursor = pagina.siguiente
+        if not cursor:
+            return ids
+
+
+def test_cursor_ida_y_vuelta():
+    valores = [INICIO, 42, "x"]
+    assert decodificar_cursor(codificar_cursor(valores), 3) == valores
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", codificar_cursor([1, 2]), codificar_cursor([[1]])])
+def test_cursor_invalido(cursor):
+    with pytest.raises(HTTPException) as error:
+        decodificar_cursor(cursor, 1)
+    assert error.value.status_code == 400
+
+
+def test_recorre_por_id(db):
+    assert _recorrer(db, [Fila.id]) == list(range(11, 0, -1))
+    assert _recorrer(db, [Fila.id], desc=False) == list(range(1, 12))
+
+
+def test_recorre_por_fecha_e_id(db):
+    assert _recorrer(db, [Fila.creado_en, Fila.id], limit=3) == list(range(11, 0, -1))
+
+
+def test_ultima_pagina_sin_cursor_y_total(db):
+    pagina = paginar(db.query(Fila), [Fila.id], _params(11, con_total=True))
+    assert len(pagina.items) == 11
+    assert pagina.siguiente is None
+    assert pagina.total == 11
+
+
+def test_sin_limit_devuelve_todo(db):
+    # 👇 clientes que no conocen X-Next-Cursor siguen recibiendo la lista completa
+    pagina = paginar(db.query(Fila), [Fila.id], _params(None), desc=False)
+    assert [f.id for f in pagina.items] == list(range(1, 12))
+    assert pagina.siguiente is None
+
+    primera = paginar(db.query(Fila), [Fila.id], _params(4))
+    resto = paginar(db.query(Fila), [Fila.id], _params(None, primera.siguiente))
+    assert [f.id for f in resto.items] == list(range(7, 0, -1))
@@ -0,0 +1,109 @@
+"""
+Pool medido (database.PoolMedido / MetricasPool) y la sesión async de
+respaldo (database.SesionEnHilo), sobre SQLite en archivo.
+"""
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+
+from votapp_app import database, models
+from votapp_app.database import MetricasPool, PoolMedido, SesionEnHilo
+
+
+@pytest.fixture
+def motor(tmp_path):
+    motor = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=PoolMedido, pool_size=1, max_overflow=1, pool_timeout=0.1,
+    )
+    yield motor
+    motor.dispose()
+
+
+def test_pool_mide_checkouts_overflow_y_timeouts(motor):
+    pool = motor.pool
+    primera = motor.connect()
+    segunda = motor.connect()   # 👈 overflow
+    with pytest.raises(PoolTimeoutError):
+        motor.connect()
+
+    estado = pool.estado()
+    assert (estado["size"], estado["max_overflow"], estado["en_uso"], estado["overflow"]) == (1, 1, 2, 1)
+    assert (estado["checkouts"], estado["timeouts"], estado["esperando"]) == (2, 1, 0)
+    assert estado["max_overflow_usado"] == 1 and estado["max_esperando"] == 1
+    assert estado["checkout_ms"]["max"] >= estado["checkout_ms"]["p50"] >= 0
+
+    segunda.close()
+    primera.close()
+    assert (pool.estado()["en_uso"], pool.estado()["libres"]) == (0, 1)
+
+
+def test_percentiles_de_latencia():
+    metricas = MetricasPool(ventana=100)
+    for ms in range(1, 101):
+        metricas.entrar()
+        metricas.salir(ms / 1000, overflow=0)
+    metricas.entrar()
+    metricas.salir(5, overflow=0, resultado="error")
+
+    resumen = metricas.resumen()
+    assert resumen["checkout_ms"] == {"p50": 51.0, "p95": 96.0, "p99": 100.0, "max": 100.0}
+    assert (resumen["checkouts"], resumen["errores"], resumen["esperando"]) == (100, 1, 0)
+
+
+def test_metricas_pool(motor, monkeypatch):
+    monkeypatch.setattr(database, "engine", motor)
+    monkeypatch.setattr(database, "async_engine", None)
+    monkeypatch.setattr(database, "replica_engine", None)
+    monkeypatch.setattr(database, "replica_async_engine", None)
+    motor.connect().close()
+    assert database.metricas_pool() == {"sync": motor.pool.estado()}
+
+    # 👇 un pool sin medición (SQLite en memoria) solo informa su status()
+    monkeypatch.setattr(database, "engine", create_engine("sqlite://"))
+    assert set(database.metricas_pool()["sync"]) == {"status"}
+
+
+# -------------------
+# Sesión async de respaldo
+# -------------------
+def test_sesion_en_hilo_corre_fuera_del_event_loop(db_sqlite, sembrar):
+    motor = db_sqlite("usuarios", archivo=True).get_bind()
+    hilos = []
+
+    def insertar(sesion, usuario_id):
+        hilos.append(threading.get_ident())
+        sembrar.usuarios(sesion, [usuario_id])
+
+    async def request():
+        db = SesionEnHilo(Session(bind=motor))
+        await db.run_sync(insertar, 1)
+        await db.commit()
+        await db.run_sync(insertar, 2)
+        await db.rollback()
+        ids = await db.run_sync(lambda s: s.scalars(select(models.Usuario.id)).all())
+        await db.close()
+        return ids
+
+    assert asyncio.run(request()) == [1]
+    assert threading.get_ident() not in hilos
+
+
+def test_get_async_db_usa_el_respaldo_sin_asyncpg(motor, monkeypatch):
+    # 👇 sin asyncpg (o DATABASE_ASYNC=0) no hay AsyncSessionLocal
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=motor))
+
+    async def abrir():
+        dependencia = database.get_async_db()
+        db = await dependencia.__anext__()
+        resultado = await db.run_sync(lambda s: s.execute(text("SELECT 1")).scalar())
+        await dependencia.aclose()
+        return db, resultado
+
+    db, resultado = asyncio.run(abrir())
+    assert isinstance(db, SesionEnHilo) and resultado == 1
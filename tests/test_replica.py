@@ -0,0 +1,143 @@
+"""
+Enrutamiento a la réplica de lectura con dos archivos SQLite
+(primaria y réplica con datos distintos para saber de cuál se leyó).
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from votapp_app import database  # noqa: E402
+from votapp_app.cache import CacheLocal  # noqa: E402
+
+metadata = MetaData()
+origen = Table("origen", metadata, Column("id", Integer, primary_key=True), Column("nombre", String))
+
+
+def _base(ruta, nombre):
+    motor = create_engine(f"sqlite:///{ruta}")
+    metadata.create_all(motor)
+    with motor.begin() as c:
+        c.execute(insert(origen).values(nombre=nombre))
+    return sessionmaker(bind=motor, autoflush=False)
+
+
+def _leer(db):
+    try:
+        return db.execute(select(origen.c.nombre).order_by(origen.c.id)).scalars().first()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def enrutador(tmp_path, monkeypatch):
+    primaria = _base(tmp_path / "primaria.db", "primaria")
+    replica = _base(tmp_path / "replica.db", "replica")
+    enrutador = database.EnrutadorLectura(primaria, replica, ventana=0.3, marcas=CacheLocal())
+    # 👇 los eventos de Session marcan escrituras en el enrutador del módulo
+    monkeypatch.setattr(database, "enrutador_lectura", enrutador)
+    return enrutador
+
+
+def _escribir(enrutador, usuario_id, confirmar=True):
+    db = enrutador.primaria()
+    db.info["usuario_id"] = usuario_id
+    db.execute(insert(origen).values(nombre="nuevo"))
+    db.commit() if confirmar else db.rollback()
+    db.close()
+
+
+def test_sin_replica_lee_de_primaria(tmp_path):
+    primaria = _base(tmp_path / "p.db", "primaria")
+    enrutador = database.EnrutadorLectura(primaria, None, marcas=CacheLocal())
+    assert _leer(enrutador.sesion(1)) == "primaria"
+
+
+def test_lecturas_van_a_la_replica(enrutador):
+    assert _leer(enrutador.sesion(None)) == "replica"
+    assert _leer(enrutador.sesion(7)) == "replica"
+
+
+def test_read_your_writes(enrutador):
+    _escribir(enrutador, 7)
+
+    assert _leer(enrutador.sesion(7)) == "primaria"   # quien escribió ve su escritura
+    assert _leer(enrutador.sesion(8)) == "replica"    # los demás siguen en la réplica
+
+    time.sleep(0.35)
+    assert _leer(enrutador.sesion(7)) == "replica"    # pasada la ventana vuelve a la réplica
+
+
+def test_rollback_no_marca_escritura(enrutador):
+    _escribir(enrutador, 7, confirmar=False)
+    assert _leer(enrutador.sesion(7)) == "replica"
+
+
+def test_solo_lectura_no_marca_escritura(enrutador):
+    db = enrutador.primaria()
+    db.info["usuario_id"] = 7
+    db.execute(select(origen.c.id)).all()
+    db.commit()
+    db.close()
+    assert _leer(enrutador.sesion(7)) == "replica"
+    assert enrutador.metricas()["lecturas_replica"] == 1
+
+
+# -------------------
+# Cache de resultados con réplica atrasada
+# -------------------
+def _ultimo(db, survey_id):
+    return {"nombre": db.execute(select(origen.c.nombre).order_by(origen.c.id.desc())).scalars().first()}
+
+
+def test_cache_no_guarda_resultados_de_una_replica_atrasada(enrutador, monkeypatch):
+    from votapp_app.cache import CacheResultados
+    from votapp_app.utils import resultados
+
+    cache = CacheResultados(CacheLocal(), ttl=60)
+    monkeypatch.setattr(resultados, "cache_resultados", cache)
+
+    def leer(usuario_id):
+        db = enrutador.sesion_async(usuario_id)
+        try:
+            return asyncio.run(resultados.resultados_con_cache(db, "movil", 1, None, _ultimo))["nombre"]
+        finally:
+            asyncio.run(db.close())
+
+    assert leer(8) == "replica"          # 👈 sin invalidaciones recientes: se cachea
+    assert leer(9) == "replica" and cache.hits == 1
+
+    # 👇 voto de 7: la primaria cambia, la réplica todavía no
+    _escribir(enrutador, 7)
+    cache.invalidar(1)
+
+    assert leer(8) == "replica"          # la réplica atrasada responde...
+    assert cache.obtener(cache.clave("movil", 1)) is None   # ...pero no se guarda
+    assert leer(7) == "nuevo"            # quien votó lee la primaria, sin cache
+    assert leer(7) == "nuevo"
+
+    # 👇 pasada la ventana la réplica ya se puso al día y se vuelve a cachear
+    time.sleep(0.35)
+    with enrutador.replica() as db:
+        db.execute(insert(origen).values(nombre="nuevo"))
+        db.commit()
+    assert leer(8) == "nuevo"
+    assert leer(7) == "nuevo" and cache.obtener(cache.clave("movil", 1)) == {"nombre": "nuevo"}
+
+
+def test_sin_backend_compartido_no_hay_replica_ni_cache_entre_workers():
+    from votapp_app.cache import CacheResultados
+
+    assert database.replica_utilizable("postgresql://replica/votapp", CacheLocal()) is False
+    assert database.replica_utilizable(None, CacheLocal()) is False
+
+    assert CacheResultados(CacheLocal(), workers=1).clave("movil", 1) is not None
+    varios = CacheResultados(CacheLocal(), workers=4)
+    assert varios.clave("movil", 1) is None and varios.metricas()["activo"] is False
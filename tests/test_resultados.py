@@ -0,0 +1,105 @@
+"""
+Conteos de resultados (utils/resultados.py): lectura agregada de
+vote_tallies, su mantenimiento en escritura y la reconciliación desde
+votes (tasks.reconciliar_conteos), sobre SQLite en memoria.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from votapp_app import database, models, tasks
+from votapp_app.utils.resultados import consulta_conteo_votes, contar_votos, resultados_pregunta, sumar_votos
+
+
+@pytest.fixture
+def db(db_sqlite, sembrar):
+    sesion = db_sqlite("usuarios", "surveys", "questions", "options", "votes", "vote_tallies")
+    sembrar.usuarios(sesion, range(1, 5))
+    sembrar.encuesta(sesion, 1, {1: "sí", 2: "no", 3: "ns/nr"})
+    sembrar.encuesta(sesion, 2, {4: "sí"})
+    sesion.commit()
+    return sesion
+
+
+def _tallies(db, filas):
+    db.add_all(
+        models.VoteTally(survey_id=s, question_id=s, option_id=o, count=n) for s, o, n in filas
+    )
+    db.commit()
+
+
+# -------------------
+# Lectura agregada
+# -------------------
+def test_contar_votos_en_una_consulta(db, consultas):
+    _tallies(db, [(1, 1, 2), (1, 2, 1), (2, 4, 5)])
+
+    with consultas(db) as sentencias:
+        conteo = contar_votos(db, [1, 2])
+    assert len(sentencias) == 1
+    assert conteo.por_opcion == {1: 2, 2: 1, 4: 5}
+    assert (conteo.pregunta(1), conteo.pregunta(2), conteo.opcion(3)) == (3, 5, 0)
+
+    with consultas(db) as sentencias:
+        assert contar_votos(db, []).por_opcion == {}
+    assert sentencias == []
+
+
+def test_resultados_pregunta_sin_consultar(db, consultas):
+    _tallies(db, [(1, 1, 2), (1, 2, 1)])
+    pregunta = db.get(models.Question, 1)
+    conteo = contar_votos(db, [1])
+    pregunta.options   # 👈 cargadas antes de medir
+
+    with consultas(db) as sentencias:
+        total, opciones = resultados_pregunta(pregunta, conteo)
+    assert sentencias == []
+    assert total == 3
+    assert [(o.id, votos, porcentaje) for o, votos, porcentaje in opciones] == [(1, 2, 66.7), (2, 1, 33.3), (3, 0, 0.0)]
+
+    total, opciones = resultados_pregunta(db.get(models.Question, 2), contar_votos(db, [2]))
+    assert (total, [p for _, _, p in opciones]) == (0, [0])
+
+
+# -------------------
+# Mantenimiento en escritura y reconciliación
+# -------------------
+def _conteo_tallies(db):
+    return {
+        (s, q, o): n for s, q, o, n in db.execute(
+            select(models.VoteTally.survey_id, models.VoteTally.question_id, models.VoteTally.option_id, models.VoteTally.count)
+        )
+    }
+
+
+def _votar(db, sembrar, votos, survey_id=1):
+    """Como registrar_voto: inserta los votos y los suma a vote_tallies en la misma transacción."""
+    sembrar.votos(db, votos, survey_id)
+    sumar_votos(db, [SimpleNamespace(survey_id=survey_id, question_id=survey_id, option_id=o) for _, o in votos])
+    db.commit()
+
+
+def test_sumar_votos_acumula_sobre_la_fila_existente(db, sembrar):
+    _votar(db, sembrar, [(1, 1), (2, 1), (3, 2)])
+    _votar(db, sembrar, [(4, 1)])
+    _votar(db, sembrar, [(1, 4)], survey_id=2)
+
+    assert _conteo_tallies(db) == {(1, 1, 1): 3, (1, 1, 2): 1, (2, 2, 4): 1}
+    assert _conteo_tallies(db) == {(s, q, o): n for s, q, o, n in db.execute(consulta_conteo_votes())}
+    sumar_votos(db, [])   # 👈 sin votos no hay INSERT
+
+
+def test_reconciliar_reconstruye_solo_las_encuestas_pedidas(db, sembrar, monkeypatch):
+    _votar(db, sembrar, [(1, 1), (2, 2)])
+    _votar(db, sembrar, [(1, 4)], survey_id=2)
+    # 👇 conteos desviados en ambas encuestas
+    db.query(models.VoteTally).filter(models.VoteTally.option_id.in_([1, 4])).update({"count": 9})
+    db.commit()
+
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    tasks.reconciliar_conteos(survey_ids=[1])
+
+    db.expire_all()
+    assert _conteo_tallies(db) == {(1, 1, 1): 1, (1, 1, 2): 1, (2, 2, 4): 9}
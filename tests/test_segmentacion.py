@@ -0,0 +1,71 @@
+"""
+Matcher de segmentación compilado (utils/segmentacion.py) y su cache por
+(survey_id, segmentacion_version).
+"""
+from collections import OrderedDict
+from datetime import datetime
+
+import pytest
+
+from votapp_app import models
+from votapp_app.utils import segmentacion
+from votapp_app.utils.feed import query_disponibles
+from votapp_app.utils.segmentacion import compilar_matcher, cumple_segmentacion, match_many
+
+
+@pytest.fixture(autouse=True)
+def cache_vacio(monkeypatch):
+    # 👇 cada test tiene su base con los mismos ids: sin matchers de otro test
+    monkeypatch.setattr(segmentacion, "_cache", OrderedDict())
+
+
+@pytest.fixture
+def db(db_sqlite, sembrar):
+    sesion = db_sqlite("usuarios", "surveys", "survey_targets", "questions", "options", "votes")
+    sembrar.usuarios(sesion, [1])
+    sembrar.encuesta(sesion, 1, {1: "sí"})
+    sembrar.encuesta(sesion, 2, {2: "sí"}, segmentacion={"ciudad": ["Santiago", "Moca"]})
+    sembrar.encuesta(sesion, 3, {3: "sí"}, segmentacion={"sexo": ["F"], "ocupacion": ["Docente"]})
+    sesion.commit()
+    return sesion
+
+
+def _usuario(**perfil):
+    return models.Usuario(id=1, **perfil)
+
+
+def test_matcher_normaliza_y_solo_guarda_campos_con_filtro(db):
+    matcher = compilar_matcher(db.get(models.Survey, 3))
+    assert dict(matcher.filtros) == {"sexo": {"f"}, "ocupacion": {"docente"}}
+    assert matcher.cumple(_usuario(sexo="f", ocupacion="DOCENTE"))
+    assert not matcher.cumple(_usuario(sexo="F"))
+    assert compilar_matcher(db.get(models.Survey, 1)).sin_filtros
+
+
+def test_cache_por_version(db):
+    survey = db.get(models.Survey, 2)
+    matcher = compilar_matcher(survey)
+    assert compilar_matcher(survey) is matcher
+
+    # 👇 asignar_segmentacion sube la versión: la entrada vieja deja de usarse
+    survey.asignar_segmentacion({"ciudad": ["La Vega"]})
+    db.commit()
+    nuevo = compilar_matcher(survey)
+    assert nuevo is not matcher
+    assert segmentacion._cache[(2, survey.segmentacion_version)] is nuevo
+    assert cumple_segmentacion(survey, _usuario(ciudad="la vega"))
+    assert not cumple_segmentacion(survey, _usuario(ciudad="Santiago"))
+
+
+@pytest.mark.parametrize("perfil", [
+    {},
+    {"ciudad": "MOCA"},
+    {"sexo": "F", "ocupacion": "docente", "ciudad": "Santiago"},
+    {"sexo": "M", "ocupacion": "docente"},
+])
+def test_matcher_y_filtro_sql_coinciden(db, perfil):
+    usuario = _usuario(**perfil)
+    surveys = db.query(models.Survey).order_by(models.Survey.id).all()
+    en_memoria = [s.id for s in match_many(surveys, usuario)]
+    en_sql = sorted(s.id for s in query_disponibles(db, usuario, datetime(2026, 10, 18)))
+    assert en_memoria == en_sql
@@ -0,0 +1,155 @@
+"""
+Snapshots Parquet incrementales (utils/snapshots.py) sobre un SQLite en archivo.
+"""
+import glob
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from votapp_app import models  # noqa: E402
+from votapp_app.utils import snapshots  # noqa: E402
+from votapp_app.utils.snapshots import analizar_votos_cerrada, analizar_votos_snapshot, exportar_snapshots  # noqa: E402
+
+AYER = datetime.utcnow() - timedelta(days=1)
+
+
+@pytest.fixture
+def db(db_sqlite, sembrar):
+    sesion = db_sqlite(
+        "usuarios", "surveys", "survey_targets", "questions", "options", "votes", "vote_tallies", "participaciones",
+        "sponsor_transactions", archivo=True,
+    )
+    sembrar.usuarios(sesion, range(1, 7), demografia=True)
+    sembrar.encuesta(sesion, 1, {1: "sí", 2: "no"})
+    sembrar.encuesta(sesion, 2, {3: "sí"})
+    sesion.commit()
+    return sesion
+
+
+def _votar(db, usuarios, survey_id=1, creado_en=AYER):
+    db.execute(insert(models.Vote), [
+        {"survey_id": survey_id, "question_id": survey_id, "option_id": 1 if survey_id == 1 and u % 3 else (2 if survey_id == 1 else 3),
+         "usuario_id": u, "creado_en": creado_en}
+        for u in usuarios
+    ])
+    db.commit()
+
+
+def test_incremental_y_consultas(db, tmp_path):
+    destino = str(tmp_path / "snap")
+    _votar(db, [1, 2, 3])
+    _votar(db, [1], survey_id=2)
+    _votar(db, [4], creado_en=datetime.utcnow())   # dentro del margen: aún no se exporta
+
+    marcas = exportar_snapshots(db, destino)
+    assert marcas["votes"] == 4
+    assert analizar_votos_snapshot(1, directorio=destino)["total_votes"] == 3
+
+    # 👇 segunda corrida: solo lo nuevo y ya viejo; el voto reciente entra cuando sale del margen
+    db.query(models.Vote).filter(models.Vote.id == 5).update({"creado_en": AYER})
+    db.commit()
+    _votar(db, [5, 6])
+    marcas = exportar_snapshots(db, destino)
+    assert marcas["votes"] == 7
+
+    resultado = analizar_votos_snapshot(1, directorio=destino)
+    assert resultado["total_votes"] == 6
+    assert resultado["total_participants"] == 6
+    assert resultado["por_opcion"] == {1: 4, 2: 2}
+    assert resultado["votos_por_fecha"] == {str(AYER.date()): 6}
+    assert sorted((s["segment"], s["votes"]) for s in resultado["segmentos"]["sexo"]) == [("F", 3), ("M", 3)]
+
+    filtrado = analizar_votos_snapshot(1, {"ciudad": ["Moca"]}, crosstab="sexo", directorio=destino)
+    assert filtrado["total_votes"] == 3
+    assert sorted(filtrado["crosstab"]) == [(1, "F", 1), (1, "M", 1), (2, "M", 1)]
+
+
+def test_corrida_repetida_no_duplica(db, tmp_path):
+    destino = str(tmp_path / "snap")
+    _votar(db, [1, 2, 3])
+    exportar_snapshots(db, destino)
+
+    # 👇 simula una corrida cortada antes de guardar la marca
+    os.remove(os.path.join(destino, "_marcas.json"))
+    exportar_snapshots(db, destino)
+    assert analizar_votos_snapshot(1, directorio=destino)["total_votes"] == 3
+
+
+def _archivos(destino, survey_id):
+    return glob.glob(os.path.join(destino, "votes", f"survey_id={survey_id}", "*.parquet"))
+
+
+def test_compacta_particiones_con_muchos_archivos(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_MAX_ARCHIVOS", 2)
+    destino = str(tmp_path / "snap")
+    for usuario in (1, 2, 3, 4):
+        _votar(db, [usuario])
+        exportar_snapshots(db, destino)
+        assert len(_archivos(destino, 1)) <= 2
+
+    assert analizar_votos_snapshot(1, directorio=destino)["total_votes"] == 4
+    assert not os.path.exists(os.path.join(destino, "_compactacion"))
+
+
+def test_recupera_compactacion_cortada(db, tmp_path):
+    destino = str(tmp_path / "snap")
+    _votar(db, [1, 2, 3])
+    exportar_snapshots(db, destino)
+
+    # 👇 corte entre los dos rename: la partición vieja apartada, la nueva lista
+    particion = os.path.join(destino, "votes", "survey_id=1")
+    trabajo = os.path.join(destino, "_compactacion", "votes")
+    os.makedirs(trabajo)
+    shutil.copytree(particion, os.path.join(trabajo, "survey_id=1.nueva"))
+    os.rename(particion, os.path.join(trabajo, "survey_id=1.viejo"))
+
+    exportar_snapshots(db, destino)
+    assert analizar_votos_snapshot(1, directorio=destino)["total_votes"] == 3
+    assert not os.path.exists(os.path.join(destino, "_compactacion"))
+
+
+def _conteos(db):
+    """vote_tallies desde votes, como tasks.reconciliar_conteos."""
+    db.query(models.VoteTally).delete()
+    db.execute(insert(models.VoteTally).from_select(
+        ["survey_id", "question_id", "option_id", "count"],
+        select(models.Vote.survey_id, models.Vote.question_id, models.Vote.option_id, func.count())
+        .group_by(models.Vote.survey_id, models.Vote.question_id, models.Vote.option_id),
+    ))
+    db.commit()
+
+
+def test_resultados_de_encuesta_cerrada_desde_snapshot(db, tmp_path, monkeypatch):
+    destino = str(tmp_path / "snap")
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", destino)
+    monkeypatch.setattr(snapshots, "SNAPSHOT_RESULTADOS", True)
+    _votar(db, [1, 2, 3, 4])
+    _conteos(db)
+    survey = db.get(models.Survey, 1)
+    survey.active, survey.closed_reason, survey.closed_at = False, "expired", AYER
+    db.commit()
+    exportar_snapshots(db, destino)
+
+    resultado = analizar_votos_cerrada(db, survey, {"ciudad": ["Moca"]}, "sexo")
+    assert resultado is not None
+    assert resultado == analizar_votos_snapshot(1, {"ciudad": ["Moca"]}, "sexo", destino)
+
+    # 👇 un voto tardío que el snapshot no tiene: se va a la base
+    _votar(db, [5])
+    _conteos(db)
+    assert analizar_votos_cerrada(db, survey, {}, None) is None
+
+    # 👇 abierta o pausada, o con el flag apagado: siempre la base
+    exportar_snapshots(db, destino)
+    assert analizar_votos_cerrada(db, survey, {}, None)["total_votes"] == 5
+    survey.closed_reason = "paused"
+    assert analizar_votos_cerrada(db, survey, {}, None) is None
+    survey.closed_reason = "expired"
+    monkeypatch.setattr(snapshots, "SNAPSHOT_RESULTADOS", False)
+    assert analizar_votos_cerrada(db, survey, {}, None) is None
@@ -3,12 +3,18 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from typing import Optional
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 
-from .database import SessionLocal
+from .cache import CacheLocal
+from .database import enrutador_lectura, get_async_db, get_db
 from .models import Usuario
 
+import hashlib
 import logging
+import os
+import time
 logger = logging.getLogger(__name__)
 
 # -------------------
@@ -22,6 +28,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60   # ✅ mismo tiempo que en users.py
 
 # OAuth2: lee el token del header Authorization
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
+# Igual pero sin 401 si falta: para rutas públicas que leen de la réplica
+oauth2_scheme_opcional = OAuth2PasswordBearer(tokenUrl="/api/users/login", auto_error=False)
 
 # -------------------
 # Funciones de contraseña
@@ -44,14 +52,139 @@ def create_jwt_token(user_id: int):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 # -------------------
-# Dependencia DB
+# Caché de identidad
 # -------------------
-def get_db():
-    db = SessionLocal()
+class CacheIdentidad:
+    """
+    Caché por proceso con TTL corto para autenticar sin ir a la base:
+
+      - tokens: sha256(token) → (usuario_id, exp), para no decodificar
+        el JWT en cada request,
+      - usuarios: (usuario_id, versión) → columnas de Usuario (sin
+        relaciones). invalidar(usuario_id) sube la versión y las entradas
+        viejas dejan de leerse.
+
+    Dentro del request la identidad la da la sesión: get_current_user usa
+    el mismo get_db que los routers (FastAPI lo resuelve una vez por
+    request), así que el usuario queda en el identity map de esa sesión
+    y volver a pedirlo con db.get no consulta la base.
+    """
+
+    def __init__(self, ttl: int = 60, max_entradas: int = 4096):
+        self.ttl = ttl
+        self.tokens = CacheLocal(max_entradas)
+        self.usuarios = CacheLocal(max_entradas)
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+
+    @staticmethod
+    def _huella(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def token(self, token: str):
+        return self.tokens.get(self._huella(token))
+
+    def guardar_token(self, token: str, usuario_id: int, exp) -> None:
+        ttl = self.ttl
+        if exp is not None:
+            # 👇 nunca más allá de la expiración del JWT
+            ttl = min(ttl, int(exp - time.time()))
+        if ttl > 0:
+            self.tokens.set(self._huella(token), (usuario_id, exp), ttl)
+
+    def clave_usuario(self, usuario_id: int) -> str:
+        # La versión se lee ANTES de ir a la base (igual que cache_resultados)
+        return f"usuario:{usuario_id}:{self.usuarios.contador(f'usuario:v:{usuario_id}')}"
+
+    def usuario(self, clave: str):
+        datos = self.usuarios.get(clave)
+        if datos is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return datos
+
+    def guardar_usuario(self, clave: str, usuario: Usuario) -> None:
+        columnas = {c.key: getattr(usuario, c.key) for c in inspect(Usuario).column_attrs}
+        self.usuarios.set(clave, columnas, self.ttl)
+
+    def invalidar(self, usuario_id: int) -> None:
+        self.usuarios.incr(f"usuario:v:{usuario_id}")
+        self.invalidaciones += 1
+
+    def metricas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "invalidaciones": self.invalidaciones,
+            "tokens": self.tokens.tamano(),
+            "usuarios": self.usuarios.tamano(),
+        }
+
+
+cache_identidad = CacheIdentidad(
+    ttl=int(os.getenv("AUTH_CACHE_TTL", "60")),
+    max_entradas=int(os.getenv("AUTH_CACHE_MAX", "4096")),
+)
+
+
+def invalidar_usuario(usuario_id: int) -> None:
+    """Llamar después del commit de cualquier cambio a la fila del usuario."""
+    cache_identidad.invalidar(usuario_id)
+
+
+def _decodificar_token(token: str) -> tuple:
+    """(usuario_id, exp) del token; 401 si es inválido o expiró."""
+    cacheado = cache_identidad.token(token)
+    if cacheado is not None:
+        usuario_id, exp = cacheado
+        if exp is None or exp > time.time():
+            return usuario_id, exp
+
     try:
-        yield db
-    finally:
-        db.close()
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id: str = payload.get("sub")
+        exp: int = payload.get("exp")
+        logger.debug(f"Payload decodificado: sub={user_id}, exp={exp}")
+        if user_id is None:
+            logger.error("Token sin sub")
+            raise HTTPException(status_code=401, detail="Token inválido")
+    except JWTError as e:
+        logger.error(f"Error decodificando token: {e}")
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    cache_identidad.guardar_token(token, int(user_id), exp)
+    return int(user_id), exp
+
+
+def _cargar_usuario(db: Session, usuario_id: int):
+    """
+    Usuario adjunto a `db`: del identity map si ya está, de la caché de
+    identidad si hay entrada vigente (sin consulta) o de la base.
+    """
+    usuario = db.identity_map.get(inspect(Usuario).identity_key_from_primary_key((usuario_id,)))
+    if usuario is not None:
+        return usuario
+
+    clave = cache_identidad.clave_usuario(usuario_id)
+    datos = cache_identidad.usuario(clave)
+    if datos is not None:
+        # 👇 se reconstruye como "detached" y merge(load=False) lo adjunta
+        # sin SELECT; las relaciones (perfil_publico, billetera…) siguen
+        # cargándose de forma perezosa desde esta sesión
+        usuario = Usuario(**datos)
+        make_transient_to_detached(usuario)
+        return db.merge(usuario, load=False)
+
+    usuario = db.get(Usuario, usuario_id)
+    if usuario is not None:
+        cache_identidad.guardar_usuario(clave, usuario)
+    return usuario
+
 
 # -------------------
 # Obtener usuario actual (solo header)
@@ -64,27 +197,76 @@ def get_current_user(
         logger.error("Token ausente")
         raise HTTPException(status_code=401, detail="Token requerido")
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        exp: int = payload.get("exp")
-        logger.info(f"Payload decodificado: sub={user_id}, exp={exp}")
-        if user_id is None:
-            logger.error("Token sin sub")
-            raise HTTPException(status_code=401, detail="Token inválido")
-    except JWTError as e:
-        logger.error(f"Error decodificando token: {e}")
-        raise HTTPException(status_code=401, detail="Token inválido")
+    user_id, _ = _decodificar_token(token)
 
-    usuario = db.query(Usuario).filter(Usuario.id == int(user_id)).first()
+    usuario = _cargar_usuario(db, user_id)
     if usuario is None:
         logger.error(f"Usuario con id {user_id} no encontrado en DB")
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
 
-    logger.info(f"Usuario autenticado OK: {usuario.id}")
+    db.info["usuario_id"] = usuario.id   # 👈 para marcar sus escrituras (réplica)
+    logger.debug(f"Usuario autenticado OK: {usuario.id}")
     return usuario
 
 
+async def get_current_user_async(
+    db=Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Igual que get_current_user para endpoints async def: el usuario queda
+    en la sesión de get_async_db y se usa dentro de db.run_sync(...).
+    """
+    if not token:
+        logger.error("Token ausente")
+        raise HTTPException(status_code=401, detail="Token requerido")
+
+    user_id, _ = _decodificar_token(token)
+
+    usuario = await db.run_sync(_cargar_usuario, user_id)
+    if usuario is None:
+        logger.error(f"Usuario con id {user_id} no encontrado en DB")
+        raise HTTPException(status_code=401, detail="Usuario no encontrado")
+
+    db.sync_session.info["usuario_id"] = usuario.id
+    return usuario
+
+
+# -------------------
+# Sesiones de solo lectura (réplica)
+# -------------------
+def _usuario_del_token(token: Optional[str]):
+    """id del usuario si el token es válido; None si no hay o no sirve."""
+    if not token:
+        return None
+    try:
+        return _decodificar_token(token)[0]
+    except HTTPException:
+        return None
+
+
+def get_read_db(token: Optional[str] = Depends(oauth2_scheme_opcional)):
+    """
+    Sesión para endpoints de solo lectura: réplica, salvo que el usuario
+    haya escrito hace poco (ver database.EnrutadorLectura). No escribir
+    con esta sesión. La autenticación sigue siendo get_current_user.
+    """
+    db = enrutador_lectura.sesion(_usuario_del_token(token))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_read_async_db(token: Optional[str] = Depends(oauth2_scheme_opcional)):
+    """Versión async de get_read_db (endpoints que usan db.run_sync)."""
+    db = enrutador_lectura.sesion_async(_usuario_del_token(token))
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 
 # -------------------
 # Validación de roles
@@ -104,5 +286,10 @@ def get_current_user_only(usuario: Usuario = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Acceso restringido a usuarios")
     return usuario
 
+async def get_current_user_only_async(usuario: Usuario = Depends(get_current_user_async)):
+    if usuario.rol != "user":
+        raise HTTPException(status_code=403, detail="Acceso restringido a usuarios")
+    return usuario
+
 
 
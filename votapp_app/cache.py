@@ -0,0 +1,365 @@
+# votapp_app/cache.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("cache")
+
+try:
+    import redis   # opcional: solo si RESULTS_CACHE_URL apunta a un Redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+# -------------------
+# Backends
+# -------------------
+class CacheLocal:
+    """LRU en memoria con TTL por entrada. Seguro entre hilos."""
+
+    nombre = "local"
+
+    def __init__(self, max_entradas: int = 1024):
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+        self._contadores: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave: str):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            valor, expira = item
+            if expira is not None and expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave: str, valor, ttl: Optional[int] = None):
+        expira = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def contador(self, clave: str) -> int:
+        return self._contadores.get(clave, 0)
+
+    def incr(self, clave: str) -> int:
+        # 👇 los contadores (versiones) no entran al LRU: si se desalojaran,
+        # la versión volvería a 0 y podría leerse una entrada vieja
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + 1
+            return self._contadores[clave]
+
+    def tamano(self) -> int:
+        return len(self._datos)
+
+
+class CacheRedis:
+    """
+    Backend compatible con Redis (redis-py, fakeredis o cualquier cliente
+    con get/setex/set/incr). Los valores viajan como JSON.
+    """
+
+    nombre = "redis"
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def get(self, clave: str):
+        crudo = self.cliente.get(clave)
+        return json.loads(crudo) if crudo is not None else None
+
+    def set(self, clave: str, valor, ttl: Optional[int] = None):
+        crudo = json.dumps(valor, default=str)
+        if ttl:
+            self.cliente.setex(clave, ttl, crudo)
+        else:
+            self.cliente.set(clave, crudo)
+
+    def contador(self, clave: str) -> int:
+        return int(self.cliente.get(clave) or 0)
+
+    def incr(self, clave: str) -> int:
+        return int(self.cliente.incr(clave))
+
+    def tamano(self) -> Optional[int]:
+        try:
+            return int(self.cliente.dbsize())
+        except Exception:
+            return None
+
+
+def _backend_desde_entorno():
+    url = os.getenv("RESULTS_CACHE_URL")
+    if url and redis is not None:
+        try:
+            cliente = redis.Redis.from_url(url, socket_timeout=0.5)
+            cliente.ping()
+            return CacheRedis(cliente)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis no disponible ({e}), usando cache local")
+    elif url:
+        logger.warning("⚠️ RESULTS_CACHE_URL definido pero el paquete redis no está instalado")
+    return CacheLocal(int(os.getenv("RESULTS_CACHE_MAX", "1024")))
+
+
+# -------------------
+# Cache de resultados
+# -------------------
+class CacheResultados:
+    """
+    Resultados por (vista, encuesta, filtros). Cada encuesta tiene un
+    número de versión que forma parte de la clave: invalidar() lo
+    incrementa y las entradas viejas simplemente dejan de leerse
+    (el LRU/TTL las elimina después).
+    """
+
+    def __init__(self, backend=None, ttl: Optional[int] = None, workers: Optional[int] = None):
+        self.backend = backend or _backend_desde_entorno()
+        self.ttl = ttl if ttl is not None else int(os.getenv("RESULTS_CACHE_TTL", "30"))
+        # 👇 en un CacheLocal las versiones son por proceso: con varios workers
+        # un voto solo invalidaría el cache del worker que lo atendió
+        workers = workers if workers is not None else int(os.getenv("WEB_CONCURRENCY", "1"))
+        self.activo = self.backend.nombre != "local" or workers <= 1
+        if not self.activo:
+            logger.warning("⚠️ WEB_CONCURRENCY > 1 sin RESULTS_CACHE_URL (Redis): cache de resultados desactivado")
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+        self.errores = 0
+
+    def _version(self, survey_id: int) -> int:
+        return self.backend.contador(f"resultados:v:{survey_id}")
+
+    def clave(self, vista: str, survey_id: int, filtros: Optional[dict] = None) -> Optional[str]:
+        """
+        Clave de la entrada con la versión actual de la encuesta. Se calcula
+        una vez, ANTES de consultar la base: si un voto llega mientras se
+        calculan los resultados, se guardan bajo la versión vieja y no
+        quedan visibles. Devuelve None si el backend no responde (sin cache).
+        """
+        if not self.activo:
+            return None
+        normalizados = {k: sorted(v) for k, v in (filtros or {}).items() if v}
+        huella = hashlib.sha1(json.dumps(normalizados, sort_keys=True).encode()).hexdigest()[:16]
+        try:
+            version = self._version(survey_id)
+        except Exception as e:
+            self.errores += 1
+            logger.warning(f"⚠️ Error leyendo versión de cache: {e}")
+            return None
+        return f"resultados:{vista}:{survey_id}:{version}:{huella}"
+
+    def obtener(self, clave: Optional[str]):
+        if clave is None:
+            self.misses += 1
+            return None
+        try:
+            valor = self.backend.get(clave)
+        except Exception as e:
+            # 👇 el cache nunca tumba el endpoint: se calcula contra la base
+            self.errores += 1
+            logger.warning(f"⚠️ Error leyendo cache: {e}")
+            valor = None
+        if valor is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return valor
+
+    def guardar(self, clave: Optional[str], valor):
+        if clave is None:
+            return
+        try:
+            self.backend.set(clave, valor, self.ttl)
+        except Exception as e:
+            self.errores += 1
+            logger.warning(f"⚠️ Error escribiendo cache: {e}")
+
+    def invalidar(self, survey_id: int):
+        try:
+            self.backend.incr(f"resultados:v:{survey_id}")
+            # 👇 cuándo: una réplica puede no tener aún lo que causó la invalidación
+            self.backend.set(f"resultados:t:{survey_id}", time.time(), 3600)
+            self.invalidaciones += 1
+        except Exception as e:
+            self.errores += 1
+            logger.warning(f"⚠️ Error invalidando cache de encuesta {survey_id}: {e}")
+
+    def estable(self, survey_id: int, segundos: float) -> bool:
+        """
+        True si la encuesta no se invalidó en los últimos `segundos` (la
+        ventana de retraso de la réplica): solo entonces una lectura de la
+        réplica puede guardarse bajo la versión actual.
+        """
+        try:
+            ultima = self.backend.get(f"resultados:t:{survey_id}")
+        except Exception as e:
+            self.errores += 1
+            logger.warning(f"⚠️ Error leyendo invalidación de cache: {e}")
+            return False
+        return ultima is None or time.time() - float(ultima) >= segundos
+
+    def metricas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend.nombre,
+            "activo": self.activo,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "invalidaciones": self.invalidaciones,
+            "errores": self.errores,
+            "entradas": self.backend.tamano(),
+        }
+
+
+cache_resultados = CacheResultados()
+
+
+# -------------------
+# Cache de respuestas LLM
+# -------------------
+class CacheLLM:
+    """
+    Respuestas del LLM en un archivo SQLite, compartido entre procesos y
+    reinicios: la misma noticia (RSS, YouTube, reintentos) no vuelve a
+    llamar al modelo. La clave es un hash de modelo + versión del prompt
+    + texto normalizado. Cada entrada vence a los `ttl` segundos y, pasado
+    `max_entradas`, se desalojan las menos usadas recientemente.
+    """
+
+    def __init__(self, ruta: str, ttl: int = 30 * 24 * 3600, max_entradas: int = 5000):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self.escrituras = 0
+        self.desalojos = 0
+        self.errores = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _conexion(self):
+        # 👇 se abre al primer uso: importar el módulo no crea el archivo
+        if self._conn is None:
+            if self.ruta != ":memory:" and os.path.dirname(self.ruta):
+                os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            self._conn = sqlite3.connect(self.ruta, timeout=5, check_same_thread=False, isolation_level=None)
+            if self.ruta != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                "clave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL NOT NULL, usado REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_respuestas_usado ON respuestas (usado)")
+        return self._conn
+
+    @staticmethod
+    def clave(modelo: str, version_prompt, *textos: str) -> str:
+        """Mayúsculas se respetan; espacios y formas Unicode no cuentan."""
+        normalizados = [" ".join(unicodedata.normalize("NFC", t or "").split()) for t in textos]
+        crudo = json.dumps([modelo, version_prompt, normalizados], ensure_ascii=False)
+        return hashlib.sha256(crudo.encode()).hexdigest()
+
+    def obtener(self, clave: str):
+        ahora = time.time()
+        try:
+            with self._lock:
+                conn = self._conexion()
+                fila = conn.execute(
+                    "SELECT valor FROM respuestas WHERE clave = ? AND expira > ?", (clave, ahora)
+                ).fetchone()
+                if fila is not None:
+                    conn.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (ahora, clave))
+        except sqlite3.Error as e:
+            # 👇 sin cache se llama al modelo, pero la ingesta sigue
+            self.errores += 1
+            logger.warning(f"⚠️ Error leyendo cache LLM: {e}")
+            fila = None
+        if fila is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(fila[0])
+
+    def guardar(self, clave: str, valor):
+        ahora = time.time()
+        try:
+            with self._lock:
+                conn = self._conexion()
+                conn.execute(
+                    "INSERT OR REPLACE INTO respuestas (clave, valor, expira, usado) VALUES (?, ?, ?, ?)",
+                    (clave, json.dumps(valor, ensure_ascii=False), ahora + self.ttl, ahora),
+                )
+                self.escrituras += 1
+                self._desalojar(conn, ahora)
+        except sqlite3.Error as e:
+            self.errores += 1
+            logger.warning(f"⚠️ Error escribiendo cache LLM: {e}")
+
+    def _desalojar(self, conn, ahora: float):
+        borradas = conn.execute("DELETE FROM respuestas WHERE expira <= ?", (ahora,)).rowcount
+        sobrantes = conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0] - self.max_entradas
+        if sobrantes > 0:
+            borradas += conn.execute(
+                "DELETE FROM respuestas WHERE clave IN "
+                "(SELECT clave FROM respuestas ORDER BY usado LIMIT ?)", (sobrantes,)
+            ).rowcount
+        self.desalojos += borradas
+
+    def tamano(self) -> Optional[int]:
+        try:
+            with self._lock:
+                return self._conexion().execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def metricas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "ruta": self.ruta,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "escrituras": self.escrituras,
+            "desalojos": self.desalojos,
+            "errores": self.errores,
+            "entradas": self.tamano(),
+        }
+
+
+def _ruta_cache_llm() -> str:
+    # 👇 fuera del directorio de trabajo: ~/.cache/votapp (o $XDG_CACHE_HOME/votapp)
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "votapp", "llm_cache.db")
+
+
+def _cache_llm_desde_entorno() -> Optional[CacheLLM]:
+    ruta = os.getenv("LLM_CACHE_PATH", _ruta_cache_llm())
+    if not ruta:
+        return None   # 👈 LLM_CACHE_PATH="" desactiva el cache
+    return CacheLLM(
+        ruta,
+        ttl=int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600))),
+        max_entradas=int(os.getenv("LLM_CACHE_MAX", "5000")),
+    )
+
+
+cache_llm = _cache_llm_desde_entorno()
@@ -0,0 +1,325 @@
+# votapp_app/cola.py
+"""
+Cola de tareas durable sobre la tabla `tasks` de Postgres:
+
+    @tarea()                                   # registra el handler
+    def reconciliar_conteos(survey_ids=None): ...
+
+    reconciliar_conteos.encolar(db, survey_ids=[3])   # en la transacción del llamador
+    python -m votapp_app.cola                         # un worker; escalar = más procesos
+
+Los workers reclaman lotes con SELECT ... FOR UPDATE SKIP LOCKED, así que
+varios procesos no se pisan ni se esperan. Las fallas se reintentan con
+backoff exponencial; agotados los intentos la tarea queda como muerta.
+
+Quién encola: POST /admin/tareas y el código que llame a .encolar(). Los
+jobs programados (jobs.py) siguen llamando a las funciones de tasks.py
+directamente: el advisory lock y job_runs ya los corren una vez por
+intervalo, y así no dependen de que haya un worker levantado.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from votapp_app import database, models
+
+logger = logging.getLogger("cola")
+
+COLA_LOTE = int(os.getenv("COLA_LOTE", "10"))
+COLA_ESPERA_SEGUNDOS = float(os.getenv("COLA_ESPERA_SEGUNDOS", "1"))
+COLA_TIMEOUT_SEGUNDOS = int(os.getenv("COLA_TIMEOUT_SEGUNDOS", "900"))
+COLA_BACKOFF_BASE = int(os.getenv("COLA_BACKOFF_BASE", "10"))
+COLA_BACKOFF_MAX = int(os.getenv("COLA_BACKOFF_MAX", "3600"))
+COLA_RETENCION_DIAS = int(os.getenv("COLA_RETENCION_DIAS", "7"))
+
+INSTANCIA = f"{socket.gethostname()}:{os.getpid()}"
+
+
+# -------------------
+# Registro de tareas
+# -------------------
+TAREAS = {}   # tipo -> (funcion, max_intentos, timeout_segundos)
+
+
+def tarea(nombre: Optional[str] = None, max_intentos: int = 5, timeout: Optional[int] = None):
+    """
+    Registra una función como tarea (por defecto con su propio nombre) y le
+    agrega .encolar(db, retraso=None, **kwargs). Los kwargs viajan como JSON.
+    `timeout` (segundos, por defecto COLA_TIMEOUT_SEGUNDOS) es cuánto puede
+    correr antes de darla por abandonada: debe superar su peor duración.
+    """
+    def registrar(funcion):
+        tipo = nombre or funcion.__name__
+        TAREAS[tipo] = (funcion, max_intentos, timeout or COLA_TIMEOUT_SEGUNDOS)
+
+        def encolar_funcion(db: Session, retraso: Optional[timedelta] = None, **kwargs):
+            return encolar(db, tipo, kwargs, retraso=retraso)
+
+        funcion.encolar = encolar_funcion
+        return funcion
+    return registrar
+
+
+def encolar(db: Session, tipo: str, payload: Optional[dict] = None, retraso: Optional[timedelta] = None):
+    """
+    Agrega la tarea a la sesión sin commit: se encola solo si la
+    transacción del llamador confirma (nada de tareas huérfanas).
+    """
+    if tipo not in TAREAS:
+        raise ValueError(f"Tarea desconocida: {tipo}")
+    nueva = models.Tarea(
+        tipo=tipo,
+        payload=json.dumps(payload or {}, default=str),
+        estado="pendiente",
+        intentos=0,
+        max_intentos=TAREAS[tipo][1],
+        disponible_en=datetime.utcnow() + (retraso or timedelta()),
+    )
+    db.add(nueva)
+    return nueva
+
+
+def _timeout(tipo: str) -> timedelta:
+    registrada = TAREAS.get(tipo)
+    return timedelta(seconds=registrada[2] if registrada else COLA_TIMEOUT_SEGUNDOS)
+
+
+# -------------------
+# Worker
+# -------------------
+def reclamar(db: Session, lote: int = COLA_LOTE, worker: str = INSTANCIA) -> list:
+    """
+    Toma hasta `lote` tareas disponibles y las marca como corriendo, en una
+    transacción corta: SKIP LOCKED salta las filas que otro worker está
+    reclamando en ese momento, y después el estado las deja fuera.
+
+    Cada una vence (vence_en) cuando podrían haber terminado todas las
+    anteriores del lote más ella misma: una tarea que espera detrás de
+    otras lentas no se rescata mientras el worker siga vivo.
+    """
+    ahora = datetime.utcnow()
+    reclamadas = db.execute(
+        select(models.Tarea)
+        .where(models.Tarea.estado == "pendiente", models.Tarea.disponible_en <= ahora)
+        .order_by(models.Tarea.disponible_en, models.Tarea.id)
+        .limit(lote)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    vence_en = ahora
+    for item in reclamadas:
+        vence_en += _timeout(item.tipo)
+        item.estado = "corriendo"
+        item.intentos += 1
+        item.iniciado_en = None
+        item.vence_en = vence_en
+        item.worker = worker
+    db.commit()
+    return reclamadas
+
+
+def _backoff(intentos: int) -> timedelta:
+    # 👇 exponencial con jitter: reintentos de un mismo fallo no llegan juntos
+    segundos = min(COLA_BACKOFF_BASE * 2 ** (intentos - 1), COLA_BACKOFF_MAX)
+    return timedelta(seconds=segundos * random.uniform(0.5, 1.0))
+
+
+def _empezar(db: Session, item: models.Tarea, worker: str) -> bool:
+    """
+    Marca el inicio real de la tarea y renueva su vencimiento con el timeout
+    de su tipo. False si mientras esperaba en el lote se la rescató (y quizás
+    la tomó otro worker): entonces no se corre, para no duplicarla.
+    """
+    ahora = datetime.utcnow()
+    tomada = db.query(models.Tarea).filter(
+        models.Tarea.id == item.id,
+        models.Tarea.estado == "corriendo",
+        models.Tarea.worker == worker,
+        models.Tarea.iniciado_en.is_(None),
+    ).update(
+        {models.Tarea.iniciado_en: ahora, models.Tarea.vence_en: ahora + _timeout(item.tipo)},
+        synchronize_session=False,
+    )
+    db.commit()
+    return bool(tomada)
+
+
+def ejecutar(db: Session, item: models.Tarea, worker: str = INSTANCIA) -> Optional[str]:
+    """
+    Corre una tarea reclamada y registra su resultado. Devuelve el estado
+    final, o None si ya no era de este worker.
+    """
+    if not _empezar(db, item, worker):
+        logger.warning(f"⏭️ Tarea {item.id} ({item.tipo}) rescatada antes de empezar: no se corre")
+        return None
+    registrada = TAREAS.get(item.tipo)
+    inicio = time.perf_counter()
+    try:
+        if registrada is None:
+            raise LookupError(f"Tarea desconocida: {item.tipo}")
+        registrada[0](**json.loads(item.payload or "{}"))
+        error = None
+    except Exception as e:
+        error = e
+    item.duracion_ms = int((time.perf_counter() - inicio) * 1000)
+    item.terminado_en = datetime.utcnow()
+
+    if error is None:
+        item.estado = "ok"
+        item.error = None
+    else:
+        item.error = "".join(traceback.format_exception(error))[-4000:]
+        if registrada is None or item.intentos >= item.max_intentos:
+            item.estado = "muerta"
+            logger.error(f"💀 Tarea {item.id} ({item.tipo}) muerta tras {item.intentos} intentos: {error}")
+        else:
+            item.estado = "pendiente"
+            item.disponible_en = item.terminado_en + _backoff(item.intentos)
+            logger.warning(f"🔁 Tarea {item.id} ({item.tipo}) falló (intento {item.intentos}): {error}")
+    db.commit()
+    return item.estado
+
+
+def procesar_pendientes(db: Session, lote: int = COLA_LOTE, worker: str = INSTANCIA) -> int:
+    """Un ciclo del worker: reclama un lote y lo ejecuta. Devuelve cuántas corrió."""
+    reclamadas = reclamar(db, lote, worker)
+    for item in reclamadas:
+        ejecutar(db, item, worker)
+    return len(reclamadas)
+
+
+def rescatar_vencidas(db: Session) -> int:
+    """
+    Tareas 'corriendo' pasado su vence_en (el timeout de su tipo desde que
+    empezaron, o desde el reclamo si esperaban en un lote): su worker murió.
+    Vuelven a pendiente (o a muertas si ya no les quedan intentos).
+    """
+    vencidas = db.query(models.Tarea).filter(
+        models.Tarea.estado == "corriendo",
+        models.Tarea.vence_en < datetime.utcnow(),
+    ).with_for_update(skip_locked=True).all()
+    for item in vencidas:
+        item.error = f"Sin respuesta del worker {item.worker} (venció {item.vence_en:%Y-%m-%d %H:%M:%S})"
+        item.estado = "muerta" if item.intentos >= item.max_intentos else "pendiente"
+        item.disponible_en = datetime.utcnow()
+    db.commit()
+    return len(vencidas)
+
+
+def purgar(db: Session) -> int:
+    """Borra las tareas terminadas bien hace más de COLA_RETENCION_DIAS (las muertas quedan)."""
+    borradas = db.query(models.Tarea).filter(
+        models.Tarea.estado == "ok",
+        models.Tarea.terminado_en < datetime.utcnow() - timedelta(days=COLA_RETENCION_DIAS),
+    ).delete(synchronize_session=False)
+    db.commit()
+    return borradas
+
+
+def reintentar_muertas(db: Session, tipo: Optional[str] = None) -> int:
+    """Devuelve a la cola las tareas muertas (todas o de un tipo), con intentos en cero."""
+    query = db.query(models.Tarea).filter(models.Tarea.estado == "muerta")
+    if tipo:
+        query = query.filter(models.Tarea.tipo == tipo)
+    reencoladas = query.update(
+        {
+            models.Tarea.estado: "pendiente",
+            models.Tarea.intentos: 0,
+            models.Tarea.disponible_en: datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return reencoladas
+
+
+def trabajar(lote: int = COLA_LOTE, worker: str = INSTANCIA) -> None:
+    """Loop de un worker. Cuando no hay trabajo rescata vencidas, purga y espera."""
+    db = database.SessionLocal()
+    ultimo_mantenimiento = 0.0
+    logger.info(f"🧵 Worker {worker}: tareas {', '.join(sorted(TAREAS))}")
+    try:
+        while True:
+            try:
+                if procesar_pendientes(db, lote, worker):
+                    continue
+                if time.monotonic() - ultimo_mantenimiento > 60:
+                    rescatar_vencidas(db)
+                    purgar(db)
+                    ultimo_mantenimiento = time.monotonic()
+            except Exception as e:
+                # 👇 caída de la base: el worker sigue vivo y reintenta
+                db.rollback()
+                logger.error(f"❌ Error en el worker: {e}")
+            time.sleep(COLA_ESPERA_SEGUNDOS)
+    finally:
+        db.close()
+
+
+# -------------------
+# Métricas
+# -------------------
+def metricas(db: Session) -> dict:
+    """
+    Estado de la cola para todos los workers: tareas por estado, atraso de
+    la pendiente más vieja y tiempos por tipo en la última hora.
+    """
+    ahora = datetime.utcnow()
+    por_estado = dict(
+        db.query(models.Tarea.estado, func.count(models.Tarea.id)).group_by(models.Tarea.estado).all()
+    )
+    mas_vieja = db.query(func.min(models.Tarea.disponible_en)).filter(
+        models.Tarea.estado == "pendiente",
+        models.Tarea.disponible_en <= ahora,
+    ).scalar()
+
+    por_tipo = {}
+    filas = db.query(
+        models.Tarea.tipo,
+        models.Tarea.estado,
+        func.count(models.Tarea.id),
+        func.avg(models.Tarea.duracion_ms),
+        func.max(models.Tarea.duracion_ms),
+    ).filter(
+        models.Tarea.terminado_en > ahora - timedelta(hours=1),
+    ).group_by(models.Tarea.tipo, models.Tarea.estado).all()
+    for tipo, estado, cantidad, promedio, maximo in filas:
+        datos = por_tipo.setdefault(tipo, {"ok": 0, "fallidas": 0, "duracion_ms_prom": None, "duracion_ms_max": None})
+        if estado == "ok":
+            datos["ok"] = cantidad
+            datos["duracion_ms_prom"] = round(float(promedio), 1) if promedio is not None else None
+            datos["duracion_ms_max"] = maximo
+        else:
+            # 👇 pendiente con terminado_en = falló y espera reintento
+            datos["fallidas"] += cantidad
+
+    return {
+        "por_estado": {e: por_estado.get(e, 0) for e in ("pendiente", "corriendo", "ok", "muerta")},
+        "atraso_segundos": round((ahora - mas_vieja).total_seconds(), 1) if mas_vieja else 0,
+        "ultima_hora": por_tipo,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Worker de la cola de tareas de Votapp")
+    parser.add_argument("--lote", type=int, default=COLA_LOTE, help="tareas reclamadas por ciclo")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    import votapp_app.tasks  # noqa: F401  👈 registra los handlers de @tarea
+    trabajar(args.lote)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
 # votapp_app/controllers/friendsController.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 from ..database import get_db
 from ..models_social import Friend, Notification
 from ..models import Usuario, PerfilPublico
 from ..auth import get_current_user
+from ..utils.paginacion import ParametrosPagina, paginar
 
 router = APIRouter()
 
@@ -34,8 +35,13 @@ def build_friend_notification(f: Friend, current_user_id: int, db: Session):
 # LISTAR AMIGOS
 # -------------------
 @router.get("/friends")
-def list_friends(user_id: int, db: Session = Depends(get_db)):
-    friendships = (
+def list_friends(
+    user_id: int,
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
+    db: Session = Depends(get_db)
+):
+    query = (
         db.query(Friend)
         .options(
             joinedload(Friend.user).joinedload(Usuario.perfil_publico),
@@ -45,11 +51,12 @@ def list_friends(user_id: int, db: Session = Depends(get_db)):
             ((Friend.user_id == user_id) | (Friend.friend_id == user_id)),
             Friend.status == "accepted"
         )
-        .all()
     )
+    resultado = paginar(query, [Friend.id], pagina)
+    resultado.cabeceras(response)
 
     result = []
-    for f in friendships:
+    for f in resultado.items:
         other = f.friend if f.user_id == user_id else f.user
         perfil = getattr(other, "perfil_publico", None)
 
@@ -1,10 +1,11 @@
 # votapp_app/controllers/notificationsController.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..models_social import Notification, Friend
 from ..models import Usuario
+from ..utils.paginacion import ParametrosPagina, paginar
 from datetime import datetime
 
 router = APIRouter()
@@ -34,11 +35,24 @@ def build_friend_notification(f: Friend, current_user_id: int, db: Session):
 # LISTAR NOTIFICACIONES
 # -------------------
 @router.get("/notifications")
-def list_notifications(user_id: int, db: Session = Depends(get_db)):
-    notifications = db.query(Notification).filter(Notification.user_id == user_id).all()
+async def list_notifications(
+    user_id: int,
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
+    db=Depends(get_async_db)
+):
+    resultado = await db.run_sync(_listar_notificaciones, user_id, pagina)
+    resultado.cabeceras(response)
+    return resultado.items
+
+
+def _listar_notificaciones(db: Session, user_id: int, pagina: ParametrosPagina):
+    # 👇 más recientes primero, una página por vez
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    resultado = paginar(query, [Notification.id], pagina)
     result = []
 
-    for n in notifications:
+    for n in resultado.items:
         result.append({
             "id": n.id,
             "user_id": n.user_id,
@@ -49,7 +63,8 @@ def list_notifications(user_id: int, db: Session = Depends(get_db)):
             "created_at": n.created_at.isoformat() if n.created_at else None,
         })
 
-    return result
+    resultado.items = result
+    return resultado
 
 # -------------------
 # CREAR NOTIFICACIÓN
@@ -118,12 +133,15 @@ def delete_notification(notification_id: int, db: Session = Depends(get_db)):
 # MARCAR TODAS COMO LEÍDAS
 # -------------------
 @router.put("/notifications/read_all")
-def mark_all_as_read(user_id: int, db: Session = Depends(get_db)):
-    notifications = db.query(Notification).filter(Notification.user_id == user_id, Notification.status == "unread").all()
-    for n in notifications:
-        n.status = "read"
-    db.commit()
-    return {"message": f"{len(notifications)} notificaciones marcadas como leídas"}
+async def mark_all_as_read(user_id: int, db=Depends(get_async_db)):
+    # 👇 un solo UPDATE en vez de cargar y marcar una por una
+    marcadas = await db.run_sync(
+        lambda s: s.query(Notification)
+        .filter(Notification.user_id == user_id, Notification.status == "unread")
+        .update({Notification.status: "read"}, synchronize_session=False)
+    )
+    await db.commit()
+    return {"message": f"{marcadas} notificaciones marcadas como leídas"}
 
 # -------------------
 # ELIMINAR TODAS LAS NOTIFICACIONES DE UN USUARIO
@@ -138,9 +156,11 @@ def delete_all_notifications(user_id: int, db: Session = Depends(get_db)):
 # CONTAR NOTIFICACIONES NO LEÍDAS
 # -------------------
 @router.get("/notifications/unread_count")
-def unread_notifications_count(user_id: int, db: Session = Depends(get_db)):
-    count = db.query(Notification).filter(
-        Notification.user_id == user_id,
-        Notification.status == "unread"
-    ).count()
+async def unread_notifications_count(user_id: int, db=Depends(get_async_db)):
+    count = await db.run_sync(
+        lambda s: s.query(Notification).filter(
+            Notification.user_id == user_id,
+            Notification.status == "unread"
+        ).count()
+    )
     return {"unread_count": count}
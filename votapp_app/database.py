@@ -1,11 +1,28 @@
-
 # votapp_app/database.py
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from collections import deque
+import logging
+import math
 import os
+import threading
+import time
+from typing import Optional
 from dotenv import load_dotenv
 
+from .cache import _backend_desde_entorno
+
+try:
+    import asyncpg  # opcional: motor asíncrono para los endpoints async def
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+except ImportError:  # pragma: no cover
+    asyncpg = None
+
 # 📌 Cargar variables de entorno aquí mismo
 load_dotenv()
 
@@ -14,19 +31,176 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("❌ No se encontró la variable DATABASE_URL. Verifica tu archivo .env")
 
-# 🔧 Motor de conexión con control de pool
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,       # Verifica que la conexión esté viva antes de usarla
-    pool_recycle=1800,        # Recicla conexiones cada 30 min
-    pool_size=5,              # Mantén un pool pequeño
-    max_overflow=30,           # Permite conexiones extra si el pool se llena
-    connect_args={"sslmode": "require"}
-)
 
-# ✅ Forzar UTF-8 en cada conexión
-with engine.connect() as conn:
-    conn.execute(text("SET client_encoding TO 'UTF8';"))
+# -------------------
+# Configuración del pool (variables de entorno)
+# -------------------
+def _entero(nombre: str, defecto: int) -> int:
+    valor = os.getenv(nombre)
+    return int(valor) if valor not in (None, "") else defecto
+
+
+DB_POOL_SIZE = _entero("DB_POOL_SIZE", 5)                  # conexiones persistentes
+DB_MAX_OVERFLOW = _entero("DB_MAX_OVERFLOW", 30)           # extra cuando el pool se llena
+DB_POOL_TIMEOUT = _entero("DB_POOL_TIMEOUT", 30)           # segundos esperando una conexión
+DB_POOL_RECYCLE = _entero("DB_POOL_RECYCLE", 1800)         # recicla conexiones cada 30 min
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+DB_STATEMENT_TIMEOUT_MS = _entero("DB_STATEMENT_TIMEOUT_MS", 0)   # 0 = sin límite
+DB_CLIENT_ENCODING = os.getenv("DB_CLIENT_ENCODING", "UTF8")
+DATABASE_SSLMODE = os.getenv("DATABASE_SSLMODE", "require")      # 👈 "disable" para un Postgres local
+
+# -------------------
+# Pool con métricas
+# -------------------
+class MetricasPool:
+    """
+    Latencia de checkout (tiempo esperando una conexión del pool, incluye
+    abrir una nueva), cola de espera y overflow. Las latencias son una
+    ventana de las últimas `ventana` obtenciones.
+    """
+
+    def __init__(self, ventana: int = 2048):
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=ventana)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errores = 0
+        self.esperando = 0
+        self.max_esperando = 0
+        self.max_overflow_usado = 0
+        self.max_latencia_ms = 0.0
+
+    def entrar(self) -> None:
+        with self._lock:
+            self.esperando += 1
+            self.max_esperando = max(self.max_esperando, self.esperando)
+
+    def salir(self, segundos: float, overflow: int, resultado: str = "ok") -> None:
+        with self._lock:
+            self.esperando -= 1
+            if resultado == "timeout":
+                self.timeouts += 1
+                return
+            if resultado == "error":   # no se pudo abrir la conexión
+                self.errores += 1
+                return
+            self.checkouts += 1
+            self._latencias.append(segundos)
+            self.max_latencia_ms = max(self.max_latencia_ms, segundos * 1000)
+            self.max_overflow_usado = max(self.max_overflow_usado, overflow)
+
+    def resumen(self) -> dict:
+        with self._lock:
+            latencias = sorted(self._latencias)
+
+        def percentil(p):
+            if not latencias:
+                return None
+            return round(latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000, 2)
+
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "errores": self.errores,
+            "esperando": self.esperando,
+            "max_esperando": self.max_esperando,
+            "max_overflow_usado": self.max_overflow_usado,
+            "checkout_ms": {
+                "p50": percentil(0.50),
+                "p95": percentil(0.95),
+                "p99": percentil(0.99),
+                "max": round(self.max_latencia_ms, 2),
+            },
+        }
+
+
+class _MedicionPool:
+    """Mixin para QueuePool: mide cada obtención de conexión (_do_get)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = MetricasPool()
+
+    def _do_get(self):
+        self.metricas.entrar()
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except PoolTimeoutError:
+            self.metricas.salir(time.perf_counter() - inicio, self.overflow(), "timeout")
+            raise
+        except BaseException:
+            self.metricas.salir(time.perf_counter() - inicio, self.overflow(), "error")
+            raise
+        self.metricas.salir(time.perf_counter() - inicio, self.overflow())
+        return conexion
+
+    def estado(self) -> dict:
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self.timeout(),
+            "en_uso": self.checkedout(),
+            "libres": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            **self.metricas.resumen(),
+        }
+
+
+class PoolMedido(_MedicionPool, QueuePool):
+    pass
+
+
+class PoolMedidoAsync(_MedicionPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _opciones_pool() -> dict:
+    return {
+        "pool_pre_ping": DB_POOL_PRE_PING,   # Verifica que la conexión esté viva antes de usarla
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
+
+def _es_postgres(url: str) -> bool:
+    return make_url(url).get_backend_name() == "postgresql"
+
+
+def _configurar_conexion(dbapi_connection, connection_record):
+    """
+    ✅ Encoding y statement_timeout al abrir cada conexión física (una vez,
+    no en cada checkout ni con una conexión extra al importar el módulo).
+    """
+    sentencias = [f"SET client_encoding TO '{DB_CLIENT_ENCODING}'"]
+    if DB_STATEMENT_TIMEOUT_MS:
+        sentencias.append(f"SET statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+    cursor = dbapi_connection.cursor()
+    cursor.execute("; ".join(sentencias))
+    cursor.close()
+    # 👇 los SET abren transacción implícita en psycopg2
+    dbapi_connection.commit()
+
+
+def crear_engine(url: str):
+    """Motor síncrono con el pool configurado (primaria o réplica)."""
+    if not _es_postgres(url):
+        # SQLite u otros (scripts locales, pruebas): sin opciones de Postgres
+        return create_engine(url)
+    motor = create_engine(
+        url,
+        poolclass=PoolMedido,
+        connect_args={"sslmode": DATABASE_SSLMODE},
+        **_opciones_pool(),
+    )
+    event.listen(motor, "connect", _configurar_conexion)
+    return motor
+
+
+# 🔧 Motor de conexión con control de pool
+engine = crear_engine(DATABASE_URL)
 
 # 🔧 Sesión para interactuar con la base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -43,3 +217,265 @@ def get_db():
         db.close()
 
 
+# -------------------
+# Capa asíncrona (AsyncSession + asyncpg)
+# -------------------
+def _url_asyncpg(url: str):
+    """postgresql://… → postgresql+asyncpg://… (asyncpg no entiende sslmode en la URL)."""
+    url = make_url(url)
+    return url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode"])
+
+
+# 👇 DATABASE_ASYNC=0 fuerza el modo hilo (útil para comparar con benchmark_db.py)
+USAR_ASYNC = asyncpg is not None and os.getenv("DATABASE_ASYNC", "1") != "0" and _es_postgres(DATABASE_URL)
+
+
+def crear_async_engine(url: str):
+    """Motor asyncpg con el pool configurado (primaria o réplica)."""
+    server_settings = {"client_encoding": DB_CLIENT_ENCODING}
+    if DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+    return create_async_engine(
+        _url_asyncpg(url),
+        poolclass=PoolMedidoAsync,
+        # asyncpg manda server_settings al conectar: sin consultas extra
+        connect_args={"ssl": DATABASE_SSLMODE, "server_settings": server_settings},
+        **_opciones_pool(),
+    )
+
+
+async_engine = None
+AsyncSessionLocal = None
+if USAR_ASYNC:
+    async_engine = crear_async_engine(DATABASE_URL)
+    # expire_on_commit=False: tras el commit no hay IO implícito al leer atributos
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def metricas_pool() -> dict:
+    """Estado y métricas de los pools (sync y async) para /admin/metricas."""
+    pools = {"sync": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.pool
+    if replica_engine is not None:
+        pools["replica"] = replica_engine.pool
+    if replica_async_engine is not None:
+        pools["replica_async"] = replica_async_engine.pool
+    return {
+        nombre: pool.estado() if isinstance(pool, _MedicionPool) else {"status": pool.status()}
+        for nombre, pool in pools.items()
+    }
+
+
+class SesionEnHilo:
+    """
+    Misma interfaz que AsyncSession para lo que usan los endpoints
+    (run_sync, commit, rollback, close) sobre una Session normal: cada
+    llamada corre en el threadpool. Es el respaldo cuando no hay asyncpg
+    o DATABASE_ASYNC=0.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+def _abrir_async(fabrica_async, fabrica_sync):
+    """AsyncSession si hay motor asyncpg; si no, la Session sync en hilo."""
+    if fabrica_async is not None:
+        return fabrica_async()
+    return SesionEnHilo(fabrica_sync())
+
+
+# ✅ Dependencia async: los endpoints hacen `await db.run_sync(funcion, ...)`
+# con la misma lógica ORM síncrona de utils/; con asyncpg la espera de
+# Postgres no ocupa un hilo y la concurrencia la limita el pool.
+async def get_async_db():
+    db = _abrir_async(AsyncSessionLocal, SessionLocal)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+# -------------------
+# Réplica de lectura
+# -------------------
+logger = logging.getLogger("database")
+
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# Segundos que un usuario lee de la primaria después de escribir
+DATABASE_REPLICA_RYW_SEGUNDOS = float(os.getenv("DATABASE_REPLICA_RYW_SEGUNDOS", "5"))
+
+
+class EnrutadorLectura:
+    """
+    Decide de dónde lee un request de solo lectura:
+
+      - sin réplica configurada → primaria,
+      - el usuario escribió hace menos de `ventana` segundos → primaria
+        (read-your-writes: ve su voto, su comentario, su billetera),
+      - en otro caso → réplica.
+
+    Las escrituras se marcan solas al hacer commit (ver los eventos de
+    Session más abajo) en el backend de cache; la réplica del módulo solo
+    se activa si ese backend es compartido (ver replica_utilizable).
+    """
+
+    def __init__(self, primaria, replica=None, primaria_async=None, replica_async=None,
+                 ventana: float = 5, marcas=None):
+        self.primaria = primaria
+        self.replica = replica
+        self.primaria_async = primaria_async
+        self.replica_async = replica_async
+        self.ventana = ventana
+        self.marcas = marcas if marcas is not None else _backend_desde_entorno()
+        self.lecturas_replica = 0
+        self.lecturas_primaria = 0
+
+    @property
+    def activo(self) -> bool:
+        return self.replica is not None
+
+    def marcar_escritura(self, usuario_id: int) -> None:
+        if not self.activo or not self.ventana:
+            return
+        try:
+            # 👇 Redis (setex) solo acepta segundos enteros
+            ttl = self.ventana if self.marcas.nombre == "local" else math.ceil(self.ventana)
+            self.marcas.set(f"escritura:{usuario_id}", 1, ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo marcar escritura de usuario {usuario_id}: {e}")
+
+    def origen(self, usuario_id) -> str:
+        """
+        "primaria" (no hay réplica), "escritura" (el usuario escribió hace
+        poco: primaria por read-your-writes) o "replica".
+        """
+        if not self.activo:
+            return "primaria"
+        if usuario_id is None:
+            return "replica"
+        try:
+            reciente = self.marcas.get(f"escritura:{usuario_id}") is not None
+        except Exception:
+            reciente = True   # ante la duda, la primaria siempre está al día
+        return "escritura" if reciente else "replica"
+
+    def usar_primaria(self, usuario_id) -> bool:
+        return self.origen(usuario_id) != "replica"
+
+    def _contar(self, primaria: bool) -> None:
+        if primaria:
+            self.lecturas_primaria += 1
+        else:
+            self.lecturas_replica += 1
+
+    def sesion(self, usuario_id=None):
+        origen = self.origen(usuario_id)
+        self._contar(origen != "replica")
+        db = (self.replica if origen == "replica" else self.primaria)()
+        db.info["origen_lectura"] = origen
+        return db
+
+    def sesion_async(self, usuario_id=None):
+        origen = self.origen(usuario_id)
+        self._contar(origen != "replica")
+        if origen == "replica":
+            db = _abrir_async(self.replica_async, self.replica)
+        else:
+            db = _abrir_async(self.primaria_async, self.primaria)
+        db.sync_session.info["origen_lectura"] = origen
+        return db
+
+    def metricas(self) -> dict:
+        return {
+            "activo": self.activo,
+            "ventana_segundos": self.ventana,
+            "lecturas_replica": self.lecturas_replica,
+            "lecturas_primaria": self.lecturas_primaria,
+        }
+
+
+def origen_lectura(db) -> str:
+    """De dónde lee una sesión abierta por el enrutador (ver EnrutadorLectura.origen)."""
+    return getattr(db, "sync_session", db).info.get("origen_lectura", "primaria")
+
+
+def replica_utilizable(url: Optional[str], marcas) -> bool:
+    """
+    La réplica solo se usa con un backend de marcas compartido (Redis).
+    En un CacheLocal las marcas de read-your-writes son por proceso: con
+    varios workers, un voto atendido por uno no existiría para los demás
+    y leerían de la réplica (y de su cache) como si nada. Sin backend
+    compartido, todas las lecturas van a la primaria.
+    """
+    if not url:
+        return False
+    if marcas.nombre == "local":
+        logger.warning(
+            "⚠️ DATABASE_REPLICA_URL sin RESULTS_CACHE_URL (Redis): read-your-writes "
+            "no se comparte entre workers, se lee siempre de la primaria"
+        )
+        return False
+    return True
+
+
+marcas_escritura = _backend_desde_entorno()
+
+replica_engine = None
+replica_async_engine = None
+ReplicaSessionLocal = None
+ReplicaAsyncSessionLocal = None
+if replica_utilizable(DATABASE_REPLICA_URL, marcas_escritura):
+    replica_engine = crear_engine(DATABASE_REPLICA_URL)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if USAR_ASYNC and _es_postgres(DATABASE_REPLICA_URL):
+        replica_async_engine = crear_async_engine(DATABASE_REPLICA_URL)
+        ReplicaAsyncSessionLocal = async_sessionmaker(replica_async_engine, autoflush=False, expire_on_commit=False)
+
+enrutador_lectura = EnrutadorLectura(
+    SessionLocal,
+    ReplicaSessionLocal,
+    AsyncSessionLocal,
+    ReplicaAsyncSessionLocal,
+    ventana=DATABASE_REPLICA_RYW_SEGUNDOS,
+    marcas=marcas_escritura,
+)
+
+
+# 👇 Marca de escritura: cualquier flush con cambios o INSERT/UPDATE/DELETE
+# ejecutado por la sesión; al commit, si la sesión sabe de qué usuario es
+# (session.info["usuario_id"], lo pone get_current_user), se marca.
+@event.listens_for(Session, "do_orm_execute")
+def _detectar_escritura(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        estado.session.info["escribio"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _detectar_flush(session, contexto):
+    session.info["escribio"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _marcar_escritura(session):
+    usuario_id = session.info.get("usuario_id")
+    if session.info.pop("escribio", False) and usuario_id is not None:
+        enrutador_lectura.marcar_escritura(usuario_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_escritura(session):
+    session.info.pop("escribio", None)
@@ -0,0 +1,187 @@
+# votapp_app/ingesta.py
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from votapp_app import llm, models
+from votapp_app.utils.creacion import insertar_preguntas
+
+logger = logging.getLogger("ingesta")
+
+INGESTA_HILOS = int(os.getenv("INGESTA_HILOS", "8"))
+INGESTA_LLM_POR_SEGUNDO = float(os.getenv("INGESTA_LLM_POR_SEGUNDO", "10"))
+INGESTA_MAX_TEXTO = 4000   # caracteres de la noticia que se mandan al LLM
+USUARIO_SISTEMA = 9999
+
+
+# -------------------
+# Control de tasa
+# -------------------
+class LimitadorTasa:
+    """
+    Token bucket compartido entre hilos: como mucho `por_segundo` llamadas
+    por segundo, con ráfagas de hasta `rafaga`. esperar() bloquea lo justo.
+    """
+
+    def __init__(self, por_segundo: float, rafaga: int = 1):
+        self.intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self.rafaga = max(rafaga, 1)
+        self._tokens = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def esperar(self) -> None:
+        if not self.intervalo:
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.rafaga, self._tokens + (ahora - self._ultimo) / self.intervalo)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                falta = (1 - self._tokens) * self.intervalo
+            time.sleep(falta)
+
+
+# -------------------
+# Etapas
+# -------------------
+class Entrada:
+    """
+    Una noticia o video a convertir en encuesta. `columnas` trae los campos
+    de Survey propios de la fuente (media_url, media_urls, media_type, patrocinador).
+    """
+    __slots__ = ("source_url", "titulo", "texto", "columnas")
+
+    def __init__(self, source_url: str, titulo: str, texto: str, columnas: dict):
+        self.source_url = source_url
+        self.titulo = titulo
+        self.texto = texto
+        self.columnas = columnas
+
+
+def descartar_conocidas(db: Session, entradas: list) -> list:
+    """
+    Dedupe antes de gastar LLM: una consulta con todos los source_url del
+    lote contra surveys, más los repetidos dentro del mismo lote.
+    """
+    urls = [e.source_url for e in entradas]
+    conocidas = {
+        url for (url,) in db.query(models.Survey.source_url).filter(models.Survey.source_url.in_(urls))
+    }
+    nuevas = []
+    for entrada in entradas:
+        if entrada.source_url in conocidas:
+            continue
+        conocidas.add(entrada.source_url)
+        nuevas.append(entrada)
+    return nuevas
+
+
+def enriquecer(entradas: list, proveedor, hilos: int = INGESTA_HILOS, limitador=None, cache=None) -> list:
+    """
+    Resumen y preguntas de todas las entradas en un pool acotado de hilos,
+    una sola llamada al LLM por entrada (llm.generar_encuesta), así que un
+    lote tarda ~una latencia de LLM si hay hilos y cupo de tasa suficientes.
+    Las que ya están en el cache LLM no llaman al modelo ni gastan cupo.
+    Devuelve [(entrada, resumen, preguntas)]; una entrada cuyo LLM falla
+    se descarta sin frenar a las demás.
+    """
+    limitador = limitador or LimitadorTasa(INGESTA_LLM_POR_SEGUNDO, rafaga=hilos)
+
+    def llamar(entrada):
+        return llm.generar_encuesta(
+            proveedor, entrada.titulo, entrada.texto[:INGESTA_MAX_TEXTO],
+            cache=cache, esperar=limitador.esperar,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(hilos, 1), thread_name_prefix="ingesta") as pool:
+        tareas = [(entrada, pool.submit(llamar, entrada)) for entrada in entradas]
+        listas = []
+        for entrada, tarea in tareas:
+            try:
+                listas.append((entrada, *tarea.result()))
+            except Exception as e:
+                logger.warning(f"⚠️ LLM falló para {entrada.source_url}: {e}")
+    return listas
+
+
+def guardar_encuestas(db: Session, listas: list, media_type: str) -> list:
+    """
+    Persiste las encuestas generadas: un flush para todas las encuestas y
+    un INSERT por tabla para preguntas y opciones. Sin commit.
+    Devuelve la respuesta de los endpoints de rss.py.
+    """
+    nuevas = []
+    for entrada, resumen, preguntas in listas:
+        encuesta = models.Survey(
+            title=entrada.titulo,
+            description=resumen,
+            fecha_expiracion=datetime.utcnow() + timedelta(days=7),
+            patrocinada=False,
+            recompensa_puntos=10,
+            recompensa_dinero=0,
+            presupuesto_total=100,
+            visibilidad_resultados="publica",
+            source_url=entrada.source_url,
+            usuario_id=USUARIO_SISTEMA,   # 👈 asignar al usuario de sistema
+            **entrada.columnas,
+        )
+        db.add(encuesta)
+        nuevas.append((encuesta, preguntas))
+
+    db.flush()
+    creadas = insertar_preguntas(db, [(encuesta.id, preguntas) for encuesta, preguntas in nuevas])
+
+    encuestas = []
+    for (encuesta, _), preguntas in zip(nuevas, creadas):
+        encuestas.append({
+            "id": encuesta.id,
+            "title": encuesta.title,
+            "description": encuesta.description,
+            "fecha_expiracion": encuesta.fecha_expiracion,
+            "questions": [
+                {**q, "options": [{**o, "count": 0, "percentage": None} for o in q["options"]]}
+                for q in preguntas
+            ],
+            "media_url": encuesta.media_url,
+            "media_urls": json.loads(encuesta.media_urls),
+            "media_type": media_type,
+            "patrocinada": encuesta.patrocinada,
+            "patrocinador": encuesta.patrocinador,
+            "recompensa_puntos": encuesta.recompensa_puntos,
+            "recompensa_dinero": encuesta.recompensa_dinero,
+            "presupuesto_total": encuesta.presupuesto_total,
+            "visibilidad_resultados": encuesta.visibilidad_resultados,
+            "source_url": encuesta.source_url
+        })
+    return encuestas
+
+
+# -------------------
+# Pipeline completo
+# -------------------
+def ingerir(db: Session, entradas: list, proveedor, media_type: str, **opciones) -> list:
+    """
+    fetch (lo hace el llamador) → dedupe → LLM concurrente → inserción masiva.
+    `proveedor` es un llm.ProveedorLLM; `opciones` (hilos, limitador, cache) van a
+    enriquecer. El commit es del llamador.
+    """
+    inicio = time.perf_counter()
+    nuevas = descartar_conocidas(db, entradas)
+    listas = enriquecer(nuevas, proveedor, **opciones)
+    encuestas = guardar_encuestas(db, listas, media_type)
+    logger.info(
+        f"📰 Ingesta: {len(entradas)} entradas, {len(entradas) - len(nuevas)} ya conocidas, "
+        f"{len(encuestas)} encuestas en {time.perf_counter() - inicio:.1f}s"
+    )
+    return encuestas
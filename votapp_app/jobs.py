@@ -0,0 +1,224 @@
+# votapp_app/jobs.py
+"""
+Runner de jobs programados, separado de los workers web:
+
+    python -m votapp_app.jobs            # scheduler bloqueante (proceso propio)
+    python -m votapp_app.jobs rss        # una corrida, ignorando el intervalo
+
+Cada corrida toma un advisory lock de Postgres por job y consulta
+job_runs: aunque haya varias réplicas del runner (o SCHEDULER_EN_WEB en
+varios workers), un job corre una vez por intervalo.
+
+Despliegue: por defecto el proceso web también programa estos jobs
+(SCHEDULER_EN_WEB, activo salvo que valga "0"). Para sacarlos del web,
+levantar este runner como proceso aparte y solo entonces poner
+SCHEDULER_EN_WEB=0 en el web; si no, nada vacía el outbox de
+gamificación ni cierra encuestas (GET /salud responde 503 cuando el
+outbox se atrasa).
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from votapp_app import database, models
+from votapp_app.tasks import (
+    cerrar_encuestas_por_presupuesto,
+    procesar_eventos_gamificacion,
+    reconciliar_conteos,
+    snapshot_analitica,
+)
+from votapp_app.utils.snapshots import SNAPSHOT_DIR
+
+logger = logging.getLogger("jobs")
+
+INSTANCIA = f"{socket.gethostname()}:{os.getpid()}"
+TOLERANCIA_INTERVALO = 0.9   # 👈 un disparo un poco adelantado no cuenta como otro intervalo
+
+
+# -------------------
+# Jobs
+# -------------------
+def ingesta_youtube():
+    # 👇 import diferido: feedparser, googleapiclient y el LLM solo en el proceso de jobs
+    from votapp_app import rss
+    return {"encuestas": len(rss.obtener_encuestas_youtube())}
+
+
+def ingesta_rss():
+    from votapp_app import rss
+    return {"encuestas": len(rss.obtener_encuestas_diariolibre())}
+
+
+def gamificacion():
+    procesados = procesar_eventos_gamificacion()
+    if procesados:
+        logger.info(f"🎮 gamificacion: {procesados} eventos procesados")
+    return {"eventos": procesados}
+
+
+class Job:
+    """
+    `registrar=False` para jobs muy frecuentes: solo se guardan sus errores
+    en job_runs (el advisory lock sigue evitando corridas simultáneas).
+    """
+    __slots__ = ("nombre", "funcion", "intervalo", "retraso_inicial", "registrar")
+
+    def __init__(self, nombre, funcion, intervalo: timedelta, retraso_inicial=None, registrar=True):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo = intervalo
+        self.retraso_inicial = retraso_inicial
+        self.registrar = registrar
+
+
+JOBS = [
+    Job("youtube", ingesta_youtube, timedelta(hours=8), retraso_inicial=timedelta(seconds=10)),
+    Job("rss", ingesta_rss, timedelta(hours=8), retraso_inicial=timedelta(seconds=15)),
+    Job("presupuesto", cerrar_encuestas_por_presupuesto, timedelta(hours=8), retraso_inicial=timedelta(seconds=20)),
+    Job("conteos", reconciliar_conteos, timedelta(hours=24)),
+    Job("gamificacion", gamificacion, timedelta(seconds=10), registrar=False),
+]
+if SNAPSHOT_DIR:   # 👈 snapshots analíticos solo si hay directorio configurado
+    JOBS.append(Job("snapshots", snapshot_analitica, timedelta(minutes=int(os.getenv("SNAPSHOT_INTERVALO_MIN", "60")))))
+
+
+# -------------------
+# Ejecución
+# -------------------
+def _clave_lock(nombre: str) -> int:
+    # 👇 bigint estable entre procesos (hash() de Python cambia por proceso)
+    return int(hashlib.sha1(f"votapp.jobs:{nombre}".encode()).hexdigest()[:15], 16)
+
+
+@contextmanager
+def candado(nombre: str):
+    """
+    Advisory lock de sesión de Postgres durante la corrida; True si se
+    tomó. Si el proceso muere, Postgres lo libera al cerrar la conexión.
+    En otros motores no hay lock (un solo proceso).
+    """
+    if database.engine.dialect.name != "postgresql":
+        yield True
+        return
+    with database.engine.connect() as conn:
+        clave = _clave_lock(nombre)
+        tomado = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": clave}).scalar()
+        conn.commit()
+        try:
+            yield tomado
+        finally:
+            if tomado:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": clave})
+                conn.commit()
+
+
+def _ya_corrio(db, job: Job) -> bool:
+    desde = datetime.utcnow() - job.intervalo * TOLERANCIA_INTERVALO
+    return db.query(models.JobRun.id).filter(
+        models.JobRun.nombre == job.nombre,
+        models.JobRun.inicio > desde,
+    ).first() is not None
+
+
+def _resumen(valor):
+    if valor is None:
+        return None
+    return json.dumps(valor, default=str) if isinstance(valor, (dict, list)) else str(valor)
+
+
+def ejecutar(job: Job, forzar: bool = False):
+    """
+    Corre `job` si esta instancia tiene el lock y (salvo `forzar`) nadie lo
+    corrió en el intervalo actual. Registra duración y resultado en
+    job_runs; los errores quedan registrados y no se propagan al scheduler.
+    Devuelve el estado ("ok" o "error"), o None si la corrida se omitió.
+    """
+    with candado(job.nombre) as tomado:
+        if not tomado:
+            logger.info(f"⏭️ {job.nombre}: corriendo en otra instancia")
+            return None
+
+        db = database.SessionLocal()
+        try:
+            corrida = None
+            if job.registrar:
+                if not forzar and _ya_corrio(db, job):
+                    logger.info(f"⏭️ {job.nombre}: ya corrió en este intervalo")
+                    return None
+                corrida = models.JobRun(nombre=job.nombre, instancia=INSTANCIA, inicio=datetime.utcnow())
+                db.add(corrida)
+                db.commit()
+
+            inicio = time.perf_counter()
+            try:
+                resultado, error = job.funcion(), None
+            except Exception as e:
+                resultado, error = None, e
+            duracion_ms = int((time.perf_counter() - inicio) * 1000)
+
+            if error is None and corrida is None:
+                return "ok"
+            if corrida is None:
+                corrida = models.JobRun(nombre=job.nombre, instancia=INSTANCIA,
+                                        inicio=datetime.utcnow() - timedelta(milliseconds=duracion_ms))
+                db.add(corrida)
+            corrida.fin = datetime.utcnow()
+            corrida.duracion_ms = duracion_ms
+            corrida.estado = "ok" if error is None else "error"
+            corrida.resultado = _resumen(resultado)
+            if error is not None:
+                corrida.error = "".join(traceback.format_exception(error))[-4000:]
+                logger.error(f"❌ {job.nombre} falló en {duracion_ms} ms: {error}")
+            else:
+                logger.info(f"✅ {job.nombre} en {duracion_ms} ms: {corrida.resultado}")
+            db.commit()
+            return "ok" if error is None else "error"
+        finally:
+            db.close()
+
+
+# -------------------
+# Programación
+# -------------------
+def programar(scheduler) -> None:
+    """Agrega los JOBS a un scheduler de APScheduler (bloqueante o en segundo plano)."""
+    ahora = datetime.now(timezone.utc)   # 👈 con zona: vale para cualquier timezone del scheduler
+    for job in JOBS:
+        scheduler.add_job(
+            ejecutar, "interval", args=[job], id=job.nombre,
+            seconds=job.intervalo.total_seconds(), max_instances=1, coalesce=True,
+        )
+        if job.retraso_inicial is not None:
+            scheduler.add_job(ejecutar, "date", args=[job], run_date=ahora + job.retraso_inicial)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Runner de jobs programados de Votapp")
+    parser.add_argument("job", nargs="?", choices=[j.nombre for j in JOBS],
+                        help="correr solo este job una vez (sin respetar el intervalo)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    if args.job:
+        ejecutar(next(j for j in JOBS if j.nombre == args.job), forzar=True)
+        return
+
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    scheduler = BlockingScheduler(timezone="UTC")
+    programar(scheduler)
+    logger.info(f"🗓️ Runner de jobs {INSTANCIA}: {', '.join(j.nombre for j in JOBS)}")
+    scheduler.start()
+
+
+if __name__ == "__main__":
+    main()
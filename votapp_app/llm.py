@@ -0,0 +1,349 @@
+# votapp_app/llm.py
+
+import json
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Callable, Iterator, Optional
+
+from votapp_app.cache import CacheLLM, cache_llm
+
+try:
+    import cohere   # opcional: solo con LLM_PROVEEDOR=cohere
+except ImportError:  # pragma: no cover
+    cohere = None
+
+try:
+    import openai   # opcional: solo con LLM_PROVEEDOR=openai
+except ImportError:  # pragma: no cover
+    openai = None
+
+logger = logging.getLogger("llm")
+
+LLM_PROVEEDOR = os.getenv("LLM_PROVEEDOR", "cohere")
+LLM_MODELO = os.getenv("LLM_MODELO")
+MAX_PREGUNTAS = 3
+VERSION_PROMPT = 1        # 👈 subirla al cambiar PROMPT_ENCUESTA invalida el cache
+MAX_RESUMEN_RESPALDO = 280
+
+
+# -------------------
+# Prompt y esquema de respuesta
+# -------------------
+PROMPT_ENCUESTA = """
+Lee la siguiente noticia y devuelve, en una sola respuesta, un resumen y
+exactamente 3 preguntas de encuesta ciudadana.
+
+El resumen debe tener máximo 2 frases claras y neutrales.
+Las preguntas deben ser cortas, neutrales y enfocadas en la opinión del usuario,
+no en evaluar conocimiento. Cada pregunta debe tener 2 o 3 opciones simples
+como "Sí / No" o "De acuerdo / En desacuerdo".
+
+Título: {titulo}
+Noticia: {texto}
+
+Devuelve únicamente JSON válido, sin texto adicional, con este formato:
+{{
+  "resumen": "Resumen en 1 o 2 frases",
+  "preguntas": [
+    {{
+      "text": "Pregunta 1",
+      "options": [
+        {{"text": "Opción A"}},
+        {{"text": "Opción B"}}
+      ]
+    }}
+  ]
+}}
+"""
+
+
+def pregunta_defecto(titulo: str) -> dict:
+    return {
+        "text": f"¿Qué opinas de la noticia '{titulo}'?",
+        "options": [
+            {"text": "Me interesa"},
+            {"text": "No me interesa"},
+            {"text": "Prefiero no opinar"}
+        ]
+    }
+
+
+# -------------------
+# Extracción tolerante de JSON
+# -------------------
+_COMA_FINAL = re.compile(r",\s*([}\]])")
+
+
+def _cargar(texto: str):
+    try:
+        return json.loads(texto)
+    except ValueError:
+        # 👇 coma antes de cerrar ("[1, 2,]"), típica de los LLM
+        return json.loads(_COMA_FINAL.sub(r"\1", texto))
+
+
+class ExtractorJSON:
+    """
+    Recibe la respuesta del LLM por fragmentos y encuentra el primer valor
+    JSON (objeto o arreglo) ignorando texto alrededor o cercas ```json.
+
+    alimentar() devuelve el valor en cuanto se cierra, para cortar el
+    stream ahí. resultado() además repara una respuesta cortada: cierra la
+    cadena y los corchetes abiertos o, si no alcanza, vuelve al último
+    elemento completo.
+    """
+
+    def __init__(self):
+        self.texto = ""
+        self.inicio = None
+        self.valor = None
+        self.completo = False
+        self._pos = 0
+        self._pila = []           # cierres pendientes: "}" o "]"
+        self._en_cadena = False
+        self._escape = False
+        self._cortes = []         # (posición, cierres) tras cada elemento completo
+
+    def alimentar(self, fragmento: str):
+        if self.completo:
+            return self.valor
+        self.texto += fragmento
+        while self._pos < len(self.texto):
+            c = self.texto[self._pos]
+            self._pos += 1
+            if self.inicio is None:
+                if c in "{[":
+                    self.inicio = self._pos - 1
+                    self._pila.append("}" if c == "{" else "]")
+                continue
+            if self._en_cadena:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._en_cadena = False
+                continue
+            if c == '"':
+                self._en_cadena = True
+            elif c in "{[":
+                self._pila.append("}" if c == "{" else "]")
+            elif c in "}]":
+                self._pila.pop()
+                if not self._pila:
+                    return self._cerrar(self.texto[self.inicio:self._pos])
+                self._cortes.append((self._pos, "".join(reversed(self._pila))))
+            elif c == ",":
+                self._cortes.append((self._pos - 1, "".join(reversed(self._pila))))
+        return None
+
+    def _cerrar(self, texto: str):
+        try:
+            self.valor = _cargar(texto)
+        except ValueError:
+            # 👇 un "{" en el texto previo no era el JSON: seguir buscando
+            self.inicio = None
+            self._pila = []
+            self._cortes = []
+            return self.alimentar("")
+        self.completo = True
+        return self.valor
+
+    def resultado(self):
+        """El valor completo, o el mejor valor reparable de lo recibido; None si no hay."""
+        if self.completo or self.inicio is None:
+            return self.valor
+        cola = self.texto[self.inicio:]
+        cierres = "".join(reversed(self._pila))
+        intentos = [cola + ('"' if self._en_cadena else "") + cierres]
+        intentos += [self.texto[self.inicio:pos] + cierre for pos, cierre in reversed(self._cortes)]
+        for intento in intentos:
+            try:
+                return _cargar(intento)
+            except ValueError:
+                continue
+        return None
+
+
+def extraer_json(texto: str):
+    """Atajo para una respuesta ya completa."""
+    extractor = ExtractorJSON()
+    extractor.alimentar(texto)
+    return extractor.resultado()
+
+
+# -------------------
+# Proveedores
+# -------------------
+class ProveedorLLM(ABC):
+    """
+    Interfaz mínima de un proveedor: completar(prompt) devuelve el texto.
+    fragmentos(prompt) lo devuelve por partes; por defecto, todo de una vez.
+    """
+    nombre = "base"
+    modelo = None
+
+    @abstractmethod
+    def completar(self, prompt: str) -> str:
+        ...
+
+    def fragmentos(self, prompt: str) -> Iterator[str]:
+        yield self.completar(prompt)
+
+
+class ProveedorCohere(ProveedorLLM):
+    nombre = "cohere"
+
+    def __init__(self, api_key: Optional[str] = None, modelo: Optional[str] = None):
+        if cohere is None:
+            raise RuntimeError("cohere no está instalado")
+        self.cliente = cohere.ClientV2(api_key=api_key or os.getenv("COHERE_API_KEY"))
+        self.modelo = modelo or "command-a-plus-05-2026"
+
+    def _mensajes(self, prompt: str) -> dict:
+        return {
+            "model": self.modelo,
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"},
+        }
+
+    def completar(self, prompt: str) -> str:
+        response = self.cliente.chat(**self._mensajes(prompt))
+        # Filtrar solo los items de tipo texto
+        texts = [c.text for c in response.message.content if c.type == "text"]
+        return texts[0].strip() if texts else ""
+
+    def fragmentos(self, prompt: str) -> Iterator[str]:
+        for evento in self.cliente.chat_stream(**self._mensajes(prompt)):
+            if evento.type == "content-delta":
+                yield evento.delta.message.content.text
+
+
+class ProveedorOpenAI(ProveedorLLM):
+    nombre = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, modelo: Optional[str] = None):
+        if openai is None:
+            raise RuntimeError("openai no está instalado")
+        self.cliente = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.modelo = modelo or "gpt-4o-mini"
+
+    def _mensajes(self, prompt: str) -> dict:
+        return {
+            "model": self.modelo,
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"},
+        }
+
+    def completar(self, prompt: str) -> str:
+        response = self.cliente.chat.completions.create(**self._mensajes(prompt))
+        return (response.choices[0].message.content or "").strip()
+
+    def fragmentos(self, prompt: str) -> Iterator[str]:
+        for chunk in self.cliente.chat.completions.create(stream=True, **self._mensajes(prompt)):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class ProveedorLocal(ProveedorLLM):
+    """Sin red ni claves: para desarrollo y tests. Resume con las primeras frases."""
+    nombre = "local"
+
+    def completar(self, prompt: str) -> str:
+        titulo = re.search(r"Título: (.*)", prompt)
+        noticia = re.search(r"Noticia: (.*?)\n\s*Devuelve únicamente", prompt, re.S)
+        titulo = titulo.group(1).strip() if titulo else ""
+        frases = re.split(r"(?<=[.!?])\s+", noticia.group(1).strip() if noticia else "")
+        return json.dumps({"resumen": " ".join(frases[:2]), "preguntas": [pregunta_defecto(titulo)]})
+
+
+PROVEEDORES = {
+    "cohere": ProveedorCohere,
+    "openai": ProveedorOpenAI,
+    "local": ProveedorLocal,
+}
+
+
+def proveedor_desde_entorno() -> ProveedorLLM:
+    """Proveedor según LLM_PROVEEDOR (cohere, openai o local) y LLM_MODELO."""
+    clase = PROVEEDORES.get(LLM_PROVEEDOR)
+    if clase is None:
+        raise ValueError(f"LLM_PROVEEDOR inválido: {LLM_PROVEEDOR}")
+    if clase is ProveedorLocal:
+        return clase()
+    return clase(modelo=LLM_MODELO)
+
+
+# -------------------
+# Resumen + preguntas en una llamada
+# -------------------
+def _preguntas_validas(preguntas) -> list:
+    """Solo preguntas con texto y al menos 2 opciones; opciones como str o {"text"}."""
+    validas = []
+    for p in preguntas if isinstance(preguntas, list) else []:
+        if not isinstance(p, dict) or not isinstance(p.get("text"), str) or not p["text"].strip():
+            continue
+        opciones = []
+        for o in p.get("options") or []:
+            texto = o.get("text") if isinstance(o, dict) else o
+            if isinstance(texto, str) and texto.strip():
+                opciones.append({"text": texto.strip()})
+        if len(opciones) >= 2:
+            validas.append({"text": p["text"].strip(), "options": opciones})
+    return validas[:MAX_PREGUNTAS]
+
+
+def generar_encuesta(
+    proveedor: ProveedorLLM,
+    titulo: str,
+    texto: str,
+    cache: Optional[CacheLLM] = None,
+    esperar: Optional[Callable[[], None]] = None,
+) -> tuple:
+    """
+    Resumen y preguntas de una noticia con una sola llamada al proveedor.
+    Se corta el stream al cerrarse el JSON; lo que llegue incompleto se
+    repara y solo lo que falte se rellena (resumen con el inicio del texto,
+    preguntas con pregunta_defecto). Devuelve (resumen, preguntas).
+
+    Antes de llamar se busca en `cache` (por defecto cache.cache_llm); solo
+    se guardan respuestas que no necesitaron relleno. `esperar` (p. ej. un
+    limitador de tasa) se invoca únicamente si hay que llamar al modelo.
+    """
+    cache = cache or cache_llm
+    clave = None
+    if cache is not None:
+        clave = CacheLLM.clave(f"{proveedor.nombre}:{proveedor.modelo}", VERSION_PROMPT, titulo, texto)
+        guardado = cache.obtener(clave)
+        if guardado is not None:
+            return guardado["resumen"], guardado["preguntas"]
+
+    if esperar is not None:
+        esperar()
+    extractor = ExtractorJSON()
+    for fragmento in proveedor.fragmentos(PROMPT_ENCUESTA.format(titulo=titulo, texto=texto)):
+        if extractor.alimentar(fragmento) is not None:
+            break
+    valor = extractor.resultado()
+
+    if isinstance(valor, list):   # 👈 formato viejo: solo el arreglo de preguntas
+        valor = {"preguntas": valor}
+    if not isinstance(valor, dict):
+        logger.warning(f"⚠️ {proveedor.nombre}: respuesta sin JSON para '{titulo}'")
+        valor = {}
+
+    completa = True
+    resumen = valor.get("resumen") or valor.get("summary")
+    if not isinstance(resumen, str) or not resumen.strip():
+        resumen = texto[:MAX_RESUMEN_RESPALDO]
+        completa = False
+    preguntas = _preguntas_validas(valor.get("preguntas") or valor.get("questions"))
+    if not preguntas:
+        preguntas = [pregunta_defecto(titulo)]
+        completa = False
+
+    if clave is not None and completa:
+        cache.guardar(clave, {"resumen": resumen.strip(), "preguntas": preguntas})
+    return resumen.strip(), preguntas
@@ -10,18 +10,19 @@ from .routers import users
 from .routers import surveys, profiles, admin, comments, gamificacion, surveys_simple
 from . import models, models_simple
 from .database import engine, SessionLocal
+from .utils.paginacion import CABECERA_CURSOR, CABECERA_TOTAL
 from services.auto_surveys import generar_encuestas_desde_noticias
 from services.news_api import obtener_temas_relevantes
 from services.seed import seed_logros
 from votapp_app import rss
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime, timedelta
-import requests, os, logging, uuid, shutil
+import os, logging, uuid, shutil
 from dotenv import load_dotenv
 import votapp_app.controllers.usersControllers as usersControllers
 from typing import List
 from services.cloudinary_service import upload_avatar
-from votapp_app.tasks import cerrar_encuestas_por_presupuesto
+from votapp_app import jobs
+from votapp_app.utils.gamificacion import metricas_outbox
 
 import cohere
 import traceback
@@ -36,8 +37,9 @@ BASE_URL = os.getenv("APP_BASE_URL", "https://aplicacion-votapp-test.onrender.co
 # -----------------------------
 # Configuración global de logging
 # -----------------------------
+# 👇 único lugar que configura el root logger (los módulos solo piden su logger)
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("LOG_LEVEL", "DEBUG").upper(),
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
 logger = logging.getLogger(__name__)
@@ -71,6 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CABECERA_CURSOR, CABECERA_TOTAL],   # 👈 paginación por cursor
 )
 
 # -----------------------------
@@ -120,6 +123,21 @@ app.include_router(surveys_simple.router, prefix="/api")
 def read_root():
     return {"message": "API Votapp funcionando correctamente 🚀"}
 
+# -----------------------------
+# Health check
+# -----------------------------
+@app.get("/salud")
+def salud():
+    # 👇 503 si el outbox de gamificación no se vacía (jobs caídos o sin desplegar)
+    db = SessionLocal()
+    try:
+        outbox = metricas_outbox(db)
+    finally:
+        db.close()
+    if outbox["alerta"]:
+        return JSONResponse(status_code=503, content={"estado": "degradado", "gamificacion": outbox})
+    return {"estado": "ok", "gamificacion": outbox}
+
 # -----------------------------
 # Endpoint NewsAPI
 # -----------------------------
@@ -150,56 +168,17 @@ def listar_encuestas(limit: int = 10, ciudad: str = None):
     return [{"id": e.id, "title": e.title, "description": e.description, "media_url": e.media_url} for e in encuestas]
 
 # -----------------------------
-# Scheduler con APScheduler
+# Scheduler en el proceso web
 # -----------------------------
-scheduler = BackgroundScheduler()
-
-def job_youtube():
-    try:
-        url = BASE_URL + "/api/youtube/diariolibre"
-        print("🚀 job_youtube disparado, URL:", url)
-        r = requests.get(url)
-        print("📡 job_youtube status:", r.status_code)
-        if r.status_code == 200:
-            print("✅ Encuestas de YouTube actualizadas")
-        else:
-            print("❌ Error en job_youtube:", r.text)
-    except Exception as e:
-        print("❌ Excepción en job_youtube:", e)
-
-def job_rss():
-    try:
-        url = BASE_URL + "/api/rss/diariolibre"
-        print("🚀 job_rss disparado, URL:", url)
-        r = requests.get(url)
-        print("📡 job_rss status:", r.status_code)
-        if r.status_code == 200:
-            print("✅ Encuestas de RSS actualizadas")
-        else:
-            print("❌ Error en job_rss:", r.text)
-    except Exception as e:
-        print("❌ Excepción en job_rss:", e)
-
-
-def job_presupuesto():
-    try:
-        print("🚀 job_presupuesto disparado")
-        cerrar_encuestas_por_presupuesto()
-        print("✅ Encuestas patrocinadas cerradas por presupuesto agotado")
-    except Exception as e:
-        print("❌ Error en job_presupuesto:", e)
-
-# Intervalos reducidos para probar más rápido
-scheduler.add_job(job_youtube, "interval", hours=8)
-scheduler.add_job(job_rss, "interval", hours=8)
-scheduler.add_job(job_presupuesto, "interval", hours=8)
-scheduler.start()
-
-@app.on_event("startup")
-def startup_event():
-    scheduler.add_job(job_youtube, "date", run_date=datetime.utcnow() + timedelta(seconds=10))
-    scheduler.add_job(job_rss, "date", run_date=datetime.utcnow() + timedelta(seconds=15))
-    scheduler.add_job(job_presupuesto, "date", run_date=datetime.utcnow() + timedelta(seconds=20))
+# 👇 Por defecto los jobs siguen corriendo aquí, como antes: un despliegue
+# que se actualiza no se queda sin ingesta, cierres, conteos ni gamificación.
+# Con el runner propio desplegado (python -m votapp_app.jobs), poner
+# SCHEDULER_EN_WEB=0 en el web. El lock de votapp_app.jobs evita
+# duplicados entre workers y con el runner.
+if os.getenv("SCHEDULER_EN_WEB", "1") != "0":
+    scheduler = BackgroundScheduler()
+    jobs.programar(scheduler)
+    scheduler.start()
 
 # -----------------------------
 # Adaptador para Cloud Functions
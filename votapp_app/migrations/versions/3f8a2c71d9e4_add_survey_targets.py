@@ -0,0 +1,86 @@
+"""add survey_targets (segmentación normalizada) con backfill
+
+Revision ID: 3f8a2c71d9e4
+Revises: c09f32608755
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a2c71d9e4'
+down_revision: Union[str, Sequence[str], None] = 'c09f32608755'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CAMPOS = (
+    "sexo", "ciudad", "ocupacion", "profesion",
+    "nivel_educativo", "religion", "nacionalidad", "estado_civil",
+)
+
+
+def _parse(valor):
+    # Mismo criterio tolerante que safe_json_list
+    if not valor:
+        return []
+    try:
+        data = json.loads(valor)
+    except Exception:
+        return []
+    if isinstance(data, str):
+        data = [data]
+    return data if isinstance(data, list) else []
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'survey_targets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('survey_id', sa.Integer(), nullable=False),
+        sa.Column('field', sa.String(length=32), nullable=False),
+        sa.Column('value', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('survey_id', 'field', 'value', name='unique_survey_target'),
+    )
+    op.create_index(op.f('ix_survey_targets_id'), 'survey_targets', ['id'], unique=False)
+    op.create_index('ix_survey_targets_field_value', 'survey_targets', ['field', 'value'], unique=False)
+
+    # 👇 Backfill desde las columnas JSON-en-Text de surveys
+    conn = op.get_bind()
+    surveys = sa.table('surveys', sa.column('id', sa.Integer), *[sa.column(c, sa.Text) for c in CAMPOS])
+    targets = sa.table(
+        'survey_targets',
+        sa.column('survey_id', sa.Integer),
+        sa.column('field', sa.String),
+        sa.column('value', sa.String),
+    )
+
+    filas = []
+    for row in conn.execute(sa.select(surveys)).mappings():
+        for campo in CAMPOS:
+            vistos = set()
+            for v in _parse(row[campo]):
+                v = str(v).strip() if v is not None else ""
+                if v and v not in vistos:
+                    vistos.add(v)
+                    filas.append({"survey_id": row["id"], "field": campo, "value": v})
+        if len(filas) >= 5000:
+            op.bulk_insert(targets, filas)
+            filas = []
+    if filas:
+        op.bulk_insert(targets, filas)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_survey_targets_field_value', table_name='survey_targets')
+    op.drop_index(op.f('ix_survey_targets_id'), table_name='survey_targets')
+    op.drop_table('survey_targets')
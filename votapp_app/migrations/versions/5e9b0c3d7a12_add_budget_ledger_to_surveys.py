@@ -0,0 +1,66 @@
+"""add budget ledger (spent_budget, remaining_budget, fondos_agotados) to surveys
+
+Revision ID: 5e9b0c3d7a12
+Revises: d4a7c2e91b56
+Create Date: 2026-10-18 14:22:47.160954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9b0c3d7a12'
+down_revision: Union[str, Sequence[str], None] = 'd4a7c2e91b56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Copia de models.REMAINING_BUDGET_SQL / FONDOS_AGOTADOS_SQL en esta revisión
+REMAINING_BUDGET_SQL = "COALESCE(presupuesto_total, 0) - spent_budget"
+FONDOS_AGOTADOS_SQL = (
+    "COALESCE(patrocinada, false) AND "
+    "COALESCE(presupuesto_total, 0) - spent_budget < "
+    "CASE WHEN COALESCE(recompensa_dinero, 0) > 1 THEN recompensa_dinero ELSE 1 END"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'surveys',
+        sa.Column('spent_budget', sa.Integer(), server_default='0', nullable=False),
+    )
+
+    # 👇 Backfill: lo ya pagado a votantes según sponsor_transactions
+    op.execute(
+        """
+        UPDATE surveys s
+        SET spent_budget = t.total
+        FROM (
+            SELECT survey_id, COALESCE(SUM(monto_dinero), 0) AS total
+            FROM sponsor_transactions
+            GROUP BY survey_id
+        ) t
+        WHERE t.survey_id = s.id
+        """
+    )
+
+    op.add_column(
+        'surveys',
+        sa.Column('remaining_budget', sa.Integer(), sa.Computed(REMAINING_BUDGET_SQL, persisted=True)),
+    )
+    op.add_column(
+        'surveys',
+        sa.Column('fondos_agotados', sa.Boolean(), sa.Computed(FONDOS_AGOTADOS_SQL, persisted=True)),
+    )
+    op.create_index(op.f('ix_surveys_fondos_agotados'), 'surveys', ['fondos_agotados'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_surveys_fondos_agotados'), table_name='surveys')
+    op.drop_column('surveys', 'fondos_agotados')
+    op.drop_column('surveys', 'remaining_budget')
+    op.drop_column('surveys', 'spent_budget')
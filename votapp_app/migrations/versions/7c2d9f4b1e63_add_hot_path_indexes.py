@@ -0,0 +1,52 @@
+"""add indexes for hot query predicates (votes, participaciones, comments, social, wallet, surveys)
+
+Revision ID: 7c2d9f4b1e63
+Revises: e3c5a9d17f40
+Create Date: 2026-10-18 16:20:05.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d9f4b1e63'
+down_revision: Union[str, Sequence[str], None] = 'e3c5a9d17f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nombre, tabla, columnas)
+INDICES = [
+    ('ix_votes_survey_id', 'votes', ['survey_id']),
+    ('ix_votes_option_id', 'votes', ['option_id']),
+    ('ix_votes_usuario_survey', 'votes', ['usuario_id', 'survey_id']),
+    ('ix_participaciones_usuario_survey', 'participaciones', ['usuario_id', 'survey_id']),
+    ('ix_comments_survey_id', 'comments', ['survey_id']),
+    ('ix_comments_usuario_id', 'comments', ['usuario_id']),
+    ('ix_notifications_user_status', 'notifications', ['user_id', 'status']),
+    ('ix_friends_user_status', 'friends', ['user_id', 'status']),
+    ('ix_friends_friend_status', 'friends', ['friend_id', 'status']),
+    ('ix_wallet_movements_wallet_id', 'wallet_movements', ['wallet_id']),
+    ('ix_sponsor_transactions_survey_id', 'sponsor_transactions', ['survey_id']),
+    ('ix_surveys_active_closed_reason_expiracion', 'surveys', ['active', 'closed_reason', 'fecha_expiracion']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 👇 CONCURRENTLY no bloquea escrituras (votos) mientras se construye el
+    # índice, pero no puede correr dentro de una transacción
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas in INDICES:
+            op.create_index(
+                nombre, tabla, columnas, unique=False,
+                if_not_exists=True, postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for nombre, tabla, _ in reversed(INDICES):
+            op.drop_index(nombre, table_name=tabla, if_exists=True, postgresql_concurrently=True)
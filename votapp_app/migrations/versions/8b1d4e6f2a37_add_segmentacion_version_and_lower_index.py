@@ -0,0 +1,41 @@
+"""add segmentacion_version to surveys and lower(value) index on survey_targets
+
+Revision ID: 8b1d4e6f2a37
+Revises: 3f8a2c71d9e4
+Create Date: 2026-10-18 11:40:05.532917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1d4e6f2a37'
+down_revision: Union[str, Sequence[str], None] = '3f8a2c71d9e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'surveys',
+        sa.Column('segmentacion_version', sa.Integer(), server_default='0', nullable=False),
+    )
+    # 👇 el matching ahora no distingue mayúsculas
+    op.drop_index('ix_survey_targets_field_value', table_name='survey_targets')
+    op.create_index(
+        'ix_survey_targets_field_lower_value',
+        'survey_targets',
+        ['field', sa.text('lower(value)')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_survey_targets_field_lower_value', table_name='survey_targets')
+    op.create_index('ix_survey_targets_field_value', 'survey_targets', ['field', 'value'], unique=False)
+    op.drop_column('surveys', 'segmentacion_version')
@@ -0,0 +1,57 @@
+"""add gamificacion_eventos (outbox de gamificación)
+
+Revision ID: a61f3e8c2b94
+Revises: 5e9b0c3d7a12
+Create Date: 2026-10-18 15:10:33.874120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61f3e8c2b94'
+down_revision: Union[str, Sequence[str], None] = '5e9b0c3d7a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'gamificacion_eventos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('survey_id', sa.Integer(), nullable=True),
+        sa.Column('tipo', sa.String(length=32), nullable=False),
+        sa.Column('puntos', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(), nullable=False),
+        sa.Column('procesado_en', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_gamificacion_eventos_pendientes',
+        'gamificacion_eventos',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('procesado_en IS NULL'),
+    )
+    op.create_index(
+        'ix_gamificacion_eventos_usuario_pendientes',
+        'gamificacion_eventos',
+        ['usuario_id'],
+        unique=False,
+        postgresql_where=sa.text('procesado_en IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_gamificacion_eventos_usuario_pendientes', table_name='gamificacion_eventos')
+    op.drop_index('ix_gamificacion_eventos_pendientes', table_name='gamificacion_eventos')
+    op.drop_table('gamificacion_eventos')
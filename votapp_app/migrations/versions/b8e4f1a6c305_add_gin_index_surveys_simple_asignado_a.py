@@ -0,0 +1,40 @@
+"""add GIN index on surveys_simple.asignado_a and index on usuario_id
+
+Revision ID: b8e4f1a6c305
+Revises: 7c2d9f4b1e63
+Create Date: 2026-10-18 16:24:41.907352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4f1a6c305'
+down_revision: Union[str, Sequence[str], None] = '7c2d9f4b1e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 👇 "propias o asignadas": usuario_id = :u OR asignado_a @> ARRAY[:u]
+    # necesita índice en las dos ramas para un BitmapOr
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_surveys_simple_asignado_a', 'surveys_simple', ['asignado_a'],
+            unique=False, if_not_exists=True,
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_surveys_simple_usuario_id', 'surveys_simple', ['usuario_id'],
+            unique=False, if_not_exists=True, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_surveys_simple_usuario_id', table_name='surveys_simple', if_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_surveys_simple_asignado_a', table_name='surveys_simple', if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,42 @@
+"""add job_runs (corridas de jobs programados)
+
+Revision ID: c7a3e5f9d214
+Revises: b8e4f1a6c305
+Create Date: 2026-10-18 18:02:15.413870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a3e5f9d214'
+down_revision: Union[str, Sequence[str], None] = 'b8e4f1a6c305'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'job_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=64), nullable=False),
+        sa.Column('estado', sa.String(length=16), nullable=False),
+        sa.Column('instancia', sa.String(length=128), nullable=True),
+        sa.Column('inicio', sa.DateTime(), nullable=False),
+        sa.Column('fin', sa.DateTime(), nullable=True),
+        sa.Column('duracion_ms', sa.Integer(), nullable=True),
+        sa.Column('resultado', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_runs_nombre_inicio', 'job_runs', ['nombre', 'inicio'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_runs_nombre_inicio', table_name='job_runs')
+    op.drop_table('job_runs')
@@ -0,0 +1,50 @@
+"""add vote_tallies (conteo materializado de votos)
+
+Revision ID: d4a7c2e91b56
+Revises: 8b1d4e6f2a37
+Create Date: 2026-10-18 13:05:12.408311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c2e91b56'
+down_revision: Union[str, Sequence[str], None] = '8b1d4e6f2a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'vote_tallies',
+        sa.Column('option_id', sa.Integer(), nullable=False),
+        sa.Column('survey_id', sa.Integer(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['option_id'], ['options.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('option_id'),
+    )
+    op.create_index(op.f('ix_vote_tallies_survey_id'), 'vote_tallies', ['survey_id'], unique=False)
+
+    # 👇 Backfill desde votes (misma consulta que tasks.reconciliar_conteos)
+    op.execute(
+        """
+        INSERT INTO vote_tallies (survey_id, question_id, option_id, count)
+        SELECT survey_id, question_id, option_id, count(id)
+        FROM votes
+        GROUP BY survey_id, question_id, option_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_vote_tallies_survey_id'), table_name='vote_tallies')
+    op.drop_table('vote_tallies')
@@ -0,0 +1,61 @@
+"""add tasks (cola de tareas en segundo plano)
+
+Revision ID: d91b6f3a8c57
+Revises: c7a3e5f9d214
+Create Date: 2026-10-18 18:47:52.106338
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91b6f3a8c57'
+down_revision: Union[str, Sequence[str], None] = 'c7a3e5f9d214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tasks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('estado', sa.String(length=16), nullable=False),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('max_intentos', sa.Integer(), nullable=False),
+        sa.Column('disponible_en', sa.DateTime(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(), nullable=False),
+        sa.Column('iniciado_en', sa.DateTime(), nullable=True),
+        sa.Column('vence_en', sa.DateTime(), nullable=True),
+        sa.Column('terminado_en', sa.DateTime(), nullable=True),
+        sa.Column('duracion_ms', sa.Integer(), nullable=True),
+        sa.Column('worker', sa.String(length=128), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_tasks_pendientes',
+        'tasks',
+        ['disponible_en', 'id'],
+        unique=False,
+        postgresql_where=sa.text("estado = 'pendiente'"),
+    )
+    op.create_index(
+        'ix_tasks_corriendo',
+        'tasks',
+        ['vence_en'],
+        unique=False,
+        postgresql_where=sa.text("estado = 'corriendo'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_corriendo', table_name='tasks')
+    op.drop_index('ix_tasks_pendientes', table_name='tasks')
+    op.drop_table('tasks')
@@ -0,0 +1,60 @@
+"""add metrica and umbral to logros (reglas por umbral)
+
+Revision ID: e3c5a9d17f40
+Revises: a61f3e8c2b94
+Create Date: 2026-10-18 15:48:12.503318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3c5a9d17f40'
+down_revision: Union[str, Sequence[str], None] = 'a61f3e8c2b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Reglas que antes estaban fijas en routers/logros.py (nombre → métrica, umbral)
+REGLAS = [
+    ("Primer voto", "puntos", 1),
+    ("10 encuestas completadas", "encuestas", 10),
+    ("50 encuestas completadas", "encuestas", 50),
+    ("100 encuestas completadas", "encuestas", 100),
+    ("Racha de 7 días", "racha_dias", 7),
+    ("Racha de 30 días", "racha_dias", 30),
+    ("Racha de 100 días", "racha_dias", 100),
+    ("100 puntos acumulados", "puntos", 100),
+    ("500 puntos acumulados", "puntos", 500),
+    ("1000 puntos acumulados", "puntos", 1000),
+    ("2500 puntos acumulados", "puntos", 2500),
+    ("5000 puntos acumulados", "puntos", 5000),
+    ("10000 puntos acumulados", "puntos", 10000),
+    ("Nivel 5 alcanzado", "nivel", 5),
+    ("Nivel 10 alcanzado", "nivel", 10),
+    ("Nivel 20 alcanzado", "nivel", 20),
+    ("Nivel 30 alcanzado", "nivel", 30),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('logros', sa.Column('metrica', sa.String(length=32), nullable=True))
+    op.add_column('logros', sa.Column('umbral', sa.Integer(), nullable=True))
+
+    # 👇 Backfill por nombre de los logros ya sembrados
+    logros = sa.table('logros', sa.column('nombre', sa.String), sa.column('metrica', sa.String), sa.column('umbral', sa.Integer))
+    for nombre, metrica, umbral in REGLAS:
+        op.execute(
+            logros.update()
+            .where(logros.c.nombre == nombre)
+            .values(metrica=metrica, umbral=umbral)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('logros', 'umbral')
+    op.drop_column('logros', 'metrica')
@@ -0,0 +1,40 @@
+"""add indexes on questions.survey_id and options.question_id
+
+Revision ID: f4c8a2d6e915
+Revises: d91b6f3a8c57
+Create Date: 2026-10-18 21:05:41.337102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c8a2d6e915'
+down_revision: Union[str, Sequence[str], None] = 'd91b6f3a8c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nombre, tabla, columnas): selectinload de preguntas y opciones en los listados
+INDICES = [
+    ('ix_questions_survey_id', 'questions', ['survey_id']),
+    ('ix_options_question_id', 'options', ['question_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas in INDICES:
+            op.create_index(
+                nombre, tabla, columnas, unique=False,
+                if_not_exists=True, postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for nombre, tabla, _ in reversed(INDICES):
+            op.drop_index(nombre, table_name=tabla, if_exists=True, postgresql_concurrently=True)
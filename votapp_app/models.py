@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, ForeignKey, DateTime, UniqueConstraint, Boolean, Enum
+    Column, Integer, String, Text, ForeignKey, DateTime, UniqueConstraint, Boolean, Enum, Index, Computed
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -11,6 +11,7 @@ from sqlalchemy.sql import func
 from .database import Base
 
 import enum
+import json
 
 
 # -----------------------------
@@ -22,6 +23,15 @@ class VisibilidadResultados(enum.Enum):
     privada = "privada"
 
 
+# Columnas generadas del presupuesto (Survey); la migración usa las mismas
+REMAINING_BUDGET_SQL = "COALESCE(presupuesto_total, 0) - spent_budget"
+FONDOS_AGOTADOS_SQL = (
+    "COALESCE(patrocinada, false) AND "
+    "COALESCE(presupuesto_total, 0) - spent_budget < "
+    "CASE WHEN COALESCE(recompensa_dinero, 0) > 1 THEN recompensa_dinero ELSE 1 END"
+)
+
+
 
 # -----------------------------
 # Usuarios
@@ -160,6 +170,13 @@ class Survey(Base):
     recompensa_puntos = Column(Integer, default=0)
     recompensa_dinero = Column(Integer, default=0)
     presupuesto_total = Column(Integer, default=0)
+
+    # 👇 Libro de presupuesto: el voto suma a spent_budget con un UPDATE
+    # condicional (utils/votacion.cobrar_presupuesto); lo demás se deriva
+    spent_budget = Column(Integer, default=0, server_default="0", nullable=False)
+    remaining_budget = Column(Integer, Computed(REMAINING_BUDGET_SQL, persisted=True))
+    fondos_agotados = Column(Boolean, Computed(FONDOS_AGOTADOS_SQL, persisted=True), index=True)
+
     visibilidad_resultados = Column(Enum(VisibilidadResultados), default=VisibilidadResultados.publica)
     source_url = Column(String, unique=True, nullable=True)
 
@@ -175,6 +192,98 @@ class Survey(Base):
     closed_at = Column(DateTime, nullable=True)
     closed_reason = Column(String, nullable=True)  # "expired", "funds", "paused"
 
+    # 👇 Segmentación normalizada (fuente de verdad para el matching)
+    segmentacion_version = Column(Integer, default=0, server_default="0", nullable=False)
+    targets = relationship(
+        "SurveyTarget",
+        back_populates="survey",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+        order_by="SurveyTarget.id",
+    )
+
+    __table_args__ = (
+        # Cierre automático por expiración y listados de activas/finalizadas
+        Index("ix_surveys_active_closed_reason_expiracion", "active", "closed_reason", "fecha_expiracion"),
+    )
+
+    @property
+    def segmentacion(self) -> dict:
+        """Devuelve {campo: [valores]} a partir de survey_targets."""
+        resultado = {campo: [] for campo in CAMPOS_SEGMENTACION}
+        for t in self.targets:
+            resultado.setdefault(t.field, []).append(t.value)
+        return resultado
+
+    def asignar_segmentacion(self, segmentacion: dict):
+        """
+        Reemplaza la segmentación de la encuesta.
+        Escribe survey_targets y mantiene las columnas JSON legacy en sincronía.
+        """
+        # Reutilizar filas existentes evita violar unique_survey_target al hacer flush
+        existentes = {(t.field, t.value): t for t in self.targets}
+        nuevos = []
+        for campo, valores in normalizar_segmentacion(segmentacion).items():
+            setattr(self, campo, json.dumps(valores))
+            nuevos.extend(
+                existentes.get((campo, v)) or SurveyTarget(field=campo, value=v)
+                for v in valores
+            )
+        self.targets = nuevos
+        # 👇 sello de cambio: invalida el matcher compilado en cache
+        self.segmentacion_version = (self.segmentacion_version or 0) + 1
+
+
+# -----------------------------
+# Segmentación normalizada
+# -----------------------------
+CAMPOS_SEGMENTACION = (
+    "sexo",
+    "ciudad",
+    "ocupacion",
+    "profesion",
+    "nivel_educativo",
+    "religion",
+    "nacionalidad",
+    "estado_civil",
+)
+
+
+def normalizar_segmentacion(segmentacion: dict) -> dict:
+    """{campo: [valores]} para cada campo de segmentación: sin vacíos ni repetidos, en orden."""
+    resultado = {}
+    for campo in CAMPOS_SEGMENTACION:
+        entrada = segmentacion.get(campo) or []
+        if isinstance(entrada, str):
+            entrada = [entrada]
+        valores = []
+        for v in entrada:
+            v = str(v).strip() if v is not None else ""
+            if v and v not in valores:
+                valores.append(v)
+        resultado[campo] = valores
+    return resultado
+
+
+class SurveyTarget(Base):
+    __tablename__ = "survey_targets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"), nullable=False)
+    field = Column(String(32), nullable=False)   # uno de CAMPOS_SEGMENTACION
+    value = Column(String, nullable=False)
+
+    survey = relationship("Survey", back_populates="targets")
+
+    __table_args__ = (
+        # (survey_id, field, value): "¿esta encuesta filtra por field?" y "¿acepta este valor?"
+        UniqueConstraint("survey_id", "field", "value", name="unique_survey_target"),
+    )
+
+
+# (field, lower(value)): "¿qué encuestas apuntan a este usuario?" sin distinguir mayúsculas
+Index("ix_survey_targets_field_lower_value", SurveyTarget.field, func.lower(SurveyTarget.value))
+
 
 
 class Question(Base):
@@ -182,7 +291,7 @@ class Question(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
-    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
 
     survey = relationship("Survey", back_populates="questions")
     options = relationship("Option", back_populates="question", cascade="all, delete-orphan")
@@ -192,7 +301,7 @@ class Option(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
-    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False, index=True)
 
     question = relationship("Question", back_populates="options")
     votes = relationship("Vote", back_populates="option")
@@ -201,10 +310,10 @@ class Vote(Base):
     __tablename__ = "votes"
 
     id = Column(Integer, primary_key=True, index=True)
-    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
-    option_id = Column(Integer, ForeignKey("options.id"), nullable=False)
+    option_id = Column(Integer, ForeignKey("options.id"), nullable=False, index=True)
     creado_en = Column(DateTime, default=datetime.utcnow)
 
     survey = relationship("Survey", back_populates="votes")
@@ -214,9 +323,28 @@ class Vote(Base):
 
     __table_args__ = (
         UniqueConstraint("usuario_id", "question_id", name="unique_vote_per_question"),
+        # "¿ya votó este usuario en esta encuesta?" (/votadas, /finalizadas)
+        Index("ix_votes_usuario_survey", "usuario_id", "survey_id"),
     )
 
 
+# -----------------------------
+# Conteo materializado de votos
+# -----------------------------
+class VoteTally(Base):
+    """
+    Votos por opción, mantenidos en la misma transacción que el voto
+    (ver utils/resultados.sumar_votos). Se reconstruye desde `votes`
+    con tasks.reconciliar_conteos.
+    """
+    __tablename__ = "vote_tallies"
+
+    option_id = Column(Integer, ForeignKey("options.id", ondelete="CASCADE"), primary_key=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"), nullable=False, index=True)
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), nullable=False)
+    count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 
 # -----------------------------
 # Transacciones de patrocinio
@@ -225,7 +353,7 @@ class SponsorTransaction(Base):
     __tablename__ = "sponsor_transactions"
 
     id = Column(Integer, primary_key=True, index=True)
-    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
     sponsor_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)       # 👈 antes usuario_id
     beneficiario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)  # votante
     monto_dinero = Column(Integer, nullable=False, default=0)
@@ -250,7 +378,7 @@ class MovimientoWallet(Base):
     __tablename__ = "wallet_movements"
 
     id = Column(Integer, primary_key=True, index=True)
-    wallet_id = Column(Integer, ForeignKey("wallets.id"), nullable=False)
+    wallet_id = Column(Integer, ForeignKey("wallets.id"), nullable=False, index=True)
     sponsor_transaction_id = Column(Integer, ForeignKey("sponsor_transactions.id"), nullable=False)
     tipo = Column(String, nullable=False)  # ingreso / retiro
     monto = Column(Integer, nullable=False)
@@ -283,6 +411,11 @@ class Logro(Base):
     descripcion = Column(Text)
     icono = Column(String)
 
+    # 👇 Regla automática: se obtiene cuando <metrica> >= umbral
+    # (puntos, racha_dias, nivel, encuestas). Sin métrica = logro especial.
+    metrica = Column(String(32), nullable=True)
+    umbral = Column(Integer, nullable=True)
+
 class UsuarioLogro(Base):
     __tablename__ = "usuario_logros"
 
@@ -294,6 +427,104 @@ class UsuarioLogro(Base):
     logro = relationship("Logro")
 
 
+class EventoGamificacion(Base):
+    """
+    Outbox de gamificación: el voto inserta un evento en su transacción y
+    el worker (tasks.procesar_eventos_gamificacion) lo aplica al perfil
+    y evalúa logros por lotes.
+    """
+    __tablename__ = "gamificacion_eventos"
+
+    id = Column(Integer, primary_key=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False)
+    survey_id = Column(Integer, ForeignKey("surveys.id", ondelete="SET NULL"), nullable=True)
+    tipo = Column(String(32), nullable=False, default="voto")
+    puntos = Column(Integer, nullable=False, default=0)
+    fecha = Column(Date, nullable=False)   # día de la participación (UTC)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+    procesado_en = Column(DateTime, nullable=True)
+
+
+# 👇 Solo los pendientes: la cola del worker y la proyección por usuario
+Index(
+    "ix_gamificacion_eventos_pendientes",
+    EventoGamificacion.id,
+    postgresql_where=EventoGamificacion.procesado_en.is_(None),
+)
+Index(
+    "ix_gamificacion_eventos_usuario_pendientes",
+    EventoGamificacion.usuario_id,
+    postgresql_where=EventoGamificacion.procesado_en.is_(None),
+)
+
+
+# -----------------------------
+# Corridas de jobs programados
+# -----------------------------
+class JobRun(Base):
+    """
+    Una corrida de un job de votapp_app.jobs: duración y resultado. La
+    última corrida de cada job decide si ya se ejecutó en este intervalo.
+    """
+    __tablename__ = "job_runs"
+
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String(64), nullable=False)
+    estado = Column(String(16), nullable=False, default="corriendo")   # corriendo, ok, error
+    instancia = Column(String(128), nullable=True)   # host:pid que la ejecutó
+    inicio = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fin = Column(DateTime, nullable=True)
+    duracion_ms = Column(Integer, nullable=True)
+    resultado = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_job_runs_nombre_inicio", "nombre", "inicio"),
+    )
+
+
+# -----------------------------
+# Cola de tareas en segundo plano
+# -----------------------------
+class Tarea(Base):
+    """
+    Tarea de votapp_app.cola. Ciclo: pendiente → corriendo → ok; si falla
+    vuelve a pendiente con backoff (disponible_en) hasta max_intentos, y
+    ahí queda como muerta (dead-letter) para revisarla a mano.
+    """
+    __tablename__ = "tasks"
+
+    id = Column(Integer, primary_key=True)
+    tipo = Column(String(64), nullable=False)
+    payload = Column(Text, nullable=True)   # JSON serializado: kwargs de la tarea
+    estado = Column(String(16), nullable=False, default="pendiente")   # pendiente, corriendo, ok, muerta
+    intentos = Column(Integer, nullable=False, default=0)
+    max_intentos = Column(Integer, nullable=False, default=5)
+    disponible_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+    iniciado_en = Column(DateTime, nullable=True)   # inicio real; NULL mientras espera en el lote
+    vence_en = Column(DateTime, nullable=True)      # corriendo pasado esto = worker caído
+    terminado_en = Column(DateTime, nullable=True)
+    duracion_ms = Column(Integer, nullable=True)
+    worker = Column(String(128), nullable=True)
+    error = Column(Text, nullable=True)
+
+
+# 👇 Solo las pendientes (lo que reclaman los workers) y las que están corriendo
+# (para rescatar las de un worker caído)
+Index(
+    "ix_tasks_pendientes",
+    Tarea.disponible_en,
+    Tarea.id,
+    postgresql_where=Tarea.estado == "pendiente",
+)
+Index(
+    "ix_tasks_corriendo",
+    Tarea.vence_en,
+    postgresql_where=Tarea.estado == "corriendo",
+)
+
+
 
 # -----------------------------
 # Modelo de Comentarios
@@ -302,8 +533,8 @@ class Comment(Base):
     __tablename__ = "comments"
 
     id = Column(Integer, primary_key=True, index=True)
-    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -329,6 +560,10 @@ class Participacion(Base):
     survey = relationship("Survey", back_populates="participaciones")
     user = relationship("Usuario", back_populates="participaciones")
 
+    __table_args__ = (
+        Index("ix_participaciones_usuario_survey", "usuario_id", "survey_id"),
+    )
+
 
 
 # -----------------------------
@@ -1,5 +1,5 @@
 # votapp_app/models_simple.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from sqlalchemy.sql import func
@@ -16,7 +16,7 @@ class SurveySimple(Base):
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
 
     # Usuario creador (puede ser null si es anónima)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True, index=True)
 
     # Usuario asignado (array de destinatarios)
     asignado_a = Column(ARRAY(Integer), default=[])
@@ -41,6 +41,11 @@ class SurveySimple(Base):
     # 👇 Nueva relación con asignaciones
     assignments = relationship("SurveyAssignment", back_populates="survey", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # 👇 GIN: asignado_a @> ARRAY[:usuario_id]
+        Index("ix_surveys_simple_asignado_a", "asignado_a", postgresql_using="gin"),
+    )
+
 
 class SurveySimpleQuestion(Base):
     __tablename__ = "surveys_simple_questions"
@@ -1,7 +1,7 @@
 
 # votapp_app/models_social.py
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -16,7 +16,12 @@ class Friend(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
-    __table_args__ = (UniqueConstraint("user_id", "friend_id", name="unique_friendship"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "friend_id", name="unique_friendship"),
+        # Solicitudes enviadas / recibidas por estado
+        Index("ix_friends_user_status", "user_id", "status"),
+        Index("ix_friends_friend_status", "friend_id", "status"),
+    )
 
     # Relaciones
     user = relationship("Usuario", foreign_keys=[user_id])
@@ -37,5 +42,10 @@ class Notification(Base):
     # Relaciones
     user = relationship("Usuario", foreign_keys=[user_id])
 
+    __table_args__ = (
+        # Bandeja del usuario filtrada por unread/read
+        Index("ix_notifications_user_status", "user_id", "status"),
+    )
+
 
 
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from typing import List
 from .. import models, database, schemas
-from ..auth import get_current_user
+from .. import cola, tasks  # noqa: F401  👈 tasks registra los handlers de la cola
+from ..models import CAMPOS_SEGMENTACION
+from ..auth import cache_identidad, get_current_user, get_read_db
+from ..cache import cache_llm, cache_resultados
+from ..utils.creacion import crear_encuestas
+from ..utils.gamificacion import metricas_outbox
+from ..utils.paginacion import ParametrosPagina, paginar
 
 import json
+import os
+from datetime import timedelta
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -20,24 +30,21 @@ def get_current_admin(usuario: models.Usuario = Depends(get_current_user)):
 # -------------------
 @router.get("/surveys")
 def listar_encuestas_admin(
-    db: Session = Depends(database.get_db),
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
+    db: Session = Depends(get_read_db),
     admin: models.Usuario = Depends(get_current_admin)
 ):
-    surveys = db.query(models.Survey).order_by(models.Survey.id.desc()).all()
+    resultado = paginar(db.query(models.Survey), [models.Survey.id], pagina)
+    resultado.cabeceras(response)
     result = []
-    for s in surveys:
+    for s in resultado.items:
         result.append({
             "id": s.id,
             "title": s.title,
             "description": s.description,
             "fecha_expiracion": s.fecha_expiracion,
-            "sexo": json.loads(s.sexo) if s.sexo else [],
-            "ciudad": json.loads(s.ciudad) if s.ciudad else [],
-            "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-            "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-            "religion": json.loads(s.religion) if s.religion else [],
-            "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-            "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
+            **s.segmentacion,   # 👈 desde survey_targets
             "media_url": s.media_url,
             "media_urls": json.loads(s.media_urls) if s.media_urls else [],
             "visibilidad_resultados": s.visibilidad_resultados.value,
@@ -50,6 +57,62 @@ def listar_encuestas_admin(
     return result
 
 
+# -------------------
+# Importar encuestas en lote (una transacción)
+# -------------------
+IMPORT_MAX = int(os.getenv("ADMIN_IMPORT_MAX", "1000"))
+
+
+@router.post("/surveys/import", response_model=schemas.SurveyImportOut)
+def importar_encuestas(
+    encuestas: List[schemas.SurveyImport],
+    db: Session = Depends(database.get_db),
+    admin: models.Usuario = Depends(get_current_admin)
+):
+    if not encuestas:
+        raise HTTPException(status_code=400, detail="No se enviaron encuestas")
+    if len(encuestas) > IMPORT_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {IMPORT_MAX} encuestas por lote")
+    if any(e.patrocinada for e in encuestas):
+        # 👈 las patrocinadas mueven billeteras: se crean una por una desde el sponsor
+        raise HTTPException(status_code=400, detail="La importación no admite encuestas patrocinadas")
+
+    creadores = {e.usuario_id for e in encuestas if e.usuario_id is not None}
+    existentes = {uid for (uid,) in db.query(models.Usuario.id).filter(models.Usuario.id.in_(creadores))}
+    if creadores - existentes:
+        raise HTTPException(status_code=400, detail=f"Usuarios inexistentes: {sorted(creadores - existentes)}")
+
+    filas = []
+    for e in encuestas:
+        fecha = e.fecha_expiracion
+        filas.append({
+            "title": e.title,
+            "description": e.description,
+            "fecha_expiracion": fecha.replace(tzinfo=None) if fecha and fecha.tzinfo else fecha,
+            "media_url": e.media_url,
+            "media_urls": json.dumps(e.media_urls or []),
+            "patrocinada": False,
+            "patrocinador": e.patrocinador,
+            "recompensa_puntos": e.recompensa_puntos or 0,
+            "recompensa_dinero": 0,
+            "presupuesto_total": e.presupuesto_total or 0,
+            "visibilidad_resultados": e.visibilidad_resultados,
+            "source_url": e.source_url,
+            "usuario_id": e.usuario_id or admin.id,
+            "segmentacion": {campo: getattr(e, campo) for campo in CAMPOS_SEGMENTACION},
+            "questions": e.questions,
+        })
+
+    try:
+        creadas = crear_encuestas(db, filas)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Alguna encuesta ya existe (source_url repetido)")
+
+    return {"creadas": len(creadas), "ids": [c["id"] for c in creadas]}
+
+
 # -------------------
 # Modificar encuesta (solo cambios seguros si ya tiene votos)
 # -------------------
@@ -110,8 +173,9 @@ def eliminar_encuesta(
     if not survey:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada")
 
-    # Borrar votos asociados
+    # Borrar votos asociados (y su conteo materializado)
     db.query(models.Vote).filter(models.Vote.survey_id == survey_id).delete()
+    db.query(models.VoteTally).filter(models.VoteTally.survey_id == survey_id).delete()
 
     # Borrar opciones y preguntas asociadas
     for question in survey.questions:
@@ -121,6 +185,7 @@ def eliminar_encuesta(
     # Finalmente borrar la encuesta
     db.delete(survey)
     db.commit()
+    cache_resultados.invalidar(survey_id)
 
     return {
         "message": f"Encuesta {survey_id} eliminada correctamente",
@@ -202,13 +267,7 @@ def historial_encuestas(
             "description": s.description,
             "fecha_expiracion": s.fecha_expiracion,
             "version": s.version,
-            "sexo": json.loads(s.sexo) if s.sexo else [],
-            "ciudad": json.loads(s.ciudad) if s.ciudad else [],
-            "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-            "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-            "religion": json.loads(s.religion) if s.religion else [],
-            "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-            "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
+            **s.segmentacion,   # 👈 desde survey_targets
             "media_url": s.media_url,
             "media_urls": json.loads(s.media_urls) if s.media_urls else [],
             "visibilidad_resultados": s.visibilidad_resultados.value,
@@ -223,3 +282,75 @@ def historial_encuestas(
 
 
 
+
+
+# -------------------
+# Métricas internas (cache, etc.)
+# -------------------
+@router.get("/metricas")
+def metricas(db: Session = Depends(get_read_db), admin: models.Usuario = Depends(get_current_admin)):
+    return {
+        "cache_resultados": cache_resultados.metricas(),
+        "cache_identidad": cache_identidad.metricas(),
+        "cache_llm": cache_llm.metricas() if cache_llm else None,
+        "pool": database.metricas_pool(),
+        "replica": database.enrutador_lectura.metricas(),
+        "cola": cola.metricas(db),
+        "gamificacion": metricas_outbox(db),
+    }
+
+
+# -------------------
+# Corridas de jobs programados
+# -------------------
+@router.get("/jobs")
+def job_runs(
+    nombre: str = None,
+    limit: int = 50,
+    db: Session = Depends(get_read_db),
+    admin: models.Usuario = Depends(get_current_admin),
+):
+    query = db.query(models.JobRun)
+    if nombre:
+        query = query.filter(models.JobRun.nombre == nombre)
+    corridas = query.order_by(models.JobRun.inicio.desc()).limit(min(limit, 500)).all()
+    return [
+        {
+            "id": c.id,
+            "nombre": c.nombre,
+            "estado": c.estado,
+            "instancia": c.instancia,
+            "inicio": c.inicio,
+            "fin": c.fin,
+            "duracion_ms": c.duracion_ms,
+            "resultado": c.resultado,
+            "error": c.error,
+        }
+        for c in corridas
+    ]
+
+
+# -------------------
+# Cola de tareas
+# -------------------
+@router.post("/tareas", response_model=schemas.TareaOut)
+def encolar_tarea(
+    datos: schemas.TareaIn,
+    db: Session = Depends(database.get_db),
+    admin: models.Usuario = Depends(get_current_admin),
+):
+    if datos.tipo not in cola.TAREAS:
+        raise HTTPException(status_code=400, detail=f"Tarea desconocida. Disponibles: {sorted(cola.TAREAS)}")
+    nueva = cola.encolar(db, datos.tipo, datos.payload, retraso=timedelta(seconds=max(datos.retraso_segundos, 0)))
+    db.commit()
+    db.refresh(nueva)
+    return nueva
+
+
+@router.post("/tareas/reintentar")
+def reintentar_tareas(
+    tipo: str = None,
+    db: Session = Depends(database.get_db),
+    admin: models.Usuario = Depends(get_current_admin),
+):
+    return {"reencoladas": cola.reintentar_muertas(db, tipo)}
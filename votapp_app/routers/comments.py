@@ -1,9 +1,11 @@
 
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from votapp_app import models, schemas, database
-from votapp_app.auth import get_current_user
+from votapp_app.auth import get_current_user, get_current_user_async
+from votapp_app.database import get_async_db
+from votapp_app.utils.paginacion import ParametrosPagina, paginar
 
 
 
@@ -11,10 +13,10 @@ router = APIRouter(prefix="/comments", tags=["comments"])
 
 # ✅ Crear comentario
 @router.post("/", response_model=schemas.CommentOut)
-def create_comment(
+async def create_comment(
     comment: schemas.CommentCreate,
-    db: Session = Depends(database.get_db),
-    current_user: models.Usuario = Depends(get_current_user)
+    db=Depends(get_async_db),
+    current_user: models.Usuario = Depends(get_current_user_async)
 ):
     # ✅ Validaciones extra
     if not comment.content.strip():
@@ -22,15 +24,19 @@ def create_comment(
     if len(comment.content) > 500:
         raise HTTPException(status_code=400, detail="El comentario no puede superar los 500 caracteres")
 
+    return await db.run_sync(_crear_comentario, comment, current_user.id)
+
+
+def _crear_comentario(db: Session, comment: schemas.CommentCreate, usuario_id: int) -> schemas.CommentOut:
     # 1. Verificar que la encuesta existe
     survey = db.query(models.Survey).filter(models.Survey.id == comment.survey_id).first()
     if not survey:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada")
 
     # 2. Verificar que el usuario participó en la encuesta
-    participation = db.query(models.Vote).filter(
+    participation = db.query(models.Vote.id).filter(
         models.Vote.survey_id == comment.survey_id,
-        models.Vote.usuario_id == current_user.id
+        models.Vote.usuario_id == usuario_id
     ).first()
     if not participation:
         raise HTTPException(status_code=403, detail="Solo los participantes pueden comentar")
@@ -38,52 +44,66 @@ def create_comment(
     # 3. Crear el comentario
     new_comment = models.Comment(
         survey_id=comment.survey_id,
-        usuario_id=current_user.id,
+        usuario_id=usuario_id,
         content=comment.content
     )
     db.add(new_comment)
     db.commit()
     db.refresh(new_comment)
 
-    return new_comment
+    # 👇 se serializa aquí, dentro de la sesión
+    return schemas.CommentOut.model_validate(new_comment)
 
 
 
 # ✅ Listar comentarios de una encuesta
 @router.get("/survey/{survey_id}", response_model=list[schemas.CommentOut])
-def get_comments_for_survey(
+async def get_comments_for_survey(
     survey_id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.Usuario = Depends(get_current_user)
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
+    order: str = Query("asc", pattern="^(asc|desc)$"),   # 👈 por fecha de creación; la app espera asc
+    db=Depends(get_async_db),
+    current_user: models.Usuario = Depends(get_current_user_async)
 ):
+    resultado = await db.run_sync(_comentarios_de_encuesta, survey_id, pagina, order == "desc")
+    resultado.cabeceras(response)
+    return resultado.items
+
+
+def _comentarios_de_encuesta(db: Session, survey_id: int, pagina: ParametrosPagina, desc: bool):
     # 1. Verificar que la encuesta existe
-    survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
+    survey = db.query(models.Survey.id).filter(models.Survey.id == survey_id).first()
     if not survey:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada")
 
-    # 2. Obtener todos los comentarios asociados
-    comments = db.query(models.Comment).filter(models.Comment.survey_id == survey_id).all()
+    # 2. Una página de comentarios (keyset por id: mismo orden que created_at)
+    query = db.query(models.Comment).filter(models.Comment.survey_id == survey_id)
+    resultado = paginar(query, [models.Comment.id], pagina, desc=desc)
 
-    return comments
+    resultado.items = [schemas.CommentOut.model_validate(c) for c in resultado.items]
+    return resultado
 
 # ✅ Listar comentarios de un usuario
 @router.get("/user/{user_id}", response_model=list[schemas.CommentOut])
 def get_comments_for_user(
     user_id: int,
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(get_current_user)
 ):
     # 1. Verificar que el usuario existe
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
+    usuario = db.query(models.Usuario.id).filter(models.Usuario.id == user_id).first()
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    # 2. Obtener todos los comentarios hechos por ese usuario
-    comments = db.query(models.Comment).filter(models.Comment.usuario_id == user_id).all()  # ✅ corregido
-
+    # 2. Una página de comentarios hechos por ese usuario, más recientes primero
+    query = db.query(models.Comment).filter(models.Comment.usuario_id == user_id)  # ✅ corregido
+    resultado = paginar(query, [models.Comment.id], pagina)
+    resultado.cabeceras(response)
 
-
-    return comments
+    return resultado.items
 
 # ✅ Borrar comentario
 @router.delete("/{comment_id}", response_model=schemas.CommentOut)
@@ -138,50 +158,25 @@ def update_comment(
 
     return comment
 
-# ✅ Listar comentarios de una encuesta con paginación y ordenamiento
-@router.get("/survey/{survey_id}", response_model=list[schemas.CommentOut])
-def get_comments_for_survey(
-    survey_id: int,
-    skip: int = 0,              # 👈 número de comentarios a saltar
-    limit: int = 10,            # 👈 número máximo de comentarios a devolver
-    order: str = "desc",        # 👈 "asc" o "desc" para ordenar por fecha
-    db: Session = Depends(database.get_db),
-    current_user: models.Usuario = Depends(get_current_user)
-):
-    # 1. Verificar que la encuesta existe
-    survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
-    if not survey:
-        raise HTTPException(status_code=404, detail="Encuesta no encontrada")
-
-    # 2. Construir query con ordenamiento
-    query = db.query(models.Comment).filter(models.Comment.survey_id == survey_id)
-    if order == "asc":
-        query = query.order_by(models.Comment.created_at.asc())
-    else:
-        query = query.order_by(models.Comment.created_at.desc())
-
-    # 3. Aplicar paginación
-    comments = query.offset(skip).limit(limit).all()
-
-    return comments
-
-
 # ✅ Contar comentarios de una encuesta
 @router.get("/survey/{survey_id}/count")
-def count_comments_for_survey(
+async def count_comments_for_survey(
     survey_id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.Usuario = Depends(get_current_user)
+    db=Depends(get_async_db),
+    current_user: models.Usuario = Depends(get_current_user_async)
 ):
+    count = await db.run_sync(_contar_comentarios_de_encuesta, survey_id)
+    return {"survey_id": survey_id, "comments_count": count}
+
+
+def _contar_comentarios_de_encuesta(db: Session, survey_id: int) -> int:
     # 1. Verificar que la encuesta existe
-    survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
+    survey = db.query(models.Survey.id).filter(models.Survey.id == survey_id).first()
     if not survey:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada")
 
     # 2. Contar comentarios asociados
-    count = db.query(models.Comment).filter(models.Comment.survey_id == survey_id).count()
-
-    return {"survey_id": survey_id, "comments_count": count}
+    return db.query(models.Comment).filter(models.Comment.survey_id == survey_id).count()
 
 # ✅ Contar comentarios de un usuario
 @router.get("/user/{user_id}/count")
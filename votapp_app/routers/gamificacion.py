@@ -17,7 +17,7 @@ def estado_gamificacion(
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(get_current_user)
 ):
-    verificar_logros(db, current_user.id, current_user.perfil_publico)
+    nuevos_logros = verificar_logros(db, current_user.id, current_user.perfil_publico)
 
     perfil = current_user.perfil_publico
     if not perfil:
@@ -44,6 +44,8 @@ def estado_gamificacion(
         "logros": logros_out
     }
 
+    if nuevos_logros:
+        db.commit()   # 👈 verificar_logros no confirma: un solo commit del endpoint
     return JSONResponse(content=data, media_type="application/json; charset=utf-8")
 
 
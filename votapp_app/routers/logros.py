@@ -1,90 +1,258 @@
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
 
-
+from sqlalchemy import event, func
 from sqlalchemy.orm import Session
 from .. import models
+from ..utils.resultados import insert_dialecto
+
+# -----------------------------
+# Motor de reglas de logros
+# -----------------------------
+def metricas_perfil(perfil, encuestas_completadas: int) -> dict:
+    """Valores que comparan las reglas (Logro.metrica → valor actual)."""
+    return {
+        "puntos": perfil.puntos or 0,
+        "racha_dias": perfil.racha_dias or 0,
+        "nivel": perfil.nivel or 0,
+        "encuestas": encuestas_completadas or 0,
+    }
+
+
+class MotorLogros:
+    """
+    Catálogo de logros en memoria, indexado por métrica y umbral:
+
+        {"puntos": ([1, 100, 500, ...], [id_primer_voto, id_100, ...]), ...}
+
+    y, por usuario, los logros ya obtenidos y las últimas métricas vistas.
+    Con eso solo se evalúan los umbrales cruzados desde la última vez
+    (bisect sobre la lista ordenada) y todos los nuevos van en un único
+    INSERT ... ON CONFLICT DO NOTHING.
+
+    La caché de usuarios es por proceso y se actualiza solo después del
+    commit; si otro proceso asigna el mismo logro, el ON CONFLICT lo absorbe.
+    """
+
+    def __init__(self, max_usuarios: int = 10000):
+        self.max_usuarios = max_usuarios
+        self._lock = threading.Lock()
+        self._reglas = None          # metrica → (umbrales, logro_ids)
+        self._por_nombre = None      # nombre → logro_id
+        self._usuarios = OrderedDict()   # usuario_id → (obtenidos, metricas)
+
+    # --- Catálogo ---
+    def _cargar(self, db: Session) -> None:
+        if self._reglas is not None:
+            return
+        filas = db.query(models.Logro.id, models.Logro.nombre, models.Logro.metrica, models.Logro.umbral).all()
+        reglas = {}
+        for logro_id, _, metrica, umbral in sorted(filas, key=lambda f: (f.metrica or "", f.umbral or 0, f.id)):
+            if metrica and umbral is not None:
+                umbrales, ids = reglas.setdefault(metrica, ([], []))
+                umbrales.append(umbral)
+                ids.append(logro_id)
+        with self._lock:
+            self._por_nombre = {nombre: logro_id for logro_id, nombre, _, _ in filas}
+            self._reglas = reglas
+
+    def recargar(self) -> None:
+        """Descarta catálogo y caché de usuarios (tras editar la tabla logros)."""
+        with self._lock:
+            self._reglas = None
+            self._por_nombre = None
+            self._usuarios.clear()
+
+    def logro_id(self, db: Session, nombre: str):
+        self._cargar(db)
+        return self._por_nombre.get(nombre)
+
+    def cruzados(self, metrica: str, antes, ahora: int) -> list:
+        """Logros con umbral en (antes, ahora]; antes=None → todos los <= ahora."""
+        regla = self._reglas.get(metrica)
+        if not regla:
+            return []
+        umbrales, ids = regla
+        desde = 0 if antes is None else bisect_right(umbrales, antes)
+        hasta = bisect_right(umbrales, ahora)
+        return ids[desde:hasta]
+
+    # --- Caché por usuario ---
+    def _en_cache(self, usuario_id: int):
+        with self._lock:
+            entrada = self._usuarios.get(usuario_id)
+            if entrada is not None:
+                self._usuarios.move_to_end(usuario_id)
+            return entrada
+
+    def _guardar(self, usuario_id: int, obtenidos: set, metricas) -> None:
+        with self._lock:
+            previa = self._usuarios.get(usuario_id)
+            if previa is not None:
+                obtenidos = previa[0] | obtenidos
+                if metricas is None:
+                    metricas = previa[1]
+            elif metricas is None:
+                # 👇 sin entrada previa no se sabe qué más tiene: no cachear
+                return
+            self._usuarios[usuario_id] = (obtenidos, metricas)
+            self._usuarios.move_to_end(usuario_id)
+            while len(self._usuarios) > self.max_usuarios:
+                self._usuarios.popitem(last=False)
+
+    def _al_confirmar(self, db: Session, usuario_id: int, obtenidos: set, metricas=None) -> None:
+        """Aplica a la caché cuando la transacción haga commit (se olvida si hace rollback)."""
+        pendientes = db.info.get("logros_pendientes")
+        if pendientes is None:
+            pendientes = db.info["logros_pendientes"] = []
+
+            def aplicar(session):
+                for args in session.info.pop("logros_pendientes", []):
+                    self._guardar(*args)
+
+            def descartar(session):
+                session.info.pop("logros_pendientes", None)
+
+            event.listen(db, "after_commit", aplicar, once=True)
+            event.listen(db, "after_rollback", descartar, once=True)
+        pendientes.append((usuario_id, obtenidos, metricas))
+
+    # --- Evaluación ---
+    def asignar(self, db: Session, usuario_id: int, nombre: str) -> bool:
+        """
+        Asignación manual de un logro por nombre (los que no tienen métrica).
+        No hace commit. False si el logro no existe o el usuario ya lo tenía
+        (según la caché o, si no, porque el ON CONFLICT no insertó nada).
+        """
+        logro_id = self.logro_id(db, nombre)
+        if logro_id is None:
+            return False
+        entrada = self._en_cache(usuario_id)
+        if entrada and logro_id in entrada[0]:
+            return False
+
+        insert = insert_dialecto(db)
+        insertado = db.execute(
+            insert(models.UsuarioLogro)
+            .values(usuario_id=usuario_id, logro_id=logro_id, fecha_obtenido=datetime.utcnow())
+            .on_conflict_do_nothing()
+            .returning(models.UsuarioLogro.logro_id)
+        ).first()
+        self._al_confirmar(db, usuario_id, {logro_id})
+        return insertado is not None
+
+    def evaluar_lote(self, db: Session, metricas_por_usuario: dict) -> int:
+        """
+        {usuario_id: metricas_perfil(...)} → asigna los logros cruzados.
+        Solo consulta usuario_logros para los usuarios que no están en
+        caché. No hace commit. Devuelve cuántos logros se insertaron.
+        """
+        if not metricas_por_usuario:
+            return 0
+        self._cargar(db)
+
+        candidatos = {}
+        sin_cache = []
+        for usuario_id, metricas in metricas_por_usuario.items():
+            entrada = self._en_cache(usuario_id)
+            previas = entrada[1] if entrada else {}
+            ids = {
+                logro_id
+                for metrica, valor in metricas.items()
+                for logro_id in self.cruzados(metrica, previas.get(metrica), valor)
+            }
+            if entrada:
+                ids -= entrada[0]
+            else:
+                sin_cache.append(usuario_id)
+            candidatos[usuario_id] = ids
+
+        obtenidos = {usuario_id: set() for usuario_id in sin_cache}
+        if sin_cache:
+            for usuario_id, logro_id in (
+                db.query(models.UsuarioLogro.usuario_id, models.UsuarioLogro.logro_id)
+                .filter(models.UsuarioLogro.usuario_id.in_(sin_cache))
+                .all()
+            ):
+                obtenidos[usuario_id].add(logro_id)
+            for usuario_id in sin_cache:
+                candidatos[usuario_id] -= obtenidos[usuario_id]
+
+        ahora = datetime.utcnow()
+        nuevos = [
+            {"usuario_id": usuario_id, "logro_id": logro_id, "fecha_obtenido": ahora}
+            for usuario_id, ids in candidatos.items()
+            for logro_id in sorted(ids)
+        ]
+        insertados = 0
+        if nuevos:
+            # 👇 ON CONFLICT: otro proceso puede asignar el mismo logro en paralelo
+            insert = insert_dialecto(db)
+            insertados = len(db.execute(
+                insert(models.UsuarioLogro).values(nuevos).on_conflict_do_nothing()
+                .returning(models.UsuarioLogro.logro_id)
+            ).all())
+
+        for usuario_id, metricas in metricas_por_usuario.items():
+            self._al_confirmar(db, usuario_id, obtenidos.get(usuario_id, set()) | candidatos[usuario_id], dict(metricas))
+        return insertados
+
+
+motor_logros = MotorLogros(max_usuarios=int(os.getenv("LOGROS_CACHE_MAX", "10000")))
+
+
+def _contar_participaciones(db: Session, usuario_ids) -> dict:
+    return dict(
+        db.query(models.Participacion.usuario_id, func.count(models.Participacion.id))
+        .filter(models.Participacion.usuario_id.in_(list(usuario_ids)))
+        .group_by(models.Participacion.usuario_id)
+        .all()
+    )
+
 
 # -----------------------------
 # Verificación y asignación de logros
 # -----------------------------
-def verificar_logros(db: Session, usuario_id: int, perfil_publico: models.PerfilPublico):
+def verificar_logros(db: Session, usuario_id: int, perfil_publico: models.PerfilPublico) -> int:
     """
     Revisa puntos, racha y participaciones para asignar logros al usuario.
+    No hace commit (lo hace el llamador). Devuelve cuántos logros asignó.
     """
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
-    if not usuario or not perfil_publico:
-        return
+    if not perfil_publico:
+        return 0
 
-    # --- Participación ---
     # Calcular encuestas completadas dinámicamente
-    encuestas_completadas = db.query(models.Participacion)\
-        .filter(models.Participacion.usuario_id == usuario_id)\
-        .count()
-
-    if perfil_publico.puntos >= 1:
-        asignar_logro(db, usuario, "Primer voto")
-    if encuestas_completadas >= 10:
-        asignar_logro(db, usuario, "10 encuestas completadas")
-    if encuestas_completadas >= 50:
-        asignar_logro(db, usuario, "50 encuestas completadas")
-    if encuestas_completadas >= 100:
-        asignar_logro(db, usuario, "100 encuestas completadas")
-
-    # --- Rachas ---
-    if perfil_publico.racha_dias >= 7:
-        asignar_logro(db, usuario, "Racha de 7 días")
-    if perfil_publico.racha_dias >= 30:
-        asignar_logro(db, usuario, "Racha de 30 días")
-    if perfil_publico.racha_dias >= 100:
-        asignar_logro(db, usuario, "Racha de 100 días")
-
-    # --- Puntos acumulados ---
-    if perfil_publico.puntos >= 100:
-        asignar_logro(db, usuario, "100 puntos acumulados")
-    if perfil_publico.puntos >= 500:
-        asignar_logro(db, usuario, "500 puntos acumulados")
-    if perfil_publico.puntos >= 1000:
-        asignar_logro(db, usuario, "1000 puntos acumulados")
-    if perfil_publico.puntos >= 2500:
-        asignar_logro(db, usuario, "2500 puntos acumulados")
-    if perfil_publico.puntos >= 5000:
-        asignar_logro(db, usuario, "5000 puntos acumulados")
-    if perfil_publico.puntos >= 10000:
-        asignar_logro(db, usuario, "10000 puntos acumulados")
-
-    # --- Niveles alcanzados ---
-    if perfil_publico.nivel >= 5:
-        asignar_logro(db, usuario, "Nivel 5 alcanzado")
-    if perfil_publico.nivel >= 10:
-        asignar_logro(db, usuario, "Nivel 10 alcanzado")
-    if perfil_publico.nivel >= 20:
-        asignar_logro(db, usuario, "Nivel 20 alcanzado")
-    if perfil_publico.nivel >= 30:
-        asignar_logro(db, usuario, "Nivel 30 alcanzado")
-
-
-    # --- Sociales / especiales ---
-    # Estos se asignan en otros endpoints específicos
-    # Ejemplo: al invitar a un amigo, compartir resultados, enviar feedback
+    encuestas_completadas = _contar_participaciones(db, [usuario_id]).get(usuario_id, 0)
+
+    metricas = metricas_perfil(perfil_publico, encuestas_completadas)
+    return motor_logros.evaluar_lote(db, {usuario_id: metricas})
+
+
+def verificar_logros_lote(db: Session, perfiles: dict) -> int:
+    """
+    Igual que verificar_logros pero para muchos usuarios a la vez
+    ({usuario_id: perfil}): una consulta de participaciones y un solo
+    INSERT para todos los logros nuevos. No hace commit. Devuelve cuántos
+    logros se asignaron.
+    """
+    if not perfiles:
+        return 0
+    participaciones = _contar_participaciones(db, perfiles)
+    return motor_logros.evaluar_lote(db, {
+        usuario_id: metricas_perfil(perfil, participaciones.get(usuario_id, 0))
+        for usuario_id, perfil in perfiles.items()
+    })
 
 
 
 # -----------------------------
 # Función auxiliar para asignar logros
 # -----------------------------
-def asignar_logro(db: Session, usuario: models.Usuario, nombre_logro: str):
+def asignar_logro(db: Session, usuario: models.Usuario, nombre_logro: str) -> bool:
     """
-    Asigna un logro al usuario si aún no lo tiene.
+    Asigna un logro al usuario si aún no lo tiene. No hace commit.
     """
-    logro = db.query(models.Logro).filter(models.Logro.nombre == nombre_logro).first()
-    if not logro:
-        return
-
-    ya_tiene = db.query(models.UsuarioLogro).filter(
-        models.UsuarioLogro.usuario_id == usuario.id,
-        models.UsuarioLogro.logro_id == logro.id
-    ).first()
-
-    if not ya_tiene:
-        nuevo = models.UsuarioLogro(usuario_id=usuario.id, logro_id=logro.id)
-        db.add(nuevo)
-        db.commit()
\ No newline at end of file
+    return motor_logros.asignar(db, usuario.id, nombre_logro)
@@ -1,10 +1,11 @@
 
 # votapp_app/routers/surveys.py
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
+from sqlalchemy import exists, func
 
 
 from typing import List, Optional
@@ -28,20 +29,33 @@ from dotenv import load_dotenv
 from .. import models, schemas, database
 from ..auth import (
     get_current_user,
+    get_current_user_async,
     get_current_admin,
     get_current_sponsor,
-    get_current_user_only   # ✅ ahora sí disponible
+    get_current_user_only,   # ✅ ahora sí disponible
+    get_current_user_only_async,
+    get_read_async_db,
+    get_read_db,
 )
 
-from ..database import get_db
-from .logros import verificar_logros
+from ..database import get_async_db, get_db
 
 from votapp_app.schemas import WalletOut, MovimientoWalletOut, SurveyWalletOut, SurveyOut, SurveyResultsOut, VoteResponse
 from votapp_app import models_simple   # 👈 importa tus modelos de encuestas simples
 from votapp_app.models_simple import SurveySimple, SurveyAssignment
 from votapp_app.models import Usuario
-from votapp_app.utils.segmentacion import cumple_segmentacion
-from votapp_app.models import Survey, Vote
+from votapp_app.utils.segmentacion import match_many
+from votapp_app.utils.feed import filtro_segmentacion, query_disponibles
+from votapp_app.cache import cache_resultados
+from votapp_app.utils.analitica import agrupar_crosstab, analizar_votos, serie_diaria
+from votapp_app.utils.resultados import contar_votos, resultados_con_cache, resultados_pregunta
+from votapp_app.utils.snapshots import analizar_votos_cerrada
+from votapp_app.utils.votacion import registrar_voto
+from votapp_app.utils.paginacion import ParametrosPagina, paginar
+from votapp_app.utils.creacion import insertar_preguntas
+from votapp_app.utils.exportacion import csv_texto, lotes_respuestas, ndjson, sal_export
+from votapp_app.models import Survey, Vote, CAMPOS_SEGMENTACION
+from votapp_app.utils.safe_json_list import safe_json_list
 
 
 
@@ -69,14 +83,7 @@ def to_survey_out(encuesta: models.Survey) -> SurveyOut:
         description=encuesta.description,  # 👈 usa description
         fecha_expiracion=encuesta.fecha_expiracion,
         fecha_creacion=encuesta.fecha_creacion,
-        sexo=json.loads(encuesta.sexo) if encuesta.sexo else [],
-        ciudad=json.loads(encuesta.ciudad) if encuesta.ciudad else [],
-        ocupacion=json.loads(encuesta.ocupacion) if encuesta.ocupacion else [],
-        profesion=json.loads(encuesta.profesion) if encuesta.profesion else [],
-        nivel_educativo=json.loads(encuesta.nivel_educativo) if encuesta.nivel_educativo else [],
-        religion=json.loads(encuesta.religion) if encuesta.religion else [],
-        nacionalidad=json.loads(encuesta.nacionalidad) if encuesta.nacionalidad else [],
-        estado_civil=json.loads(encuesta.estado_civil) if encuesta.estado_civil else [],
+        **encuesta.segmentacion,   # 👈 desde survey_targets
         media_url=encuesta.media_url,
         media_urls=json.loads(encuesta.media_urls) if encuesta.media_urls else [],
         patrocinada=encuesta.patrocinada,
@@ -114,10 +121,15 @@ def calcular_segundos_restantes(fecha_expiracion: datetime):
 
 
 @router.get("/surveys", response_model=List[schemas.SurveyOut])
-def get_surveys(db: Session = Depends(database.get_db)):
-    surveys = db.query(models.Survey).all()
+def get_surveys(
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
+    db: Session = Depends(database.get_db)
+):
+    resultado = paginar(db.query(models.Survey), [models.Survey.id], pagina)
+    resultado.cabeceras(response)
     survey_out_list = []
-    for survey in surveys:
+    for survey in resultado.items:
         survey_out = schemas.SurveyOut(
             id=survey.id,
             title=survey.title,
@@ -131,14 +143,7 @@ def get_surveys(db: Session = Depends(database.get_db)):
             media_url=survey.media_url,
             media_urls=json.loads(survey.media_urls) if survey.media_urls else [],
             media_type=survey.media_type,
-            sexo=json.loads(survey.sexo) if survey.sexo else [],
-            ciudad=json.loads(survey.ciudad) if survey.ciudad else [],
-            ocupacion=json.loads(survey.ocupacion) if survey.ocupacion else [],
-            profesion=json.loads(survey.profesion) if survey.profesion else [],  # 👈 nuevo campo
-            nivel_educativo=json.loads(survey.nivel_educativo) if survey.nivel_educativo else [],
-            religion=json.loads(survey.religion) if survey.religion else [],
-            nacionalidad=json.loads(survey.nacionalidad) if survey.nacionalidad else [],
-            estado_civil=json.loads(survey.estado_civil) if survey.estado_civil else [],
+            **survey.segmentacion,   # 👈 desde survey_targets
             patrocinada=survey.patrocinada,
             patrocinador=survey.patrocinador,
             recompensa_puntos=survey.recompensa_puntos,
@@ -190,14 +195,6 @@ def create_survey(
             title=survey.title,
             description=survey.description,
             fecha_expiracion=fecha_dt,
-            sexo=json.dumps(survey.sexo or []),
-            ciudad=json.dumps(survey.ciudad or []),
-            ocupacion=json.dumps(survey.ocupacion or []),
-            profesion=json.dumps(survey.profesion or []),
-            nivel_educativo=json.dumps(survey.nivel_educativo or []),
-            religion=json.dumps(survey.religion or []),
-            nacionalidad=json.dumps(survey.nacionalidad or []),
-            estado_civil=json.dumps(survey.estado_civil or []),
             media_url=survey.media_url,
             media_urls=json.dumps(survey.media_urls or []),
             patrocinada=survey.patrocinada,
@@ -208,33 +205,16 @@ def create_survey(
             visibilidad_resultados=survey.visibilidad_resultados,
             usuario_id=usuario.id
         )
+        # 👇 segmentación → survey_targets (+ columnas JSON legacy)
+        db_survey.asignar_segmentacion({
+            campo: getattr(survey, campo) for campo in CAMPOS_SEGMENTACION
+        })
 
         db.add(db_survey)
         db.flush()
-        db.refresh(db_survey)
 
-        # Crear preguntas y opciones
-        preguntas_out = []
-        for q in survey.questions:
-            db_question = models.Question(text=q.text, survey_id=db_survey.id)
-            db.add(db_question)
-            db.flush()
-            db.refresh(db_question)
-
-            opciones_out = []
-            for opt in q.options:
-                db_option = models.Option(text=opt.text, question_id=db_question.id)
-                db.add(db_option)
-                db.flush()
-                db.refresh(db_option)
-                opciones_out.append({"id": db_option.id, "text": db_option.text})
-
-            preguntas_out.append({
-                "id": db_question.id,
-                "text": db_question.text,
-                "options": opciones_out,
-                "total_votes": 0
-            })
+        # Crear preguntas y opciones: un INSERT por tabla (no un flush por fila)
+        preguntas_out = insertar_preguntas(db, [(db_survey.id, survey.questions)])[0]
 
         db.commit()
         db.refresh(db_survey)
@@ -276,16 +256,9 @@ def create_survey(
             description=db_survey.description,
             fecha_expiracion=db_survey.fecha_expiracion,
             fecha_creacion=db_survey.fecha_creacion,
-            sexo=json.loads(db_survey.sexo),
-            ciudad=json.loads(db_survey.ciudad),
-            ocupacion=json.loads(db_survey.ocupacion),
-            profesion=json.loads(db_survey.profesion),
-            nivel_educativo=json.loads(db_survey.nivel_educativo),
-            religion=json.loads(db_survey.religion),
-            nacionalidad=json.loads(db_survey.nacionalidad),
-            estado_civil=json.loads(db_survey.estado_civil),
+            **db_survey.segmentacion,   # 👈 desde survey_targets
             media_url=db_survey.media_url,
-            media_urls=json.loads(db_survey.media_urls),
+            media_urls=json.loads(db_survey.media_urls) if db_survey.media_urls else [],
             patrocinada=db_survey.patrocinada,
             patrocinador=db_survey.patrocinador,
             recompensa_puntos=db_survey.recompensa_puntos,
@@ -422,15 +395,18 @@ async def create_survey_with_files(
         media_url=portada_url,          # 👈 portada
         media_urls=json.dumps(urls),    # 👈 galería
         usuario_id=usuario.id,
-        sexo=sexo,
-        ciudad=ciudad,
-        ocupacion=ocupacion,
-        profesion=profesion,
-        nivel_educativo=nivel_educativo,
-        religion=religion,
-        nacionalidad=nacionalidad,
-        estado_civil=estado_civil
     )
+    # 👇 segmentación → survey_targets (+ columnas JSON legacy)
+    db_survey.asignar_segmentacion({
+        "sexo": safe_json_list(sexo),
+        "ciudad": safe_json_list(ciudad),
+        "ocupacion": safe_json_list(ocupacion),
+        "profesion": safe_json_list(profesion),
+        "nivel_educativo": safe_json_list(nivel_educativo),
+        "religion": safe_json_list(religion),
+        "nacionalidad": safe_json_list(nacionalidad),
+        "estado_civil": safe_json_list(estado_civil),
+    })
 
     db.add(db_survey)
     db.commit()
@@ -443,32 +419,8 @@ async def create_survey_with_files(
     except Exception:
         questions_data = []
 
-    survey_questions_out = []
-    for q in questions_data:
-        db_question = models.Question(
-            survey_id=db_survey.id,
-            text=q["text"]
-        )
-        db.add(db_question)
-        db.flush()
-        db.refresh(db_question)
-
-        options_out = []
-        for opt in q.get("options", []):
-            db_option = models.Option(
-                question_id=db_question.id,
-                text=opt["text"]
-            )
-            db.add(db_option)
-            db.flush()
-            db.refresh(db_option)
-            options_out.append({"id": db_option.id, "text": db_option.text})
-
-        survey_questions_out.append({
-            "id": db_question.id,
-            "text": db_question.text,
-            "options": options_out
-        })
+    # 👇 un INSERT por tabla (no un flush por fila)
+    survey_questions_out = insertar_preguntas(db, [(db_survey.id, questions_data)])[0]
 
     db.commit()
 
@@ -510,16 +462,9 @@ async def create_survey_with_files(
         description=db_survey.description,
         fecha_expiracion=fecha_dt,
         fecha_creacion=db_survey.fecha_creacion,
-        sexo=json.loads(db_survey.sexo),
-        ciudad=json.loads(db_survey.ciudad),
-        ocupacion=json.loads(db_survey.ocupacion),
-        profesion=json.loads(db_survey.profesion),
-        nivel_educativo=json.loads(db_survey.nivel_educativo),
-        religion=json.loads(db_survey.religion),
-        nacionalidad=json.loads(db_survey.nacionalidad),
-        estado_civil=json.loads(db_survey.estado_civil),
+        **db_survey.segmentacion,   # 👈 desde survey_targets
         media_url=db_survey.media_url,
-        media_urls=json.loads(db_survey.media_urls),
+        media_urls=json.loads(db_survey.media_urls) if db_survey.media_urls else [],
         patrocinada=patrocinada,
         patrocinador=db_survey.patrocinador,
         recompensa_puntos=db_survey.recompensa_puntos,
@@ -646,14 +591,16 @@ async def update_survey_with_files(
     db_survey.recompensa_dinero = recompensa_dinero
     db_survey.presupuesto_total = presupuesto_total
     db_survey.visibilidad_resultados = visibilidad_resultados
-    db_survey.sexo = normalize_segment(sexo)
-    db_survey.ciudad = normalize_segment(ciudad)
-    db_survey.ocupacion = normalize_segment(ocupacion)
-    db_survey.profesion = normalize_segment(profesion)
-    db_survey.nivel_educativo = normalize_segment(nivel_educativo)
-    db_survey.religion = normalize_segment(religion)
-    db_survey.nacionalidad = normalize_segment(nacionalidad)
-    db_survey.estado_civil = normalize_segment(estado_civil)
+    db_survey.asignar_segmentacion({
+        "sexo": safe_json_list(sexo),
+        "ciudad": safe_json_list(ciudad),
+        "ocupacion": safe_json_list(ocupacion),
+        "profesion": safe_json_list(profesion),
+        "nivel_educativo": safe_json_list(nivel_educativo),
+        "religion": safe_json_list(religion),
+        "nacionalidad": safe_json_list(nacionalidad),
+        "estado_civil": safe_json_list(estado_civil),
+    })
 
     # 🔎 Lógica de reactivación solo para encuestas cerradas por fondos
     if db_survey.closed_reason == "funds":
@@ -663,8 +610,9 @@ async def update_survey_with_files(
         if db_survey.fecha_expiracion and db_survey.fecha_expiracion > datetime.utcnow():
             puede_reabrir = True
 
-        # Verificar fondos suficientes
-        if db_survey.presupuesto_total and db_survey.presupuesto_total >= max(db_survey.recompensa_dinero, 1):
+        # Verificar fondos suficientes (lo que queda tras lo ya gastado)
+        restante = (db_survey.presupuesto_total or 0) - (db_survey.spent_budget or 0)
+        if restante >= max(db_survey.recompensa_dinero or 0, 1):
             puede_reabrir = True
 
         if puede_reabrir:
@@ -677,6 +625,7 @@ async def update_survey_with_files(
 
     db.commit()
     db.refresh(db_survey)
+    cache_resultados.invalidar(db_survey.id)
 
     return schemas.SurveyOut(
         id=db_survey.id,
@@ -684,14 +633,7 @@ async def update_survey_with_files(
         description=db_survey.description,
         fecha_expiracion=db_survey.fecha_expiracion,
         fecha_creacion=db_survey.fecha_creacion,
-        sexo=json.loads(db_survey.sexo),
-        ciudad=json.loads(db_survey.ciudad),
-        ocupacion=json.loads(db_survey.ocupacion),
-        profesion=json.loads(db_survey.profesion),
-        nivel_educativo=json.loads(db_survey.nivel_educativo),
-        religion=json.loads(db_survey.religion),
-        nacionalidad=json.loads(db_survey.nacionalidad),
-        estado_civil=json.loads(db_survey.estado_civil),
+        **db_survey.segmentacion,   # 👈 desde survey_targets
         media_url=db_survey.media_url,
         media_urls=json.loads(db_survey.media_urls) if db_survey.media_urls else [],
         patrocinada=db_survey.patrocinada,
@@ -747,14 +689,7 @@ def listar_encuestas_publicadas(
             description=e.description,
             fecha_expiracion=e.fecha_expiracion,
             fecha_creacion=e.fecha_creacion,
-            sexo=parse_list(e.sexo),
-            ciudad=parse_list(e.ciudad),
-            ocupacion=parse_list(e.ocupacion),
-            profesion=parse_list(e.profesion),
-            nivel_educativo=parse_list(e.nivel_educativo),
-            religion=parse_list(e.religion),
-            nacionalidad=parse_list(e.nacionalidad),
-            estado_civil=parse_list(e.estado_civil),
+            **e.segmentacion,   # 👈 desde survey_targets
             media_url=e.media_url,
             media_urls=parse_list(e.media_urls),
             patrocinada=e.patrocinada,
@@ -802,6 +737,7 @@ def pausar_encuesta(survey_id: int,
     encuesta.closed_reason = "paused"   # 👈 diferencia clave
     db.commit()
     db.refresh(encuesta)
+    cache_resultados.invalidar(encuesta.id)
 
     return to_survey_out(encuesta)   # 👈 aquí
 
@@ -830,7 +766,7 @@ def reanudar_encuesta(survey_id: int,
     ahora = datetime.utcnow()
     if encuesta.fecha_expiracion and encuesta.fecha_expiracion <= ahora:
         raise HTTPException(status_code=400, detail="La encuesta está expirada")
-    if encuesta.presupuesto_total < encuesta.recompensa_dinero:
+    if encuesta.fondos_agotados:
         raise HTTPException(status_code=400, detail="Fondos insuficientes")
 
     encuesta.active = True
@@ -838,6 +774,7 @@ def reanudar_encuesta(survey_id: int,
     encuesta.closed_at = None
     db.commit()
     db.refresh(encuesta)
+    cache_resultados.invalidar(encuesta.id)
 
     return to_survey_out(encuesta)   # 👈 aquí también
 
@@ -846,9 +783,7 @@ def reanudar_encuesta(survey_id: int,
 # ENDPOINT: Resultados de encuesta (Sponsor Dashboard - WEB)
 # -------------------
 
-@router.get("/web/{survey_id}/results", response_model=SurveyResultsOut)
-async def get_survey_results(
-    survey_id: int,
+def filtros_demograficos(
     sexo: list[str] = Query(None),
     ciudad: list[str] = Query(None),
     ocupacion: list[str] = Query(None),
@@ -857,45 +792,62 @@ async def get_survey_results(
     religion: list[str] = Query(None),
     nacionalidad: list[str] = Query(None),
     estado_civil: list[str] = Query(None),
-    db: Session = Depends(get_db),
+) -> dict:
+    """Filtros ?<campo>=... comunes a resultados y export (un dict por campo de segmentación)."""
+    return {
+        "sexo": sexo,
+        "ciudad": ciudad,
+        "ocupacion": ocupacion,
+        "profesion": profesion,
+        "nivel_educativo": nivel_educativo,
+        "religion": religion,
+        "nacionalidad": nacionalidad,
+        "estado_civil": estado_civil,
+    }
+
+
+@router.get("/web/{survey_id}/results", response_model=SurveyResultsOut)
+async def get_survey_results(
+    survey_id: int,
+    demograficos: dict = Depends(filtros_demograficos),
+    crosstab: Optional[str] = Query(None),   # 👈 dimensión para el cruce opción × segmento
+    db=Depends(get_read_async_db),   # 👈 réplica de lectura
 ):
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
-    if not survey:
-        raise HTTPException(status_code=404, detail="Survey not found")
+    filtros = {**demograficos, "crosstab": [crosstab] if crosstab else None}
+
+    # 👇 Cache por encuesta + filtros; vote/pausa/reanudación/cierre suben la versión
+    return await resultados_con_cache(db, "web", survey_id, filtros, _calcular_results_web, filtros, crosstab)
+
 
-    # Base query con JOIN a Usuario
-    base_query = (
-        db.query(Vote)
-        .join(Usuario, Usuario.id == Vote.usuario_id)
-        .filter(Vote.survey_id == survey_id)
+def _calcular_results_web(db: Session, survey_id: int, filtros: dict, crosstab: Optional[str]) -> dict:
+    survey = (
+        db.query(Survey)
+        .options(selectinload(Survey.questions).joinedload(models.Question.options))
+        .filter(Survey.id == survey_id)
+        .first()
     )
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
 
-    # Aplicar filtros dinámicos
-    if sexo:
-        base_query = base_query.filter(Usuario.sexo.in_(sexo))
-    if ciudad:
-        base_query = base_query.filter(Usuario.ciudad.in_(ciudad))
-    if ocupacion:
-        base_query = base_query.filter(Usuario.ocupacion.in_(ocupacion))
-    if profesion:
-        base_query = base_query.filter(Usuario.profesion.in_(profesion))
-    if nivel_educativo:
-        base_query = base_query.filter(Usuario.nivel_educativo.in_(nivel_educativo))
-    if religion:
-        base_query = base_query.filter(Usuario.religion.in_(religion))
-    if nacionalidad:
-        base_query = base_query.filter(Usuario.nacionalidad.in_(nacionalidad))
-    if estado_civil:
-        base_query = base_query.filter(Usuario.estado_civil.in_(estado_civil))
-
-    # Total participantes (usuarios únicos filtrados)
-    total_participants = base_query.with_entities(Vote.usuario_id).distinct().count()
-
-    # Total votos filtrados
-    total_votes = base_query.count()
-
-    # Presupuesto gastado basado en recompensa
-    if survey.recompensa_dinero and survey.recompensa_dinero > 0:
+    if crosstab is not None and crosstab not in CAMPOS_SEGMENTACION:
+        raise HTTPException(status_code=400, detail=f"crosstab debe ser uno de: {', '.join(CAMPOS_SEGMENTACION)}")
+
+    # 👇 Totales, opciones, timelines y segmentos en una sola consulta (GROUPING SETS),
+    # todos respetando los filtros dinámicos
+    filtros_demograficos = {campo: filtros[campo] for campo in CAMPOS_SEGMENTACION}
+    # (encuestas cerradas: desde los snapshots Parquet si SNAPSHOT_RESULTADOS=1)
+    analisis = analizar_votos_cerrada(db, survey, filtros_demograficos, crosstab)
+    if analisis is None:
+        analisis = analizar_votos(db, survey_id, filtros_demograficos, crosstab)
+
+    total_participants = analisis["total_participants"]
+    total_votes = analisis["total_votes"]
+
+    # Presupuesto gastado: libro de la encuesta si es patrocinada,
+    # si no, estimado a partir de la recompensa
+    if survey.patrocinada:
+        spent_budget = survey.spent_budget or 0
+    elif survey.recompensa_dinero and survey.recompensa_dinero > 0:
         spent_budget = total_votes * survey.recompensa_dinero
     elif survey.recompensa_puntos and survey.recompensa_puntos > 0:
         spent_budget = total_votes * (survey.recompensa_puntos * 0.1)  # ejemplo
@@ -907,104 +859,26 @@ async def get_survey_results(
 
     # Resultados agrupados por pregunta (filtrados)
     questions_results = []
+    question_por_opcion = {}
     for question in survey.questions:
         options = []
         for option in question.options:
-            votes_count = base_query.filter(Vote.option_id == option.id).count()
-            options.append({"text": option.text, "votes": votes_count})
+            question_por_opcion[option.id] = question.id
+            options.append({"text": option.text, "votes": analisis["por_opcion"].get(option.id, 0)})
         questions_results.append({
             "id": question.id,
             "text": question.text,
             "options": options
         })
 
-    # Timeline extendido: incluye días sin votos
-    rows = (
-        base_query.with_entities(func.date(Vote.creado_en), func.count(Vote.id))
-        .group_by(func.date(Vote.creado_en))
-        .order_by(func.date(Vote.creado_en))
-        .all()
-    )
-    votes_by_date = {str(r[0]): r[1] for r in rows}
-
+    # Timelines extendidos: incluyen días sin votos
     start_date = survey.fecha_creacion.date() if survey.fecha_creacion else None
     end_date = survey.fecha_expiracion.date() if survey.fecha_expiracion else None
 
-    timeline = []
-    if start_date and end_date:
-        current = start_date
-        while current <= end_date:
-            date_str = str(current)
-            timeline.append({
-                "date": date_str,
-                "votes": votes_by_date.get(date_str, 0)  # 0 si no hubo votos
-            })
-            current += timedelta(days=1)
-
-    # Timeline de participantes únicos (respetando filtros)
-    rows_participants = (
-        base_query.with_entities(func.date(Vote.creado_en), func.count(func.distinct(Vote.usuario_id)))
-        .group_by(func.date(Vote.creado_en))
-        .order_by(func.date(Vote.creado_en))
-        .all()
-    )
-    participants_by_date = {r[0].isoformat(): r[1] for r in rows_participants}
-
-    timeline_participants = []
-    if start_date and end_date:
-        current = start_date
-        while current <= end_date:
-            date_str = current.isoformat()  # 👈 mismo formato
-            timeline_participants.append({
-                "date": date_str,
-                "participants": participants_by_date.get(date_str, 0)
-            })
-            current += timedelta(days=1)
-
-
-
+    timeline = serie_diaria(start_date, end_date, analisis["votos_por_fecha"], "votes")
+    timeline_participants = serie_diaria(start_date, end_date, analisis["participantes_por_fecha"], "participants")
 
-
-
-
-
-    # Helper para convertir string JSON → lista
-    import json
-    def parse_list_field(value):
-        if not value:
-            return []
-        if isinstance(value, list):
-            return value
-        try:
-            return json.loads(value)
-        except Exception:
-            return []
-
-    # -------------------
-    # Segmentación real de votos (JOIN con Usuario)
-    # -------------------
-    def build_segment(field):
-        rows = (
-            db.query(getattr(Usuario, field), func.count(Vote.id))
-            .join(Usuario, Usuario.id == Vote.usuario_id)
-            .filter(Vote.survey_id == survey_id)
-            .group_by(getattr(Usuario, field))
-            .all()
-        )
-        return [{"segment": r[0], "votes": r[1]} for r in rows if r[0]]
-
-    segmentacion_votos = {
-        "sexo": build_segment("sexo"),
-        "ciudad": build_segment("ciudad"),
-        "ocupacion": build_segment("ocupacion"),
-        "profesion": build_segment("profesion"),
-        "nivel_educativo": build_segment("nivel_educativo"),
-        "religion": build_segment("religion"),
-        "nacionalidad": build_segment("nacionalidad"),
-        "estado_civil": build_segment("estado_civil"),
-    }
-
-    return {
+    resultado = {
         "id": survey.id,
         "title": survey.title,
         "active": survey.active,
@@ -1024,19 +898,56 @@ async def get_survey_results(
         "recompensa_dinero": survey.recompensa_dinero,
         "recompensa_puntos": survey.recompensa_puntos,
 
-        # Segmentación aplicada (informativa)
-        "sexo": parse_list_field(survey.sexo),
-        "ciudad": parse_list_field(survey.ciudad),
-        "ocupacion": parse_list_field(survey.ocupacion),
-        "profesion": parse_list_field(survey.profesion),
-        "nivel_educativo": parse_list_field(survey.nivel_educativo),
-        "religion": parse_list_field(survey.religion),
-        "nacionalidad": parse_list_field(survey.nacionalidad),
-        "estado_civil": parse_list_field(survey.estado_civil),
-
-        # Segmentación real de votos
-        "segmentacion_votos": segmentacion_votos,
+        # Segmentación aplicada (informativa, desde survey_targets)
+        **survey.segmentacion,
+
+        # Segmentación real de votos (filtrada)
+        "segmentacion_votos": analisis["segmentos"],
+
+        # Cruce opción × segmento (solo si se pidió ?crosstab=<campo>)
+        "crosstab": (
+            {"dimension": crosstab, "rows": agrupar_crosstab(analisis["crosstab"], question_por_opcion)}
+            if crosstab is not None else None
+        ),
     }
+    return resultado
+
+
+# -------------------
+# ENDPOINT: Export de respuestas crudas (Sponsor Dashboard - WEB)
+# -------------------
+@router.get("/web/{survey_id}/export")
+def export_survey_responses(
+    survey_id: int,
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    demograficos: dict = Depends(filtros_demograficos),   # 👈 mismos filtros que /results
+    db: Session = Depends(get_read_db),
+    usuario: models.Usuario = Depends(get_current_user)
+):
+    survey = db.query(Survey.id, Survey.usuario_id).filter(Survey.id == survey_id).first()
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    if survey.usuario_id != usuario.id and usuario.rol != "admin":
+        raise HTTPException(status_code=403, detail="Solo el creador de la encuesta puede exportar sus respuestas")
+    sal_export()   # 👈 sin secreto de seudónimos, 503 antes de empezar el streaming
+
+    usuario_id = usuario.id
+
+    def contenido():
+        # 👇 sesión propia: vive lo que dure el streaming, no el request
+        sesion = database.enrutador_lectura.sesion(usuario_id)
+        try:
+            lotes = lotes_respuestas(sesion, survey_id, demograficos)
+            yield from (csv_texto(lotes) if formato == "csv" else ndjson(lotes))
+        finally:
+            sesion.close()
+
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        contenido(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="survey_{survey_id}.{formato}"'},
+    )
 
 
 
@@ -1081,16 +992,20 @@ async def get_survey_results(
 # -------------------
 @router.get("/")
 def list_surveys(
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
     db: Session = Depends(database.get_db),
     usuario: models.Usuario = Depends(get_current_user)
 ):
     ahora = datetime.now(santo_domingo_tz)
-    surveys = db.query(models.Survey).filter(
+    query = db.query(models.Survey).filter(
         (models.Survey.fecha_expiracion == None) | (models.Survey.fecha_expiracion >= ahora)
-    ).all()
+    ).options(selectinload(models.Survey.questions).joinedload(models.Question.options))
+    resultado = paginar(query, [models.Survey.id], pagina)
+    resultado.cabeceras(response)
 
     result = []
-    for s in surveys:
+    for s in resultado.items:
         preguntas = []
         for q in s.questions:
             opciones = [{"id": o.id, "text": o.text} for o in q.options]
@@ -1110,14 +1025,7 @@ def list_surveys(
             "questions": preguntas,
             "media_url": s.media_url,
             "media_urls": json.loads(s.media_urls) if s.media_urls else [],
-            "sexo": json.loads(s.sexo) if s.sexo else [],
-            "ciudad": json.loads(s.ciudad) if s.ciudad else [],
-            "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-            "profesion": json.loads(s.profesion) if s.profesion else [],  # 👈 nuevo campo
-            "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-            "religion": json.loads(s.religion) if s.religion else [],
-            "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-            "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
+            **s.segmentacion,   # 👈 desde survey_targets
             "patrocinada": s.patrocinada,
             "patrocinador": s.patrocinador,
             "recompensa_puntos": s.recompensa_puntos,
@@ -1131,52 +1039,30 @@ def list_surveys(
 # -------------------
 # Disponibles, votadas, finalizadas
 # -------------------
-#def cumple_segmentacion(survey: models.Survey, usuario: models.Usuario) -> bool:
-    sexo = [s.lower() for s in json.loads(survey.sexo)] if survey.sexo else []
-    ciudad = [c.lower() for c in json.loads(survey.ciudad)] if survey.ciudad else []
-    ocupacion = [o.lower() for o in json.loads(survey.ocupacion)] if survey.ocupacion else []
-    profesion = [p.lower() for p in json.loads(survey.profesion)] if survey.profesion else []   # 👈 nuevo campo
-    nivel_educativo = [n.lower() for n in json.loads(survey.nivel_educativo)] if survey.nivel_educativo else []
-    religion = [r.lower() for r in json.loads(survey.religion)] if survey.religion else []
-    nacionalidad = [n.lower() for n in json.loads(survey.nacionalidad)] if survey.nacionalidad else []
-    estado_civil = [e.lower() for e in json.loads(survey.estado_civil)] if survey.estado_civil else []
-
-    return (not sexo or (usuario.sexo and usuario.sexo.lower() in sexo)) and \
-        (not ciudad or (usuario.ciudad and usuario.ciudad.lower() in ciudad)) and \
-        (not ocupacion or (usuario.ocupacion and usuario.ocupacion.lower() in ocupacion)) and \
-        (not profesion or (usuario.profesion and usuario.profesion.lower() in profesion)) and \
-        (not nivel_educativo or (usuario.nivel_educativo and usuario.nivel_educativo.lower() in nivel_educativo)) and \
-        (not religion or (usuario.religion and usuario.religion.lower() in religion)) and \
-        (not nacionalidad or (usuario.nacionalidad and usuario.nacionalidad.lower() in nacionalidad)) and \
-        (not estado_civil or (usuario.estado_civil and usuario.estado_civil.lower() in estado_civil))
-
-
-
 @router.get("/disponibles")
-def surveys_disponibles(
-    db: Session = Depends(database.get_db),
-    usuario: models.Usuario = Depends(get_current_user)
+async def surveys_disponibles(
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
+    antes_de: Optional[int] = Query(None),   # 👈 cursor anterior (último id recibido); preferir ?cursor=
+    db=Depends(get_async_db),
+    usuario: models.Usuario = Depends(get_current_user_async)
 ):
+    resultado = await db.run_sync(_listar_disponibles, usuario, pagina, antes_de)
+    resultado.cabeceras(response)
+    return resultado.items
+
+
+def _listar_disponibles(db: Session, usuario: models.Usuario, pagina: ParametrosPagina, antes_de: Optional[int]):
     ahora = datetime.now(santo_domingo_tz)
-    surveys = db.query(models.Survey).filter(
-        ((models.Survey.fecha_expiracion == None) | (models.Survey.fecha_expiracion >= ahora)),
-        models.Survey.active == True,              # 👈 solo activas
-        models.Survey.closed_reason == None        # 👈 no cerradas      
-    ).order_by(models.Survey.id.desc()).all()   # 👈 usar id si no existe fecha_creacion
+    # 👇 segmentación, "ya votó" y preguntas/opciones resueltos en SQL
+    query = query_disponibles(db, usuario, ahora)
+    if antes_de is not None:
+        query = query.filter(models.Survey.id < antes_de)
+    resultado = paginar(query, [models.Survey.id], pagina)
 
     disponibles = []
-    for s in surveys:
+    for s in resultado.items:
         try:
-            if not cumple_segmentacion(s, usuario):
-                continue
-
-            ya_voto = db.query(models.Vote).filter(
-                models.Vote.usuario_id == usuario.id,
-                models.Vote.survey_id == s.id
-            ).first()
-            if ya_voto:
-                continue
-
             preguntas = []
             for q in (s.questions or []):
                 opciones = [{"id": o.id, "text": o.text} for o in (q.options or [])]
@@ -1213,25 +1099,16 @@ def surveys_disponibles(
                 "recompensa_puntos": s.recompensa_puntos,
                 "recompensa_dinero": s.recompensa_dinero,
                 "presupuesto_total": s.presupuesto_total,
-                # 👇 campos de segmentación parseados
-                "sexo": json.loads(s.sexo) if s.sexo else [],
-                "ciudad": json.loads(s.ciudad) if s.ciudad else [],
-                "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-                "profesion": json.loads(s.profesion) if s.profesion else [],   # 👈 nuevo campo
-                "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-                "religion": json.loads(s.religion) if s.religion else [],
-                "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-                "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
+                # 👇 campos de segmentación (survey_targets)
+                **s.segmentacion,
             })
 
-
-
-
         except Exception as e:
             print(f"Error procesando encuesta {getattr(s, 'id', 'sin_id')}: {e}")
             continue
 
-    return disponibles or []
+    resultado.items = disponibles
+    return resultado
 
 
 
@@ -1324,12 +1201,10 @@ def surveys_personales(
     )
     surveys = propias.union(asignadas).order_by(models.Survey.id.desc()).all()
 
-    for s in surveys:
+    for s in match_many(surveys, usuario):   # 👈 segmentación con matcher compilado
         try:
             if s.fecha_expiracion and s.fecha_expiracion < ahora:
                 continue
-            if not cumple_segmentacion(s, usuario):
-                continue
             ya_voto = db.query(models.Vote).filter(
                 models.Vote.usuario_id == usuario.id,
                 models.Vote.survey_id == s.id
@@ -1378,14 +1253,7 @@ def surveys_personales(
                 "current_user_id": usuario.id,
                 "tipo": "normal",
                 # 👇 campos de segmentación parseados
-                "sexo": json.loads(s.sexo) if s.sexo else [],
-                "ciudad": json.loads(s.ciudad) if s.ciudad else [],
-                "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-                "profesion": json.loads(s.profesion) if s.profesion else [],   # 👈 nuevo campo
-                "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-                "religion": json.loads(s.religion) if s.religion else [],
-                "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-                "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
+                **s.segmentacion,   # 👈 desde survey_targets
             })
 
         except Exception as e:
@@ -1397,7 +1265,7 @@ def surveys_personales(
 
     simples = db.query(models_simple.SurveySimple).filter(
         (models_simple.SurveySimple.usuario_id == usuario.id) |
-        (models_simple.SurveySimple.asignado_a.any(usuario.id))
+        (models_simple.SurveySimple.asignado_a.contains([usuario.id]))   # 👈 @> usa el índice GIN
     ).order_by(models_simple.SurveySimple.id.desc()).all()
 
 
@@ -1417,91 +1285,82 @@ def surveys_personales(
 
 @router.get("/votadas")
 def surveys_votadas(
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
     db: Session = Depends(database.get_db),
     usuario: models.Usuario = Depends(get_current_user)
 ):
     ahora = datetime.now(santo_domingo_tz)
-    surveys = db.query(models.Survey).filter(
-        (models.Survey.fecha_expiracion == None) | (models.Survey.fecha_expiracion >= ahora)
-    ).order_by(models.Survey.id.desc()).all()   # 👈 orden descendente
+
+    # 👇 "ya votó" resuelto en la misma consulta (antes: un SELECT por encuesta)
+    ya_voto = exists().where(
+        models.Vote.survey_id == models.Survey.id,
+        models.Vote.usuario_id == usuario.id,
+    )
+    query = (
+        db.query(models.Survey)
+        .filter(
+            (models.Survey.fecha_expiracion == None) | (models.Survey.fecha_expiracion >= ahora),
+            ya_voto,
+            filtro_segmentacion(usuario),   # 👈 segmentación en SQL: páginas completas
+        )
+        .options(selectinload(models.Survey.questions).joinedload(models.Question.options))
+    )
+    resultado = paginar(query, [models.Survey.id], pagina)   # 👈 orden descendente por id
+    resultado.cabeceras(response)
+    surveys = resultado.items
+
+    # 👇 Todos los conteos del listado en un solo GROUP BY
+    conteo = contar_votos(db, [s.id for s in surveys])
 
     votadas = []
     for s in surveys:
         try:
-            if not cumple_segmentacion(s, usuario):
-                continue
-
-            ya_voto = db.query(models.Vote).filter(
-                models.Vote.usuario_id == usuario.id,
-                models.Vote.survey_id == s.id
-            ).first()
+            preguntas = []
+            for q in (s.questions or []):
+                total_votes, resultados = resultados_pregunta(q, conteo)
+                opciones = [
+                    {"id": o.id, "text": o.text, "count": votos, "percentage": porcentaje}
+                    for o, votos, porcentaje in resultados
+                ]
 
-            if ya_voto:
-                preguntas = []
-                for q in (s.questions or []):
-                    try:
-                        total_votes = db.query(models.Vote).filter(models.Vote.question_id == q.id).count() or 0
-                    except Exception:
-                        total_votes = 0
-
-                    opciones = []
-                    for o in (q.options or []):
-                        try:
-                            votes_count = db.query(models.Vote).filter(models.Vote.option_id == o.id).count() or 0
-                        except Exception:
-                            votes_count = 0
-                        percentage = (votes_count / total_votes * 100) if total_votes > 0 else 0
-                        opciones.append({
-                            "id": o.id,
-                            "text": o.text,
-                            "count": votes_count,
-                            "percentage": round(percentage, 1)
-                        })
-
-                    preguntas.append({
-                        "id": q.id,
-                        "text": q.text,
-                        "options": opciones,
-                        "total_votes": total_votes
-                    })
-
-                media_urls = []
-                if s.media_urls:
-                    try:
-                        media_urls = json.loads(s.media_urls)
-                    except Exception:
-                        media_urls = []
-
-                visibilidad = getattr(s.visibilidad_resultados, "value", "publica")
-
-                segundos_restantes = calcular_segundos_restantes(s.fecha_expiracion) if s.fecha_expiracion else 0
-
-                votadas.append({
-                    "id": s.id,
-                    "title": s.title,
-                    "description": s.description,
-                    "fecha_expiracion": s.fecha_expiracion.isoformat() if s.fecha_expiracion else None,
-                    "segundos_restantes": segundos_restantes,
-                    "questions": preguntas,
-                    "media_url": s.media_url,
-                    "media_urls": media_urls,
-                    "visibilidad_resultados": visibilidad,
-                    "es_patrocinada": s.patrocinada,
-                    "patrocinador": s.patrocinador,
-                    "recompensa_puntos": s.recompensa_puntos,
-                    "recompensa_dinero": s.recompensa_dinero,
-                    "presupuesto_total": s.presupuesto_total,
-                    # 👇 campos de segmentación parseados
-                    "sexo": json.loads(s.sexo) if s.sexo else [],
-                    "ciudad": json.loads(s.ciudad) if s.ciudad else [],
-                    "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-                    "profesion": json.loads(s.profesion) if s.profesion else [],   # 👈 nuevo campo
-                    "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-                    "religion": json.loads(s.religion) if s.religion else [],
-                    "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-                    "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
+                preguntas.append({
+                    "id": q.id,
+                    "text": q.text,
+                    "options": opciones,
+                    "total_votes": total_votes
                 })
 
+            media_urls = []
+            if s.media_urls:
+                try:
+                    media_urls = json.loads(s.media_urls)
+                except Exception:
+                    media_urls = []
+
+            visibilidad = getattr(s.visibilidad_resultados, "value", "publica")
+
+            segundos_restantes = calcular_segundos_restantes(s.fecha_expiracion) if s.fecha_expiracion else 0
+
+            votadas.append({
+                "id": s.id,
+                "title": s.title,
+                "description": s.description,
+                "fecha_expiracion": s.fecha_expiracion.isoformat() if s.fecha_expiracion else None,
+                "segundos_restantes": segundos_restantes,
+                "questions": preguntas,
+                "media_url": s.media_url,
+                "media_urls": media_urls,
+                "visibilidad_resultados": visibilidad,
+                "es_patrocinada": s.patrocinada,
+                "patrocinador": s.patrocinador,
+                "recompensa_puntos": s.recompensa_puntos,
+                "recompensa_dinero": s.recompensa_dinero,
+                "presupuesto_total": s.presupuesto_total,
+                # 👇 campos de segmentación parseados
+                **s.segmentacion,   # 👈 desde survey_targets
+            })
+
         except Exception as e:
             print(f"Error procesando encuesta {getattr(s, 'id', 'sin_id')}: {e}")
             continue
@@ -1511,46 +1370,39 @@ def surveys_votadas(
 
 @router.get("/finalizadas")
 def surveys_finalizadas(
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
     db: Session = Depends(database.get_db),
     usuario: models.Usuario = Depends(get_current_user)
 ):
     ahora = datetime.now(santo_domingo_tz)
     limite = ahora - timedelta(days=7)   # 👈 solo últimos 15 días
 
-    surveys = (
+    query = (
         db.query(models.Survey)
         .filter(models.Survey.fecha_expiracion < ahora)          # ya expiradas
         .filter(models.Survey.fecha_expiracion >= limite)        # no más de 15 días atrás
-        .order_by(models.Survey.id.desc())
-        .all()
+        .filter(filtro_segmentacion(usuario))                    # 👈 segmentación en SQL: páginas completas
+        .options(selectinload(models.Survey.questions).joinedload(models.Question.options))
     )
+    resultado = paginar(query, [models.Survey.id], pagina)
+    resultado.cabeceras(response)
+    surveys = resultado.items
+
+    # 👇 Todos los conteos del listado en un solo GROUP BY
+    conteo = contar_votos(db, [s.id for s in surveys])
 
     finalizadas = []
     for s in surveys:
         try:
-            if not cumple_segmentacion(s, usuario):
-                continue
 
             preguntas = []
             for q in (s.questions or []):
-                try:
-                    total_votes = db.query(models.Vote).filter(models.Vote.question_id == q.id).count() or 0
-                except Exception:
-                    total_votes = 0
-
-                opciones = []
-                for o in (q.options or []):
-                    try:
-                        votes_count = db.query(models.Vote).filter(models.Vote.option_id == o.id).count() or 0
-                    except Exception:
-                        votes_count = 0
-                    percentage = (votes_count / total_votes * 100) if total_votes > 0 else 0
-                    opciones.append({
-                        "id": o.id,
-                        "text": o.text,
-                        "count": votes_count,
-                        "percentage": round(percentage, 1)
-                    })
+                total_votes, resultados = resultados_pregunta(q, conteo)
+                opciones = [
+                    {"id": o.id, "text": o.text, "count": votos, "percentage": porcentaje}
+                    for o, votos, porcentaje in resultados
+                ]
 
                 preguntas.append({
                     "id": q.id,
@@ -1584,14 +1436,7 @@ def surveys_finalizadas(
                 "recompensa_dinero": s.recompensa_dinero,
                 "presupuesto_total": s.presupuesto_total,
                 # 👇 campos de segmentación parseados
-                "sexo": json.loads(s.sexo) if s.sexo else [],
-                "ciudad": json.loads(s.ciudad) if s.ciudad else [],
-                "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-                "profesion": json.loads(s.profesion) if s.profesion else [],   # 👈 nuevo campo
-                "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-                "religion": json.loads(s.religion) if s.religion else [],
-                "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-                "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
+                **s.segmentacion,   # 👈 desde survey_targets
             })
 
 
@@ -1629,14 +1474,7 @@ def get_survey_detail(
         media_url=survey.media_url,
         media_urls=json.loads(survey.media_urls) if survey.media_urls else [],
         media_type=survey.media_type,
-        sexo=json.loads(survey.sexo) if survey.sexo else [],
-        ciudad=json.loads(survey.ciudad) if survey.ciudad else [],
-        ocupacion=json.loads(survey.ocupacion) if survey.ocupacion else [],
-        profesion=json.loads(survey.profesion) if survey.profesion else [],   # 👈 nuevo campo
-        nivel_educativo=json.loads(survey.nivel_educativo) if survey.nivel_educativo else [],
-        religion=json.loads(survey.religion) if survey.religion else [],
-        nacionalidad=json.loads(survey.nacionalidad) if survey.nacionalidad else [],
-        estado_civil=json.loads(survey.estado_civil) if survey.estado_civil else [],
+        **survey.segmentacion,   # 👈 desde survey_targets
         patrocinada=survey.patrocinada,
         patrocinador=survey.patrocinador,
         recompensa_puntos=survey.recompensa_puntos,
@@ -1674,14 +1512,7 @@ def get_all_surveys(db: Session = Depends(database.get_db)):
                 "title": s.title,
                 "description": s.description,
                 "fecha_expiracion": s.fecha_expiracion,
-                "sexo": json.loads(s.sexo) if s.sexo else [],
-                "ocupacion": json.loads(s.ocupacion) if s.ocupacion else [],
-                "profesion": json.loads(s.profesion) if s.profesion else [],   # 👈 nuevo campo
-                "nivel_educativo": json.loads(s.nivel_educativo) if s.nivel_educativo else [],
-                "nacionalidad": json.loads(s.nacionalidad) if s.nacionalidad else [],
-                "estado_civil": json.loads(s.estado_civil) if s.estado_civil else [],
-                "religion": json.loads(s.religion) if s.religion else [],
-                "ciudad": json.loads(s.ciudad) if s.ciudad else [],
+                **s.segmentacion,   # 👈 desde survey_targets
                 "media_url": s.media_url,
                 "media_urls": json.loads(s.media_urls) if s.media_urls else [],
                 "questions": preguntas,
@@ -1701,239 +1532,30 @@ def get_all_surveys(db: Session = Depends(database.get_db)):
 # Votar en encuesta
 # -------------------
 @router.post("/{survey_id}/vote", response_model=VoteResponse)
-def vote(
+async def vote(
     survey_id: int,
     vote: schemas.VoteBatchCreate,
-    db: Session = Depends(database.get_db),
-    usuario: models.Usuario = Depends(get_current_user_only)
+    db=Depends(get_async_db),
+    usuario: models.Usuario = Depends(get_current_user_only_async)
 ):
     logging.info(f"➡️ Entrando a /vote con survey_id={survey_id}, usuario_id={usuario.id}")
 
-    survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
-    if not survey:
-        raise HTTPException(status_code=404, detail="Encuesta no encontrada")
-
-    if survey.patrocinada and (survey.presupuesto_total or 0) <= 0:
-        raise HTTPException(status_code=400, detail="Presupuesto agotado para esta encuesta patrocinada")
-
-    sponsor = None
-    perfil = None
-    transaccion = None
-    
-
-    # -------------------
-    # Bloque 1: Votos + Participación
-    # -------------------
-    if True:   # cambia a False para desactivar
-        try:
-            # Registrar votos
-            for answer in vote.answers:
-                logging.info(f"➡️ Procesando answer: question_id={answer.question_id}, option_id={answer.option_id}")
-                option = db.query(models.Option).filter(models.Option.id == answer.option_id).first()
-                if not option or option.question_id != answer.question_id:
-                    logging.error("❌ Opción inválida detectada")
-                    raise HTTPException(status_code=400, detail="Opción inválida")
-
-                voto_existente = db.query(models.Vote).filter(
-                    models.Vote.usuario_id == usuario.id,
-                    models.Vote.question_id == answer.question_id
-                ).first()
-
-                if voto_existente:
-                    logging.warning(f"❌ Ya existe voto previo en question_id={answer.question_id}")
-                    raise HTTPException(status_code=400, detail=f"Ya votaste en la pregunta {answer.question_id}")
-
-                db_vote = models.Vote(
-                    survey_id=survey_id,
-                    question_id=answer.question_id,
-                    option_id=answer.option_id,
-                    usuario_id=usuario.id,
-                    creado_en=datetime.utcnow()
-                )
-                db.add(db_vote)
-                logging.debug("➡️ Voto preparado: %s", db_vote.__dict__)
-
-            # Registrar participación si no existe
-            participacion_existente = db.query(models.Participacion).filter(
-                models.Participacion.usuario_id == usuario.id,
-                models.Participacion.survey_id == survey_id
-            ).first()
-
-            if not participacion_existente:
-                nueva_participacion = models.Participacion(
-                    usuario_id=usuario.id,
-                    survey_id=survey_id,
-                    fecha_participacion=datetime.utcnow(),
-                    creado_en=datetime.utcnow()
-                )
-                db.add(nueva_participacion)
-                logging.debug("➡️ Participación preparada: %s", nueva_participacion.__dict__)
-            else:
-                logging.info("ℹ️ Participación ya existente, no se crea nueva")
-
-            # Intentar commit
-            logging.info("➡️ Intentando commit de votos y participación...")
-            db.commit()
-            logging.info("✅ Commit ejecutado correctamente")
-
-        except Exception as e:
-            db.rollback()
-            logging.exception("❌ Error en Bloque 1 durante commit")
-            raise HTTPException(status_code=500, detail="Error interno en Bloque 1")
-
-
-
-    # -------------------
-    # Bloque 2: Patrocinio + Presupuesto
-    # -------------------
-    # Solo ejecutar si la encuesta está activa y no está pausada
-    if survey.active and survey.closed_reason != "paused":
-        transaccion = None
-        if survey.patrocinada:
-            sponsor_id = db.query(models.Survey.usuario_id).filter(models.Survey.id == survey_id).scalar()
-            sponsor = db.query(models.Usuario).filter(models.Usuario.id == sponsor_id).first()
-
-            if not sponsor or sponsor.rol != "sponsor":
-                raise HTTPException(status_code=400, detail="Sponsor inválido para encuesta patrocinada")
-
-            transaccion = models.SponsorTransaction(
-                survey_id=survey.id,
-                sponsor_id=sponsor.id,
-                beneficiario_id=usuario.id,
-                monto_dinero=survey.recompensa_dinero or 0,
-                puntos=survey.recompensa_puntos or 0,
-                timestamp=datetime.utcnow()
-            )
-            db.add(transaccion)
-            db.flush()
-            print("Transacción creada con ID:", transaccion.id)
-
-            # Garantizar billeteras
-            if not usuario.billetera:
-                nueva_wallet = models.Wallet(usuario_id=usuario.id, balance=0)
-                db.add(nueva_wallet)
-                db.flush()
-                db.refresh(nueva_wallet)
-                usuario.billetera = nueva_wallet
-
-            if not sponsor.billetera:
-                nueva_wallet_sponsor = models.Wallet(usuario_id=sponsor.id, balance=0)
-                db.add(nueva_wallet_sponsor)
-                db.flush()
-                db.refresh(nueva_wallet_sponsor)
-                sponsor.billetera = nueva_wallet_sponsor
-
-            # Merge para asegurar persistencia en la sesión
-            usuario = db.merge(usuario)
-            sponsor = db.merge(sponsor)
-
-            if not usuario.billetera or not sponsor.billetera:
-                raise HTTPException(status_code=500, detail="Error al cargar billeteras")
-
-            # Crédito al votante
-            wallet_votante = usuario.billetera
-            wallet_votante.balance = (wallet_votante.balance or 0) + (survey.recompensa_dinero or 0)
-            movimiento_ingreso = models.MovimientoWallet(
-                wallet_id=wallet_votante.id,
-                tipo="ingreso",
-                monto=survey.recompensa_dinero or 0,
-                fecha=datetime.utcnow(),
-                sponsor_transaction_id=transaccion.id
-            )
-            db.add(movimiento_ingreso)
-
-            # Débito al sponsor
-            wallet_sponsor = sponsor.billetera
-            wallet_sponsor.balance = (wallet_sponsor.balance or 0) - (survey.recompensa_dinero or 0)
-            movimiento_egreso = models.MovimientoWallet(
-                wallet_id=wallet_sponsor.id,
-                tipo="egreso",
-                monto=survey.recompensa_dinero or 0,
-                fecha=datetime.utcnow(),
-                sponsor_transaction_id=transaccion.id
-            )
-            db.add(movimiento_egreso)
-
-    
-
-        # Guardar presupuesto inicial
-        presupuesto_inicial = survey.presupuesto_total or 0
-        recompensa_dinero = survey.recompensa_dinero or 0
-
-        # Calcular gasto acumulado
-        total_votes = db.query(models.Vote).filter(models.Vote.survey_id == survey.id).count()
-        spent_budget = total_votes * recompensa_dinero
-        balance_restante = max(presupuesto_inicial - spent_budget, 0)
-
-        # Validar cierre automático
-        if balance_restante <= 0:
-            survey.active = False
-            survey.closed_at = datetime.utcnow()
-            survey.closed_reason = "funds"
-            logging.warning(f"💰 Encuesta {survey.id} cerrada automáticamente por presupuesto agotado")
-
-        db.commit()
-        db.refresh(survey)
-
-
-
-    # -------------------
-    # Bloque 3: Perfil + Logros
-    # -------------------
-    if True:   # cambia a False para desactivar
-        perfil = db.query(models.PerfilPublico).filter_by(usuario_id=usuario.id).first()
-        if perfil:
-            hoy = datetime.utcnow().date()
-            ultima = perfil.ultima_participacion if perfil.ultima_participacion else None
-
-            if ultima == hoy - timedelta(days=1):
-                perfil.racha_dias += 1
-            elif ultima != hoy:
-                perfil.racha_dias = 1
-
-            perfil.ultima_participacion = hoy
-
-            puntos_recompensa = survey.recompensa_puntos or 0
-            perfil.puntos = (perfil.puntos or 0) + puntos_recompensa
-            perfil.nivel = 1 + (perfil.puntos // 100)
-
-            verificar_logros(db, usuario.id, perfil)
-
-    # -------------------
-    # Commit y respuesta
-    # -------------------
+    # 👇 Votos, conteos, participación, recompensa, presupuesto y perfil
+    # en una sola transacción corta (ver utils/votacion.py)
     try:
-        db.commit()
-        usuario = db.merge(usuario)
-        if usuario.billetera:
-            db.refresh(usuario.billetera)
-
-        if 'sponsor' in locals() and sponsor:
-            sponsor = db.merge(sponsor)
-            if sponsor.billetera:
-                db.refresh(sponsor.billetera)
-    except Exception as e:
-        db.rollback()
-        import traceback
-        print("❌ Error inesperado:", str(e))
-        traceback.print_exc()
+        respuesta = await db.run_sync(registrar_voto, survey_id, usuario, vote.answers)
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception:
+        await db.rollback()
+        logging.exception("❌ Error registrando voto")
         raise HTTPException(status_code=500, detail="Error interno en el servidor")
 
-    if 'perfil' in locals() and perfil:
-        perfil = db.merge(perfil)
-        db.refresh(perfil)
-
-    balance = usuario.billetera.balance if usuario.billetera else None
-
-    return {
-        "message": "Votos y participación registrados correctamente",
-        "survey_id": survey.id,
-        "presupuesto_restante": survey.presupuesto_total,
-        "usuario_puntos": perfil.puntos if 'perfil' in locals() and perfil else 0,
-        "usuario_balance": balance,
-        "usuario_nivel": perfil.nivel if 'perfil' in locals() and perfil else 0,
-        "usuario_racha": perfil.racha_dias if 'perfil' in locals() and perfil else 0
-    }
+    cache_resultados.invalidar(survey_id)   # 👈 resultados cambiaron
+    logging.info("✅ Commit ejecutado correctamente")
+    return respuesta
 
 
 
@@ -1943,36 +1565,45 @@ def vote(
 
 
 @router.get("/{survey_id}/results")
-def get_results(
+async def get_results(
     survey_id: int,
-    db: Session = Depends(database.get_db),
-    usuario: models.Usuario = Depends(get_current_user)
+    db=Depends(get_read_async_db),   # 👈 réplica (primaria si el usuario acaba de votar)
+    usuario: models.Usuario = Depends(get_current_user_async)
 ):
-    survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
-    if not survey:
-        raise HTTPException(status_code=404, detail="Encuesta no encontrada")
+    # 👇 El payload es igual para todos; el control de visibilidad se hace
+    # sobre el payload (cacheado o no)
+    resultado = await resultados_con_cache(db, "movil", survey_id, None, _calcular_results_movil)
 
     # Control de visibilidad
-    if survey.visibilidad_resultados.value == "privada":
+    if resultado["visibilidad_resultados"] == "privada":
         if not usuario.rol:
             raise HTTPException(status_code=403, detail="Tu rol no está definido")
-        if usuario.rol != "admin" and (not survey.patrocinador or usuario.nombre != survey.patrocinador):
+        if usuario.rol != "admin" and (not resultado["patrocinador"] or usuario.nombre != resultado["patrocinador"]):
             raise HTTPException(status_code=403, detail="Resultados privados")
 
+    return resultado
+
+
+def _calcular_results_movil(db: Session, survey_id: int) -> dict:
+    survey = (
+        db.query(models.Survey)
+        .options(selectinload(models.Survey.questions).joinedload(models.Question.options))
+        .filter(models.Survey.id == survey_id)
+        .first()
+    )
+    if not survey:
+        raise HTTPException(status_code=404, detail="Encuesta no encontrada")
+
+    # 👇 Un solo GROUP BY para todas las preguntas y opciones
+    conteo = contar_votos(db, [survey.id])
+
     results = []
     for question in survey.questions:
-        options_data = []
-        total_votes = db.query(models.Vote).filter(models.Vote.question_id == question.id).count()
-
-        for option in question.options:
-            votes_count = db.query(models.Vote).filter(models.Vote.option_id == option.id).count()
-            percentage = (votes_count / total_votes * 100) if total_votes > 0 else 0
-            options_data.append({
-                "id": option.id,
-                "text": option.text,
-                "votes": votes_count,
-                "percentage": round(percentage, 1),
-            })
+        total_votes, resultados = resultados_pregunta(question, conteo)
+        options_data = [
+            {"id": option.id, "text": option.text, "votes": votos, "percentage": porcentaje}
+            for option, votos, porcentaje in resultados
+        ]
 
         results.append({
             "question_id": question.id,
@@ -2105,7 +1736,7 @@ def participate(
 # -------------------
 @router.get("/mis-encuestas")
 def historial_encuestas(
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(get_read_db),
     usuario: models.Usuario = Depends(get_current_user_only)
 ):
     participaciones = db.query(models.Participacion).filter(
@@ -2136,7 +1767,7 @@ from votapp_app.database import get_db
 
 @router.get("/users/me/wallet/history", response_model=WalletOut)
 def get_wallet_history(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     usuario: models.Usuario = Depends(get_current_user_only)
 ):
     # 👇 aquí imprimes el usuario que llega del token
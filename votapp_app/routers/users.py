@@ -5,7 +5,7 @@
 # Users Routes (usuarios)
 # -----------------------------
 
-from fastapi import APIRouter, Query, Depends, HTTPException, File, UploadFile, Request
+from fastapi import APIRouter, Query, Depends, HTTPException, File, UploadFile, Request, Response
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
@@ -16,7 +16,7 @@ import shutil
 import json
 
 from .. import models, schemas, database
-from ..auth import get_current_user   # ✅ valida el token
+from ..auth import get_current_user, get_read_db, invalidar_usuario   # ✅ valida el token
 
 # 👇 importa las clases y funciones específicas
 from ..models import Usuario
@@ -28,6 +28,7 @@ from ..database import get_db
 
 from typing import List
 from votapp_app.utils import safe_json_list
+from votapp_app.utils.paginacion import ParametrosPagina, paginar
 from sqlalchemy.orm import joinedload
 
 # ✅ Importa tu servicio de Cloudinary
@@ -261,9 +262,8 @@ def update_user_me(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user),
 ):
-    user = db.query(Usuario).filter(Usuario.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    # 👇 current_user ya está en esta sesión (mismo get_db que auth)
+    user = current_user
 
     # Validar correo único si se intenta cambiar
     if update.correo and update.correo != user.correo:
@@ -278,6 +278,7 @@ def update_user_me(
 
     db.add(user)
     db.commit()
+    invalidar_usuario(user.id)
     db.refresh(user)
     return user
 
@@ -393,24 +394,29 @@ def upload_avatar_endpoint(
 
 @router.get("/me/surveys/history", response_model=list[schemas.SurveyHistoryOut])
 def get_user_survey_history(
-    db: Session = Depends(database.get_db),
+    response: Response,
+    pagina: ParametrosPagina = Depends(),
+    db: Session = Depends(get_read_db),
     current_user: models.Usuario = Depends(get_current_user),
 ):
     print("=== INICIO ENDPOINT HISTORIAL ===")
     print("Usuario actual:", current_user.id, type(current_user.id))
 
-    participaciones = (
+    query = (
         db.query(models.Participacion)
         .filter(models.Participacion.usuario_id == int(current_user.id))
         .options(
+            # 👇 colecciones con selectinload: el LIMIT de la página queda sobre participaciones
             joinedload(models.Participacion.survey)
-            .joinedload(models.Survey.questions)
-            .joinedload(models.Question.options),
+            .selectinload(models.Survey.questions)
+            .selectinload(models.Question.options),
             joinedload(models.Participacion.survey)
-            .joinedload(models.Survey.sponsor_transactions)
+            .selectinload(models.Survey.sponsor_transactions)
         )
-        .all()
     )
+    resultado = paginar(query, [models.Participacion.id], pagina)   # 👈 más recientes primero
+    resultado.cabeceras(response)
+    participaciones = resultado.items
 
     print("Participaciones encontradas:", [p.id for p in participaciones])
 
@@ -506,11 +512,6 @@ def listar_encuestas_simples(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    # validar que el usuario existe
-    usuario = db.query(Usuario).filter(Usuario.id == current_user.id).first()
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
     encuestas = (
         db.query(SurveySimple)
         .filter(SurveySimple.usuario_id == current_user.id)
@@ -2,113 +2,31 @@ from fastapi import APIRouter
 import feedparser
 import os
 import json
-from datetime import datetime, timedelta
 from typing import List
 
-import cohere
-from votapp_app import models
+from votapp_app import llm
 from votapp_app.database import SessionLocal
 from googleapiclient.discovery import build
 from .schemas import SurveyOut
+from .ingesta import Entrada, ingerir
 
 router = APIRouter()
 
 
-import os
-print("COHERE_API_KEY loaded:", os.getenv("COHERE_API_KEY")[:6], "...")
-
 RSS_URL = "https://www.diariolibre.com/rss/portada.xml"
-co = cohere.ClientV2(api_key=os.getenv("COHERE_API_KEY"))
-
-def resumir_con_cohere(texto: str) -> str:
-    prompt = f"Resume en máximo 2 frases claras y neutrales:\n\n{texto}"
-    response = co.chat(
-        model="command-a-plus-05-2026",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    # Filtrar solo los items de tipo texto
-    texts = [c.text for c in response.message.content if c.type == "text"]
-    return texts[0].strip() if texts else ""
-
-def generar_preguntas_con_cohere(titulo: str, resumen: str):
-    prompt = f"""
-    Genera exactamente 3 preguntas de encuesta ciudadana en formato JSON,
-    basadas únicamente en la siguiente noticia.
+_proveedor = None
 
-    Las preguntas deben ser cortas, neutrales y enfocadas en la opinión del usuario,
-    no en evaluar conocimiento. Cada pregunta debe tener 2 o 3 opciones simples
-    como "Sí / No" o "De acuerdo / En desacuerdo".
 
-    Título: {titulo}
-    Resumen: {resumen}
-
-    Devuelve únicamente JSON válido, sin texto adicional, con este formato:
-    [
-      {{
-        "text": "Pregunta 1",
-        "options": [
-          {{"text": "Opción A"}},
-          {{"text": "Opción B"}}
-        ]
-      }},
-      {{
-        "text": "Pregunta 2",
-        "options": [
-          {{"text": "Opción A"}},
-          {{"text": "Opción B"}}
-        ]
-      }},
-      {{
-        "text": "Pregunta 3",
-        "options": [
-          {{"text": "Opción A"}},
-          {{"text": "Opción B"}}
-        ]
-      }}
-    ]
+def obtener_proveedor() -> llm.ProveedorLLM:
     """
-    response = co.chat(
-        model="command-a-plus-05-2026",
-        messages=[{"role": "user", "content": prompt}]
-    )
-
-    texts = [c.text for c in response.message.content if c.type == "text"]
-    preguntas_json = texts[0].strip() if texts else "[]"
-
-    try:
-        preguntas = json.loads(preguntas_json)
-        if not isinstance(preguntas, list):
-            preguntas = [preguntas]
-    except Exception:
-        preguntas = [{
-            "text": f"¿Qué opinas de la noticia '{titulo}'?",
-            "options": [
-                {"text": "Me interesa"},
-                {"text": "No me interesa"},
-                {"text": "Prefiero no opinar"}
-            ]
-        }]
-    return preguntas
-
-def normalizar_preguntas(encuesta: models.Survey):
-    preguntas_out = []
-    for q in encuesta.questions:
-        opciones_out = []
-        for o in q.options:
-            opciones_out.append({
-                "id": o.id,             # 👈 ID real de la opción
-                "text": o.text,
-                "count": 0,
-                "percentage": None
-            })
-        preguntas_out.append({
-            "id": q.id,                # 👈 ID real de la pregunta
-            "text": q.text,
-            "options": opciones_out,
-            "total_votes": 0
-        })
-    return preguntas_out
-
+    Proveedor según LLM_PROVEEDOR (cohere, openai o local), creado al primer
+    uso: un SDK faltante o una clave mal configurada falla en la ingesta, no
+    al importar la app.
+    """
+    global _proveedor
+    if _proveedor is None:
+        _proveedor = llm.proveedor_desde_entorno()
+    return _proveedor
 
 
 @router.get("/youtube/diariolibre", response_model=List[SurveyOut])
@@ -138,94 +56,31 @@ def obtener_encuestas_youtube():
         maxResults=3
     ).execute()
 
-    db = SessionLocal()
-    encuestas = []
-
+    entradas = []
     for item in videos_response["items"]:
         titulo = item["snippet"]["title"]
-        resumen_original = item["snippet"].get("description", titulo)
-        resumen = resumir_con_cohere(resumen_original)
-
-        preguntas_raw = generar_preguntas_con_cohere(titulo, resumen)
-
         video_id = item["snippet"]["resourceId"]["videoId"]
         youtube_url = f"https://www.youtube.com/watch?v={video_id}"
         thumbnail_url = item["snippet"]["thumbnails"]["high"]["url"]
 
-        encuesta_existente = db.query(models.Survey).filter(
-            models.Survey.source_url == youtube_url
-        ).first()
-        if encuesta_existente:
-            continue
-
-        encuesta = models.Survey(
-            title=titulo,
-            description=resumen,
-            media_url=youtube_url,
-            media_urls=json.dumps([thumbnail_url]),
-            media_type="webview",
-            fecha_expiracion=datetime.utcnow() + timedelta(days=7),
-            patrocinada=False,
-            patrocinador="Diario Libre YouTube",
-            recompensa_puntos=10,
-            recompensa_dinero=0,
-            presupuesto_total=100,
-            visibilidad_resultados="publica",
+        entradas.append(Entrada(
             source_url=youtube_url,
-            usuario_id=9999   # 👈 asignar al usuario de sistema
-        )
+            titulo=titulo,
+            texto=item["snippet"].get("description", titulo),
+            columnas={
+                "media_url": youtube_url,
+                "media_urls": json.dumps([thumbnail_url]),
+                "media_type": "webview",
+                "patrocinador": "Diario Libre YouTube",
+            },
+        ))
 
-        db.add(encuesta)
-        db.flush()  # 👈 asegura que encuesta.id esté disponible
-
-        # Crear preguntas y opciones en DB con IDs reales
-        for pregunta in preguntas_raw:
-            q = models.Question(text=pregunta["text"], survey=encuesta)
-            db.add(q)
-            db.flush()  # 👈 asegura que q.id esté disponible
-            for opcion in pregunta.get("options", []):
-                o = models.Option(text=opcion["text"], question=q)
-                db.add(o)
-                db.flush()  # 👈 asegura que o.id esté disponible
-
-        # Normalizar usando IDs reales de la DB
-        preguntas_out = []
-        for q in encuesta.questions:
-            opciones_out = []
-            for o in q.options:
-                opciones_out.append({
-                    "id": o.id,
-                    "text": o.text,
-                    "count": 0,
-                    "percentage": None
-                })
-            preguntas_out.append({
-                "id": q.id,
-                "text": q.text,
-                "options": opciones_out,
-                "total_votes": 0
-            })
-
-        encuestas.append({
-            "id": encuesta.id,
-            "title": titulo,
-            "description": resumen,
-            "fecha_expiracion": encuesta.fecha_expiracion,
-            "questions": preguntas_out,
-            "media_url": youtube_url,
-            "media_urls": [thumbnail_url],
-            "media_type": "webview",
-            "patrocinada": encuesta.patrocinada,
-            "patrocinador": encuesta.patrocinador,
-            "recompensa_puntos": encuesta.recompensa_puntos,
-            "recompensa_dinero": encuesta.recompensa_dinero,
-            "presupuesto_total": encuesta.presupuesto_total,
-            "visibilidad_resultados": encuesta.visibilidad_resultados,
-            "source_url": youtube_url
-        })
-
-    db.commit()
-    db.close()
+    db = SessionLocal()
+    try:
+        encuestas = ingerir(db, entradas, obtener_proveedor(), "webview")
+        db.commit()
+    finally:
+        db.close()
 
     print(f"✅ {len(encuestas)} encuestas nuevas creadas desde YouTube Diario Libre")
 
@@ -236,20 +91,9 @@ def obtener_encuestas_youtube():
 @router.get("/rss/diariolibre", response_model=List[SurveyOut])
 def obtener_encuestas_diariolibre():
     feed = feedparser.parse(RSS_URL)
-    db = SessionLocal()
-    encuestas = []
 
+    entradas = []
     for entry in feed.entries[:4]:
-        titulo = entry.title
-        resumen_original = getattr(entry, "summary", getattr(entry, "description", ""))
-        resumen = resumir_con_cohere(resumen_original)
-
-        preguntas_raw = generar_preguntas_con_cohere(titulo, resumen)
-
-        encuesta_existente = db.query(models.Survey).filter(models.Survey.source_url == entry.link).first()
-        if encuesta_existente:
-            continue
-
         imagen = None
         if hasattr(entry, "media_content") and entry.media_content:
             imagen = entry.media_content[0].get("url")
@@ -258,73 +102,23 @@ def obtener_encuestas_diariolibre():
         if not imagen:
             imagen = "https://mi-cdn.com/imagenes/placeholder.png"
 
-        encuesta = models.Survey(
-            title=titulo,
-            description=resumen,
-            media_url=imagen,
-            media_urls=json.dumps([imagen]),
-            fecha_expiracion=datetime.utcnow() + timedelta(days=7),
-            patrocinada=False,
-            patrocinador="Diario Libre Auto",
-            recompensa_puntos=10,
-            recompensa_dinero=0,
-            presupuesto_total=100,
-            visibilidad_resultados="publica",
+        entradas.append(Entrada(
             source_url=entry.link,
-            usuario_id=9999   # 👈 asignar al usuario de sistema
-        )
-
-        db.add(encuesta)
-        db.flush()  # 👈 asegura que encuesta.id esté disponible
-
-        # Crear preguntas y opciones en DB
-        for pregunta in preguntas_raw:
-            q = models.Question(text=pregunta["text"], survey=encuesta)
-            db.add(q)
-            db.flush()  # 👈 asegura que q.id esté disponible
-            for opcion in pregunta.get("options", []):
-                o = models.Option(text=opcion["text"], question=q)
-                db.add(o)
-                db.flush()  # 👈 asegura que o.id esté disponible
+            titulo=entry.title,
+            texto=getattr(entry, "summary", getattr(entry, "description", "")),
+            columnas={
+                "media_url": imagen,
+                "media_urls": json.dumps([imagen]),
+                "patrocinador": "Diario Libre Auto",
+            },
+        ))
 
-        # Normalizar usando IDs reales de la DB
-        preguntas_out = []
-        for q in encuesta.questions:
-            opciones_out = []
-            for o in q.options:
-                opciones_out.append({
-                    "id": o.id,
-                    "text": o.text,
-                    "count": 0,
-                    "percentage": None
-                })
-            preguntas_out.append({
-                "id": q.id,
-                "text": q.text,
-                "options": opciones_out,
-                "total_votes": 0
-            })
-
-        encuestas.append({
-            "id": encuesta.id,
-            "title": titulo,
-            "description": resumen,
-            "fecha_expiracion": encuesta.fecha_expiracion,
-            "questions": preguntas_out,
-            "media_url": imagen,
-            "media_urls": [imagen],
-            "media_type": "native",
-            "patrocinada": encuesta.patrocinada,
-            "patrocinador": encuesta.patrocinador,
-            "recompensa_puntos": encuesta.recompensa_puntos,
-            "recompensa_dinero": encuesta.recompensa_dinero,
-            "presupuesto_total": encuesta.presupuesto_total,
-            "visibilidad_resultados": encuesta.visibilidad_resultados,
-            "source_url": entry.link
-        })
-
-    db.commit()
-    db.close()
+    db = SessionLocal()
+    try:
+        encuestas = ingerir(db, entradas, obtener_proveedor(), "native")
+        db.commit()
+    finally:
+        db.close()
 
     print(f"✅ {len(encuestas)} encuestas nuevas creadas desde RSS Diario Libre")
 
@@ -8,7 +8,7 @@ from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from sqlalchemy.ext.declarative import declarative_base
-from typing import List, Optional, Literal, Dict
+from typing import Any, List, Optional, Literal, Dict
 from enum import Enum
 
 import json
@@ -226,6 +226,32 @@ class SurveyCreate(BaseModel):
     visibilidad_resultados: Literal["publica", "privada"] = "publica"
 
 
+class SurveyImport(SurveyCreate):
+    usuario_id: Optional[int] = None   # 👈 creador; por defecto, el admin que importa
+    source_url: Optional[str] = None
+
+
+class SurveyImportOut(BaseModel):
+    creadas: int
+    ids: List[int]
+
+
+class TareaIn(BaseModel):
+    tipo: str
+    payload: Dict[str, Any] = {}   # 👈 kwargs de la tarea
+    retraso_segundos: int = 0
+
+
+class TareaOut(BaseModel):
+    id: int
+    tipo: str
+    estado: str
+    disponible_en: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class OpcionOut(BaseModel):
     id: Optional[int] = None
     texto: str = Field(alias="text")
@@ -454,6 +480,15 @@ class SegmentacionItem(BaseModel):
     segment: str
     votes: int
 
+class CrosstabRow(BaseModel):
+    question_id: Optional[int]
+    option_id: int
+    segments: List[SegmentacionItem]
+
+class CrosstabOut(BaseModel):
+    dimension: str
+    rows: List[CrosstabRow]
+
 class SurveyResultsOut(BaseModel):
     id: int
     title: str
@@ -495,6 +530,9 @@ class SurveyResultsOut(BaseModel):
     # 👇 Segmentación real de votos
     segmentacion_votos: Optional[Dict[str, List[SegmentacionItem]]] = {}
 
+    # 👇 Cruce opción × segmento (?crosstab=<campo>)
+    crosstab: Optional[CrosstabOut] = None
+
     class Config:
         orm_mode = True
         json_encoders = {
@@ -1,22 +1,114 @@
 
 ## votapp_app/tasks.py
 
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
 from votapp_app import models, database
+from votapp_app.cache import cache_resultados
+from votapp_app.cola import tarea
+from votapp_app.utils.gamificacion import procesar_lote
+from votapp_app.utils.resultados import consulta_conteo_votes
+from votapp_app.utils.snapshots import exportar_snapshots
 
+logger = logging.getLogger("tasks")
+
+@tarea()
 def cerrar_encuestas_por_presupuesto():
     db = database.SessionLocal()
+    # 👇 fondos_agotados es una columna generada e indexada: no se recorren
+    # todas las patrocinadas. El voto ya cierra al agotar fondos; esto
+    # cubre encuestas cuyo presupuesto se redujo al editarlas.
     encuestas = db.query(models.Survey).filter(
-        models.Survey.patrocinada == True,
+        models.Survey.fondos_agotados == True,
         models.Survey.active == True,
-        models.Survey.presupuesto_total <= 0
     ).all()
 
     for encuesta in encuestas:
         encuesta.active = False
         encuesta.closed_at = datetime.utcnow()
         encuesta.closed_reason = "funds"
-        print(f"💰 Encuesta {encuesta.id} cerrada por presupuesto agotado")
+        logger.info("💰 Encuesta %s cerrada por presupuesto agotado", encuesta.id)
 
     db.commit()
+    for encuesta in encuestas:
+        cache_resultados.invalidar(encuesta.id)
     db.close()
+
+
+@tarea(timeout=3600)   # 👈 recorre todos los votes: más que el timeout por defecto
+def reconciliar_conteos(survey_ids=None):
+    """
+    Reconstruye vote_tallies desde `votes` (todas las encuestas o solo
+    `survey_ids`). El LOCK en modo EXCLUSIVE deja leer los conteos pero
+    hace esperar a los votos que intentan sumar, así que ningún voto se
+    pierde ni se cuenta dos veces mientras se reconstruye.
+    """
+    db = database.SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("LOCK TABLE vote_tallies IN EXCLUSIVE MODE"))
+
+        borrar = db.query(models.VoteTally)
+        if survey_ids is not None:
+            borrar = borrar.filter(models.VoteTally.survey_id.in_(list(survey_ids)))
+        borrar.delete(synchronize_session=False)
+
+        db.execute(
+            insert(models.VoteTally).from_select(
+                ["survey_id", "question_id", "option_id", "count"],
+                consulta_conteo_votes(survey_ids),
+            )
+        )
+        db.commit()
+        logger.info("🔁 Conteos de votos reconciliados")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@tarea()
+def procesar_eventos_gamificacion(lote: int = 500, max_lotes: int = 20):
+    """
+    Vacía el outbox de gamificación en lotes de `lote` eventos, un commit
+    por lote. Luego borra los eventos procesados hace más de 7 días.
+    """
+    db = database.SessionLocal()
+    total = 0
+    try:
+        for _ in range(max_lotes):
+            procesados = procesar_lote(db, lote)
+            db.commit()
+            total += procesados
+            if procesados < lote:
+                break
+
+        db.query(models.EventoGamificacion).filter(
+            models.EventoGamificacion.procesado_en < datetime.utcnow() - timedelta(days=7)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return total
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@tarea(timeout=3600)
+def snapshot_analitica():
+    """
+    Snapshot incremental de votes, participaciones, sponsor_transactions y
+    la demografía de usuarios a Parquet en SNAPSHOT_DIR. Lee de la réplica
+    si hay una configurada.
+    """
+    db = database.enrutador_lectura.sesion()
+    try:
+        marcas = exportar_snapshots(db)
+        if marcas:
+            logger.info("📦 Snapshot analítico al día: %s", marcas)
+        return marcas
+    finally:
+        db.close()
@@ -0,0 +1,139 @@
+# votapp_app/utils/analitica.py
+
+from collections import defaultdict
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import distinct, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from votapp_app import models
+from votapp_app.models import CAMPOS_SEGMENTACION
+
+
+# -------------------
+# Analítica de resultados (Sponsor Dashboard)
+# -------------------
+def filtro_demografico(filtros: dict):
+    """Condiciones `Usuario.<campo> IN (...)` para los filtros con valores."""
+    return [
+        getattr(models.Usuario, campo).in_(valores)
+        for campo, valores in (filtros or {}).items()
+        if valores
+    ]
+
+
+def analizar_votos(
+    db: Session,
+    survey_id: int,
+    filtros: Optional[dict] = None,
+    crosstab: Optional[str] = None,
+) -> dict:
+    """
+    Todo el dashboard de una encuesta en una sola consulta con
+    GROUPING SETS sobre los votos filtrados (JOIN con usuarios):
+
+      ()                       → total de votos y participantes únicos
+      (option_id)              → votos por opción
+      (fecha)                  → votos y participantes únicos por día
+      (<campo>) por dimensión  → segmentación real de votos
+      (option_id, <crosstab>)  → cruce opción × segmento (opcional)
+
+    Cada fila trae GROUPING(...) para saber a qué conjunto pertenece.
+    Los filtros demográficos se aplican a todos los conjuntos.
+    """
+    if crosstab is not None and crosstab not in CAMPOS_SEGMENTACION:
+        raise ValueError(f"Dimensión de crosstab inválida: {crosstab}")
+
+    fecha = func.date(models.Vote.creado_en)
+    dimensiones = [getattr(models.Usuario, campo) for campo in CAMPOS_SEGMENTACION]
+    columnas = [models.Vote.option_id, fecha, *dimensiones]
+
+    # nombre → índices (en `columnas`) que agrupa cada conjunto
+    conjuntos = {"total": (), "opcion": (0,), "fecha": (1,)}
+    for i, campo in enumerate(CAMPOS_SEGMENTACION, start=2):
+        conjuntos[campo] = (i,)
+    if crosstab is not None:
+        conjuntos["crosstab"] = (0, 2 + CAMPOS_SEGMENTACION.index(crosstab))
+
+    # GROUPING() pone a 1 el bit de cada columna NO agrupada (la primera es el bit alto)
+    n = len(columnas)
+    por_mascara = {
+        sum(1 << (n - 1 - i) for i in range(n) if i not in indices): nombre
+        for nombre, indices in conjuntos.items()
+    }
+
+    stmt = (
+        select(
+            func.grouping(*columnas),
+            *columnas,
+            func.count(models.Vote.id),
+            func.count(distinct(models.Vote.usuario_id)),
+        )
+        .join(models.Usuario, models.Usuario.id == models.Vote.usuario_id)
+        .where(models.Vote.survey_id == survey_id, *filtro_demografico(filtros))
+        .group_by(func.grouping_sets(*[
+            tuple_(*[columnas[i] for i in indices]) for indices in conjuntos.values()
+        ]))
+    )
+
+    resultado = {
+        "total_votes": 0,
+        "total_participants": 0,
+        "por_opcion": {},
+        "votos_por_fecha": {},
+        "participantes_por_fecha": {},
+        "segmentos": {campo: [] for campo in CAMPOS_SEGMENTACION},
+        "crosstab": [],
+    }
+    crosstab_i = 1 + conjuntos["crosstab"][1] if crosstab is not None else None
+
+    for fila in db.execute(stmt):
+        nombre = por_mascara.get(fila[0])
+        votos, participantes = fila[-2], fila[-1]
+        if nombre == "total":
+            resultado["total_votes"] = votos
+            resultado["total_participants"] = participantes
+        elif nombre == "opcion":
+            resultado["por_opcion"][fila[1]] = votos
+        elif nombre == "fecha":
+            if fila[2] is not None:
+                resultado["votos_por_fecha"][str(fila[2])] = votos
+                resultado["participantes_por_fecha"][str(fila[2])] = participantes
+        elif nombre == "crosstab":
+            if fila[crosstab_i]:
+                resultado["crosstab"].append((fila[1], fila[crosstab_i], votos))
+        elif nombre in resultado["segmentos"]:
+            segmento = fila[1 + conjuntos[nombre][0]]
+            if segmento:
+                resultado["segmentos"][nombre].append({"segment": segmento, "votes": votos})
+
+    return resultado
+
+
+def serie_diaria(inicio, fin, por_fecha: dict, clave: str) -> list:
+    """Serie día a día entre inicio y fin (inclusive); 0 si no hubo datos."""
+    serie = []
+    if not (inicio and fin):
+        return serie
+    actual = inicio
+    while actual <= fin:
+        fecha = actual.isoformat()
+        serie.append({"date": fecha, clave: por_fecha.get(fecha, 0)})
+        actual += timedelta(days=1)
+    return serie
+
+
+def agrupar_crosstab(celdas, question_por_opcion: dict) -> list:
+    """[(option_id, segmento, votos)] → filas ordenadas por opción y votos."""
+    por_opcion = defaultdict(list)
+    for option_id, segmento, votos in celdas:
+        por_opcion[option_id].append({"segment": segmento, "votes": votos})
+    return [
+        {
+            "question_id": question_por_opcion.get(option_id),
+            "option_id": option_id,
+            "segments": sorted(segmentos, key=lambda s: -s["votes"]),
+        }
+        for option_id, segmentos in sorted(por_opcion.items())
+    ]
@@ -0,0 +1,105 @@
+# votapp_app/utils/creacion.py
+
+import json
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from votapp_app import models
+from votapp_app.models import CAMPOS_SEGMENTACION, normalizar_segmentacion
+
+
+# -------------------
+# Creación masiva (INSERT multi-fila con RETURNING)
+# -------------------
+def _texto(item) -> str:
+    """Pregunta u opción como dict ({"text": ...}) o schema con .text."""
+    return item["text"] if isinstance(item, dict) else item.text
+
+
+def _opciones(pregunta) -> list:
+    return (pregunta.get("options") if isinstance(pregunta, dict) else pregunta.options) or []
+
+
+def _insertar_ids(db: Session, modelo, filas: list) -> list:
+    """
+    Un INSERT ... RETURNING id para todas las filas (insertmanyvalues),
+    con los ids en el mismo orden que `filas`.
+    """
+    if not filas:
+        return []
+    stmt = insert(modelo).returning(modelo.id, sort_by_parameter_order=True)
+    return db.execute(stmt, filas).scalars().all()
+
+
+def insertar_preguntas(db: Session, por_encuesta: list) -> list:
+    """
+    Preguntas y opciones de varias encuestas en dos INSERT (uno por tabla),
+    en vez de un flush por fila. `por_encuesta` es [(survey_id, preguntas)],
+    donde cada pregunta trae `text` y `options` (dicts o schemas).
+
+    Devuelve, por encuesta y en el mismo orden, las preguntas creadas:
+    [{"id", "text", "options": [{"id", "text"}], "total_votes": 0}].
+    """
+    filas_preguntas = [
+        {"survey_id": survey_id, "text": _texto(p)}
+        for survey_id, preguntas in por_encuesta
+        for p in preguntas
+    ]
+    ids_preguntas = iter(_insertar_ids(db, models.Question, filas_preguntas))
+
+    creadas = []
+    filas_opciones = []
+    for _, preguntas in por_encuesta:
+        salida = []
+        for p in preguntas:
+            question_id = next(ids_preguntas)
+            opciones = [{"question_id": question_id, "text": _texto(o)} for o in _opciones(p)]
+            filas_opciones.extend(opciones)
+            salida.append({"id": question_id, "text": _texto(p), "options": opciones, "total_votes": 0})
+        creadas.append(salida)
+
+    # 👇 los ids de opción vuelven en orden: se completan en los mismos dicts
+    for fila, option_id in zip(filas_opciones, _insertar_ids(db, models.Option, filas_opciones)):
+        fila["id"] = option_id
+    for salida in creadas:
+        for pregunta in salida:
+            pregunta["options"] = [{"id": o["id"], "text": o["text"]} for o in pregunta["options"]]
+    return creadas
+
+
+def crear_encuestas(db: Session, encuestas: list) -> list:
+    """
+    Crea varias encuestas completas con cuatro INSERT en total (encuestas,
+    survey_targets, preguntas, opciones), sin commit: lo hace el llamador.
+
+    Cada elemento es un dict con las columnas de Survey, más `segmentacion`
+    ({campo: [valores]}) y `questions`. Devuelve [{"id", "questions"}] en
+    el mismo orden.
+    """
+    filas = []
+    segmentaciones = []
+    for encuesta in encuestas:
+        datos = {k: v for k, v in encuesta.items() if k not in ("segmentacion", "questions")}
+        segmentacion = normalizar_segmentacion(encuesta.get("segmentacion") or {})
+        # 👇 columnas JSON legacy en sincronía, igual que asignar_segmentacion
+        datos.update({campo: json.dumps(segmentacion[campo]) for campo in CAMPOS_SEGMENTACION})
+        datos["segmentacion_version"] = 1
+        filas.append(datos)
+        segmentaciones.append(segmentacion)
+
+    survey_ids = _insertar_ids(db, models.Survey, filas)
+
+    targets = [
+        {"survey_id": survey_id, "field": campo, "value": valor}
+        for survey_id, segmentacion in zip(survey_ids, segmentaciones)
+        for campo, valores in segmentacion.items()
+        for valor in valores
+    ]
+    if targets:
+        db.execute(insert(models.SurveyTarget), targets)
+
+    preguntas = insertar_preguntas(
+        db, [(survey_id, e.get("questions") or []) for survey_id, e in zip(survey_ids, encuestas)]
+    )
+    return [{"id": survey_id, "questions": q} for survey_id, q in zip(survey_ids, preguntas)]
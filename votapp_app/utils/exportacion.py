@@ -0,0 +1,113 @@
+# votapp_app/utils/exportacion.py
+
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from votapp_app import models
+from votapp_app.models import CAMPOS_SEGMENTACION
+from votapp_app.utils.analitica import filtro_demografico
+
+EXPORT_LOTE = int(os.getenv("EXPORT_LOTE", "2000"))   # filas por fetch del cursor y por chunk enviado
+EXPORT_SAL = os.getenv("EXPORT_SAL")   # 👈 secreto de los seudónimos; sin él no hay export
+
+COLUMNAS = (
+    "vote_id",
+    "creado_en",
+    "respondente",
+    "question_id",
+    "question",
+    "option_id",
+    "option",
+    *CAMPOS_SEGMENTACION,
+)
+
+
+# -------------------
+# Export de respuestas crudas (Sponsor Dashboard)
+# -------------------
+def sal_export() -> str:
+    """
+    Secreto del HMAC de seudónimos. Sin EXPORT_SAL no se exporta: con una
+    sal conocida bastaría hashear cada usuario_id para deshacer el seudónimo.
+    """
+    if not EXPORT_SAL:
+        raise HTTPException(status_code=503, detail="Export deshabilitado: falta configurar EXPORT_SAL")
+    return EXPORT_SAL
+
+
+def _respondente(sal: str, survey_id: int, usuario_id: int) -> str:
+    """Id seudónimo y estable por encuesta (HMAC-SHA256): agrupa respuestas sin exponer el usuario."""
+    return hmac.new(sal.encode(), f"{survey_id}:{usuario_id}".encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def consulta_respuestas(survey_id: int, filtros: dict):
+    """Votos de la encuesta con texto de pregunta/opción y demografía, mismos filtros que analizar_votos."""
+    return (
+        select(
+            models.Vote.id,
+            models.Vote.creado_en,
+            models.Vote.usuario_id,
+            models.Vote.question_id,
+            models.Question.text,
+            models.Vote.option_id,
+            models.Option.text,
+            *[getattr(models.Usuario, campo) for campo in CAMPOS_SEGMENTACION],
+        )
+        .join(models.Question, models.Question.id == models.Vote.question_id)
+        .join(models.Option, models.Option.id == models.Vote.option_id)
+        .join(models.Usuario, models.Usuario.id == models.Vote.usuario_id)
+        .where(models.Vote.survey_id == survey_id, *filtro_demografico(filtros))
+        .order_by(models.Vote.id)
+    )
+
+
+def lotes_respuestas(db: Session, survey_id: int, filtros: dict):
+    """
+    Lotes de filas (dicts en el orden de COLUMNAS). yield_per activa el
+    cursor del lado del servidor (stream_results): en memoria solo vive
+    un lote, sin importar el tamaño de la campaña.
+    """
+    sal = sal_export()
+    resultado = db.execute(consulta_respuestas(survey_id, filtros).execution_options(yield_per=EXPORT_LOTE))
+    for lote in resultado.partitions():
+        yield [
+            {
+                "vote_id": fila[0],
+                "creado_en": fila[1].isoformat() if fila[1] else None,
+                "respondente": _respondente(sal, survey_id, fila[2]),
+                "question_id": fila[3],
+                "question": fila[4],
+                "option_id": fila[5],
+                "option": fila[6],
+                **dict(zip(CAMPOS_SEGMENTACION, fila[7:])),
+            }
+            for fila in lote
+        ]
+
+
+def ndjson(lotes):
+    """Un objeto JSON por línea; un chunk por lote."""
+    for lote in lotes:
+        yield "".join(json.dumps(fila, ensure_ascii=False) + "\n" for fila in lote)
+
+
+def csv_texto(lotes):
+    """Cabecera y luego un chunk CSV por lote."""
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS)
+    escritor.writeheader()
+    for lote in lotes:
+        escritor.writerows(lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,68 @@
+# votapp_app/utils/feed.py
+
+from datetime import datetime
+
+from sqlalchemy import and_, exists, func, or_
+from sqlalchemy.orm import Session, selectinload
+
+from votapp_app import models
+from votapp_app.models import CAMPOS_SEGMENTACION, SurveyTarget
+from votapp_app.utils.segmentacion import normalizar_valor
+
+
+# -------------------
+# Segmentación en SQL
+# -------------------
+def filtro_segmentacion(usuario: models.Usuario):
+    """
+    Traduce cumple_segmentacion a una condición SQL sobre survey_targets.
+    Una encuesta sin filas para un campo acepta a todos; si tiene filas,
+    el valor del usuario debe estar entre ellas (sin distinguir mayúsculas,
+    igual que MatcherSegmentacion). Cada EXISTS es una búsqueda por índice.
+    """
+    condiciones = []
+    for campo in CAMPOS_SEGMENTACION:
+        filtra_campo = exists().where(
+            SurveyTarget.survey_id == models.Survey.id,
+            SurveyTarget.field == campo,
+        )
+        valor = normalizar_valor(getattr(usuario, campo, None))
+        if not valor:
+            condiciones.append(~filtra_campo)
+            continue
+
+        acepta_valor = exists().where(
+            SurveyTarget.survey_id == models.Survey.id,
+            SurveyTarget.field == campo,
+            func.lower(SurveyTarget.value) == valor,
+        )
+        condiciones.append(or_(~filtra_campo, acepta_valor))
+    return and_(*condiciones)
+
+
+# -------------------
+# Feed personalizado
+# -------------------
+def query_disponibles(db: Session, usuario: models.Usuario, ahora: datetime):
+    """
+    Encuestas activas que el usuario puede votar, sin orden ni límite
+    (los pone utils.paginacion.paginar). Segmentación y "ya votó" (anti-join sobre votes) se
+    resuelven en la misma consulta; preguntas y opciones llegan en una segunda.
+    """
+    ya_voto = exists().where(
+        models.Vote.survey_id == models.Survey.id,
+        models.Vote.usuario_id == usuario.id,
+    )
+
+    return (
+        db.query(models.Survey)
+        .filter(
+            (models.Survey.fecha_expiracion == None) | (models.Survey.fecha_expiracion >= ahora),
+            models.Survey.active == True,
+            models.Survey.closed_reason == None,
+            filtro_segmentacion(usuario),
+            ~ya_voto,
+        )
+        .options(selectinload(models.Survey.questions).joinedload(models.Question.options))
+    )
+
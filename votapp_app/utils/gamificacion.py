@@ -0,0 +1,160 @@
+# votapp_app/utils/gamificacion.py
+
+import logging
+import os
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from votapp_app import models
+from votapp_app.routers.logros import verificar_logros_lote
+
+logger = logging.getLogger("gamificacion")
+
+# 👇 atraso del evento pendiente más viejo a partir del cual el outbox está trabado
+# (el job corre cada 10 s: minutos sin vaciarse = no hay quien lo procese)
+GAMIFICACION_ATRASO_MAX_SEGUNDOS = int(os.getenv("GAMIFICACION_ATRASO_MAX_SEGUNDOS", "300"))
+
+
+# -------------------
+# Reglas de perfil (puras)
+# -------------------
+def aplicar_evento(perfil, puntos: int, fecha: date) -> None:
+    """
+    Aplica una participación a racha, puntos y nivel. Modifica `perfil`
+    (PerfilPublico o cualquier objeto con los mismos atributos).
+    Un evento con fecha anterior a la última participación solo suma
+    puntos: el orden de proceso entre workers no rompe la racha.
+    """
+    ultima = perfil.ultima_participacion
+    if ultima is None or fecha > ultima:
+        if ultima == fecha - timedelta(days=1):
+            perfil.racha_dias = (perfil.racha_dias or 0) + 1
+        else:
+            perfil.racha_dias = 1
+        perfil.ultima_participacion = fecha
+
+    perfil.puntos = (perfil.puntos or 0) + (puntos or 0)
+    perfil.nivel = 1 + (perfil.puntos // 100)
+
+
+def proyectar_perfil(perfil, eventos) -> SimpleNamespace:
+    """
+    Perfil tal como quedará cuando el worker procese `eventos`
+    (lista de (puntos, fecha) en orden). No toca el perfil real.
+    """
+    proyeccion = SimpleNamespace(
+        puntos=perfil.puntos or 0,
+        racha_dias=perfil.racha_dias or 0,
+        nivel=perfil.nivel or 1,
+        ultima_participacion=perfil.ultima_participacion,
+    )
+    for puntos, fecha in eventos:
+        aplicar_evento(proyeccion, puntos, fecha)
+    return proyeccion
+
+
+# -------------------
+# Outbox
+# -------------------
+def encolar_voto(db: Session, usuario_id: int, survey: models.Survey):
+    """
+    Encola la gamificación del voto en la misma transacción y devuelve el
+    perfil proyectado (perfil actual + eventos pendientes + este), o None
+    si el usuario no tiene perfil público. Dos consultas, sin bloqueos.
+    """
+    evento = models.EventoGamificacion(
+        usuario_id=usuario_id,
+        survey_id=survey.id,
+        tipo="voto",
+        puntos=survey.recompensa_puntos or 0,
+        fecha=datetime.utcnow().date(),
+    )
+
+    perfil = db.query(models.PerfilPublico).filter_by(usuario_id=usuario_id).first()
+    proyeccion = None
+    if perfil:
+        pendientes = (
+            db.query(models.EventoGamificacion.puntos, models.EventoGamificacion.fecha)
+            .filter(
+                models.EventoGamificacion.usuario_id == usuario_id,
+                models.EventoGamificacion.procesado_en.is_(None),
+            )
+            .order_by(models.EventoGamificacion.id)
+            .all()
+        )
+        proyeccion = proyectar_perfil(perfil, [*pendientes, (evento.puntos, evento.fecha)])
+
+    db.add(evento)
+    return proyeccion
+
+
+def procesar_lote(db: Session, lote: int = 500) -> int:
+    """
+    Procesa hasta `lote` eventos pendientes en una transacción:
+
+      1. toma los eventos con FOR UPDATE SKIP LOCKED (varios workers
+         pueden correr a la vez sin pisarse),
+      2. bloquea y actualiza los perfiles involucrados en una consulta,
+      3. evalúa logros de todos esos usuarios con verificar_logros_lote.
+
+    Devuelve cuántos eventos procesó. El commit es del llamador.
+    """
+    eventos = (
+        db.query(models.EventoGamificacion)
+        .filter(models.EventoGamificacion.procesado_en.is_(None))
+        .order_by(models.EventoGamificacion.id)
+        .with_for_update(skip_locked=True)
+        .limit(lote)
+        .all()
+    )
+    if not eventos:
+        return 0
+
+    usuario_ids = {e.usuario_id for e in eventos}
+    perfiles = {
+        p.usuario_id: p
+        for p in db.query(models.PerfilPublico)
+        .filter(models.PerfilPublico.usuario_id.in_(usuario_ids))
+        .order_by(models.PerfilPublico.usuario_id)   # orden fijo de bloqueo
+        .with_for_update()
+        .all()
+    }
+
+    ahora = datetime.utcnow()
+    for evento in eventos:
+        perfil = perfiles.get(evento.usuario_id)
+        if perfil is not None:
+            aplicar_evento(perfil, evento.puntos, evento.fecha)
+        evento.procesado_en = ahora
+
+    nuevos_logros = verificar_logros_lote(db, perfiles)
+    logger.info(f"🎮 Gamificación: {len(eventos)} eventos, {len(perfiles)} perfiles, {nuevos_logros} logros nuevos")
+    return len(eventos)
+
+
+def metricas_outbox(db: Session) -> dict:
+    """
+    Eventos pendientes y atraso del más viejo (índice parcial de
+    pendientes). `alerta` si el atraso pasa GAMIFICACION_ATRASO_MAX_SEGUNDOS:
+    perfiles, rachas y logros no se están actualizando.
+    """
+    pendientes, mas_viejo = db.query(
+        func.count(models.EventoGamificacion.id), func.min(models.EventoGamificacion.creado_en)
+    ).filter(models.EventoGamificacion.procesado_en.is_(None)).one()
+
+    atraso = (datetime.utcnow() - mas_viejo).total_seconds() if mas_viejo else 0
+    alerta = atraso > GAMIFICACION_ATRASO_MAX_SEGUNDOS
+    if alerta:
+        logger.error(
+            f"🚨 Outbox de gamificación atrasado: {pendientes} eventos pendientes, el más viejo de hace "
+            f"{int(atraso)} s. ¿Corre el runner de jobs (o SCHEDULER_EN_WEB)?"
+        )
+    return {
+        "pendientes": pendientes,
+        "mas_viejo": mas_viejo.isoformat() if mas_viejo else None,
+        "atraso_segundos": round(atraso, 1),
+        "alerta": alerta,
+    }
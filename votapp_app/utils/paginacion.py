@@ -0,0 +1,162 @@
+# votapp_app/utils/paginacion.py
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+LIMITE_DEFECTO = int(os.getenv("PAGINACION_LIMITE", "50"))   # con cursor y sin limit
+LIMITE_MAX = int(os.getenv("PAGINACION_LIMITE_MAX", "200"))
+CONTEO_EXACTO_HASTA = 1000   # por debajo de esto la estimación se reemplaza por COUNT(*)
+
+CABECERA_CURSOR = "X-Next-Cursor"
+CABECERA_TOTAL = "X-Total-Count"
+
+
+# -------------------
+# Cursores opacos
+# -------------------
+def codificar_cursor(valores) -> str:
+    """Valores de la clave del último elemento → cadena base64 urlsafe."""
+    crudo = [
+        {"dt": v.isoformat()} if isinstance(v, datetime) else v
+        for v in valores
+    ]
+    texto = json.dumps(crudo, separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, columnas: int) -> list:
+    """Inverso de codificar_cursor; 400 si el cursor no es válido para esta clave."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        crudo = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        valores = [
+            datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v
+            for v in crudo
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    if len(valores) != columnas or not all(isinstance(v, (int, str, datetime)) for v in valores):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return valores
+
+
+# -------------------
+# Parámetros comunes
+# -------------------
+class ParametrosPagina:
+    """
+    Dependencia de FastAPI con los parámetros de paginación:
+    ?limit=50&cursor=...&con_total=true
+
+    Sin limit ni cursor se devuelve la lista completa, como antes de paginar:
+    las versiones publicadas de la app no leen X-Next-Cursor.
+    """
+    __slots__ = ("limit", "cursor", "con_total")
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAX),
+        cursor: Optional[str] = Query(None),   # 👈 valor de X-Next-Cursor de la página anterior
+        con_total: bool = Query(False),        # 👈 estimación del total en X-Total-Count
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.con_total = con_total
+
+
+class Pagina:
+    __slots__ = ("items", "siguiente", "total")
+
+    def __init__(self, items: list, siguiente: Optional[str], total: Optional[int] = None):
+        self.items = items
+        self.siguiente = siguiente
+        self.total = total
+
+    def cabeceras(self, response: Response) -> None:
+        """El cuerpo sigue siendo la lista; cursor y total van en cabeceras."""
+        if self.siguiente:
+            response.headers[CABECERA_CURSOR] = self.siguiente
+        if self.total is not None:
+            response.headers[CABECERA_TOTAL] = str(self.total)
+
+
+# -------------------
+# Keyset
+# -------------------
+def _despues_de(columnas, valores, desc: bool):
+    """
+    (c1, c2, ...) estrictamente después de (v1, v2, ...) en el orden dado,
+    expandido a OR/AND para que el planner use el índice en cualquier motor.
+    """
+    condiciones = []
+    for i, (columna, valor) in enumerate(zip(columnas, valores)):
+        iguales = [c == v for c, v in zip(columnas[:i], valores[:i])]
+        siguiente = columna < valor if desc else columna > valor
+        condiciones.append(and_(*iguales, siguiente))
+    return or_(*condiciones)
+
+
+def paginar(query, columnas, params: ParametrosPagina, desc: bool = True) -> Pagina:
+    """
+    Pagina una Query del ORM por keyset sobre `columnas` (la última debe ser
+    única, normalmente el id; todas NOT NULL). Pide limit + 1 filas para
+    saber si hay otra página sin contar. La query no debe traer order_by.
+    Sin limit ni cursor devuelve todas las filas en ese orden.
+    """
+    columnas = list(columnas)
+    base = query
+    if params.cursor:
+        valores = decodificar_cursor(params.cursor, len(columnas))
+        query = query.filter(_despues_de(columnas, valores, desc))
+
+    orden = [c.desc() if desc else c.asc() for c in columnas]
+    query = query.order_by(*orden)
+    limite = params.limit or (LIMITE_DEFECTO if params.cursor else None)
+    if limite is None:
+        filas = query.all()
+        return Pagina(filas, None, len(filas) if params.con_total else None)
+    filas = query.limit(limite + 1).all()
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor([getattr(ultima, c.key) for c in columnas])
+
+    total = estimar_total(base) if params.con_total else None
+    return Pagina(filas, siguiente, total)
+
+
+def estimar_total(query) -> int:
+    """
+    Total aproximado de la query sin paginar. En Postgres sale de las filas
+    estimadas por el planner (EXPLAIN, sin recorrer la tabla); si la
+    estimación es pequeña, o en otros motores, se cuenta exacto.
+    """
+    sesion = query.session
+    conexion = sesion.connection()
+    if conexion.dialect.name != "postgresql":
+        return query.order_by(None).count()
+
+    compilado = query.order_by(None).statement.compile(
+        dialect=conexion.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    parametros = (
+        tuple(compilado.params[k] for k in compilado.positiontup)
+        if compilado.positional else compilado.params
+    )
+    plan = conexion.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilado}", parametros).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimado = int(plan[0]["Plan"]["Plan Rows"])
+
+    if estimado < CONTEO_EXACTO_HASTA:
+        return query.order_by(None).count()
+    return estimado
@@ -0,0 +1,149 @@
+# votapp_app/utils/resultados.py
+
+from collections import Counter, defaultdict
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from votapp_app import database, models
+from votapp_app.cache import cache_resultados
+
+
+# -------------------
+# Conteo agregado de votos
+# -------------------
+class ConteoVotos:
+    """Votos por opción y por pregunta para un conjunto de encuestas."""
+
+    def __init__(self, por_opcion: dict, por_pregunta: dict):
+        self.por_opcion = por_opcion
+        self.por_pregunta = por_pregunta
+
+    def opcion(self, option_id: int) -> int:
+        return self.por_opcion.get(option_id, 0)
+
+    def pregunta(self, question_id: int) -> int:
+        return self.por_pregunta.get(question_id, 0)
+
+
+def contar_votos(db: Session, survey_ids) -> ConteoVotos:
+    """
+    Todos los conteos de una o varias encuestas en una sola lectura de
+    vote_tallies: O(opciones), sin importar cuántos votos haya.
+    """
+    survey_ids = list(survey_ids)
+    por_opcion = {}
+    por_pregunta = defaultdict(int)
+    if not survey_ids:
+        return ConteoVotos(por_opcion, por_pregunta)
+
+    rows = (
+        db.query(models.VoteTally.question_id, models.VoteTally.option_id, models.VoteTally.count)
+        .filter(models.VoteTally.survey_id.in_(survey_ids))
+        .all()
+    )
+    for question_id, option_id, votos in rows:
+        por_opcion[option_id] = votos
+        por_pregunta[question_id] += votos
+    return ConteoVotos(por_opcion, dict(por_pregunta))
+
+
+def consulta_conteo_votes(survey_ids=None):
+    """
+    SELECT survey_id, question_id, option_id, count(*) sobre `votes`
+    (la fuente de verdad). Lo usan la reconciliación y la migración.
+    """
+    query = (
+        select(
+            models.Vote.survey_id,
+            models.Vote.question_id,
+            models.Vote.option_id,
+            func.count(models.Vote.id),
+        )
+        .group_by(models.Vote.survey_id, models.Vote.question_id, models.Vote.option_id)
+    )
+    if survey_ids is not None:
+        query = query.where(models.Vote.survey_id.in_(list(survey_ids)))
+    return query
+
+
+# -------------------
+# Mantenimiento en escritura
+# -------------------
+def insert_dialecto(db: Session):
+    """INSERT con ON CONFLICT del dialecto activo (Postgres en producción)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
+
+def sumar_votos(db: Session, votos) -> None:
+    """
+    Suma los votos nuevos a vote_tallies con un único
+    INSERT ... ON CONFLICT (option_id) DO UPDATE SET count = count + n.
+    La fila queda bloqueada hasta el commit del voto, así que dos votos
+    simultáneos a la misma opción nunca pierden un incremento.
+    """
+    por_opcion = Counter((v.survey_id, v.question_id, v.option_id) for v in votos)
+    if not por_opcion:
+        return
+
+    insert = insert_dialecto(db)
+    stmt = insert(models.VoteTally).values([
+        {"survey_id": survey_id, "question_id": question_id, "option_id": option_id, "count": n}
+        # 👇 orden fijo por opción: dos votos concurrentes bloquean las filas
+        # en el mismo orden y no se produce deadlock
+        for (survey_id, question_id, option_id), n in sorted(por_opcion.items(), key=lambda kv: kv[0][2])
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.VoteTally.option_id],
+        set_={"count": models.VoteTally.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def resultados_pregunta(question: models.Question, conteo: ConteoVotos):
+    """
+    Devuelve (total_votes, [(option, votos, porcentaje)]) de una pregunta
+    usando un ConteoVotos ya calculado. No consulta la base.
+    """
+    total_votes = conteo.pregunta(question.id)
+    opciones = []
+    for option in question.options:
+        votos = conteo.opcion(option.id)
+        porcentaje = (votos / total_votes * 100) if total_votes > 0 else 0
+        opciones.append((option, votos, round(porcentaje, 1)))
+    return total_votes, opciones
+
+
+# -------------------
+# Cache de resultados según el origen de la lectura
+# -------------------
+async def resultados_con_cache(db, vista: str, survey_id: int, filtros, calcular, *args):
+    """
+    `await db.run_sync(calcular, survey_id, *args)` pasando por
+    cache_resultados sin romper read-your-writes:
+
+      - primaria porque el usuario acaba de escribir → ni se lee ni se
+        guarda: tiene que ver su voto, y lo que haya bajo la versión nueva
+        pudo calcularse en una réplica atrasada,
+      - primaria (no hay réplica) → se lee y se guarda,
+      - réplica → se lee; se guarda solo si la última invalidación de la
+        encuesta es más vieja que la ventana de retraso de la réplica.
+    """
+    origen = database.origen_lectura(db)
+    if origen == "escritura":
+        return await db.run_sync(calcular, survey_id, *args)
+
+    clave = cache_resultados.clave(vista, survey_id, filtros)
+    resultado = cache_resultados.obtener(clave)
+    if resultado is not None:
+        return resultado
+
+    # 👇 se decide antes de consultar, igual que la versión de la clave
+    guardar = origen == "primaria" or cache_resultados.estable(survey_id, database.enrutador_lectura.ventana)
+    resultado = await db.run_sync(calcular, survey_id, *args)
+    if guardar:
+        cache_resultados.guardar(clave, resultado)
+    return resultado
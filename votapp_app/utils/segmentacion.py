@@ -1,29 +1,107 @@
-import json, logging
+import logging
+import threading
+from collections import OrderedDict
+
+from votapp_app.models import CAMPOS_SEGMENTACION
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("segmentacion")
 
+
+def normalizar_valor(valor) -> str:
+    """Forma canónica para comparar segmentos (sin espacios, minúsculas)."""
+    return str(valor).strip().lower() if valor is not None else ""
+
+
+# -------------------
+# Matcher compilado
+# -------------------
+class MatcherSegmentacion:
+    """
+    Segmentación de una encuesta compilada una sola vez: solo los campos
+    con filtro, cada uno como frozenset de valores normalizados.
+    """
+    __slots__ = ("survey_id", "version", "filtros")
+
+    def __init__(self, survey_id, version, segmentacion: dict):
+        self.survey_id = survey_id
+        self.version = version
+        self.filtros = tuple(
+            (campo, frozenset(normalizar_valor(v) for v in valores))
+            for campo, valores in segmentacion.items()
+            if valores
+        )
+
+    @property
+    def sin_filtros(self) -> bool:
+        return not self.filtros
+
+    def cumple_perfil(self, perfil: dict) -> bool:
+        """`perfil` es el resultado de perfil_usuario()."""
+        for campo, permitidos in self.filtros:
+            if perfil.get(campo) not in permitidos:
+                return False
+        return True
+
+    def cumple(self, usuario) -> bool:
+        return self.cumple_perfil(perfil_usuario(usuario))
+
+    def match_many(self, usuarios) -> list:
+        """Usuarios (de una lista) a los que apunta esta encuesta."""
+        if not self.filtros:
+            return list(usuarios)
+        return [u for u in usuarios if self.cumple_perfil(perfil_usuario(u))]
+
+
+def perfil_usuario(usuario) -> dict:
+    """Valores demográficos del usuario ya normalizados, calculados una vez."""
+    return {campo: normalizar_valor(getattr(usuario, campo, None)) for campo in CAMPOS_SEGMENTACION}
+
+
+# -------------------
+# Cache LRU por (survey_id, versión)
+# -------------------
+_CACHE_MAX = 4096
+_cache: "OrderedDict[tuple, MatcherSegmentacion]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def compilar_matcher(survey) -> MatcherSegmentacion:
+    """
+    Devuelve el matcher de la encuesta. La clave incluye
+    segmentacion_version, que asignar_segmentacion incrementa, así que
+    una edición invalida la entrada sin tocar el cache.
+    """
+    clave = (survey.id, survey.segmentacion_version or 0)
+    with _lock:
+        matcher = _cache.get(clave)
+        if matcher is not None:
+            _cache.move_to_end(clave)
+            return matcher
+
+    matcher = MatcherSegmentacion(survey.id, clave[1], survey.segmentacion)
+    if survey.id is None:
+        # Encuesta aún sin id (no persistida): no se cachea
+        return matcher
+
+    with _lock:
+        _cache[clave] = matcher
+        _cache.move_to_end(clave)
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return matcher
+
+
+def match_many(surveys, usuario) -> list:
+    """Encuestas (de una lista) que apuntan al usuario."""
+    perfil = perfil_usuario(usuario)
+    return [s for s in surveys if compilar_matcher(s).cumple_perfil(perfil)]
+
+
 def cumple_segmentacion(survey, usuario) -> bool:
-    campos = {
-        "sexo": survey.sexo,
-        "ciudad": survey.ciudad,
-        "ocupacion": survey.ocupacion,
-        "profesion": survey.profesion,
-        "nivel_educativo": survey.nivel_educativo,
-        "religion": survey.religion,
-        "nacionalidad": survey.nacionalidad,
-        "estado_civil": survey.estado_civil,
-    }
-    for campo, valores in campos.items():
-        lista = json.loads(valores) if valores else []
-        valor_usuario = getattr(usuario, campo, "")
-
-        # 👇 Log detallado
-        logger.debug(f"[SEGMENTACION] campo={campo}, lista={lista}, usuario={valor_usuario}")
-
-        if lista and valor_usuario not in lista:
-            logger.info(f"[SEGMENTACION] ❌ Usuario NO cumple {campo}")
-            return False
-
-    logger.info("[SEGMENTACION] ✅ Usuario cumple todos los filtros")
-    return True
+    resultado = compilar_matcher(survey).cumple(usuario)
+
+    # 👇 Log detallado solo si DEBUG está activo (ruta caliente)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[SEGMENTACION] survey={survey.id} usuario={getattr(usuario, 'id', None)} cumple={resultado}")
+
+    return resultado
@@ -0,0 +1,369 @@
+# votapp_app/utils/snapshots.py
+
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DateTime, Integer, func, select
+from sqlalchemy.orm import Session
+
+from votapp_app import models
+from votapp_app.models import CAMPOS_SEGMENTACION
+from votapp_app.utils.resultados import contar_votos
+
+try:
+    import pyarrow as pa   # opcional: solo si SNAPSHOT_DIR está configurado
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+logger = logging.getLogger("snapshots")
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
+SNAPSHOT_MARGEN_SEGUNDOS = int(os.getenv("SNAPSHOT_MARGEN_SEGUNDOS", "300"))
+SNAPSHOT_LOTE = int(os.getenv("SNAPSHOT_LOTE", "50000"))
+SNAPSHOT_MAX_ARCHIVOS = int(os.getenv("SNAPSHOT_MAX_ARCHIVOS", "8"))   # por partición, antes de compactar
+# 👇 dashboard de encuestas cerradas desde los Parquet en vez de Postgres
+SNAPSHOT_RESULTADOS = os.getenv("SNAPSHOT_RESULTADOS", "0") == "1"
+CANDADO_VENCE_SEGUNDOS = 3600
+
+
+# -------------------
+# Tablas exportadas
+# -------------------
+class TablaIncremental:
+    """
+    Tabla de solo inserción exportada por marca de agua sobre el id.
+    `marca_tiempo` fija el tope de cada corrida: solo filas más viejas que
+    SNAPSHOT_MARGEN_SEGUNDOS, para no saltarse ids de transacciones que
+    todavía no confirmaron (o que la réplica aún no recibió).
+    """
+    __slots__ = ("nombre", "modelo", "columnas", "marca_tiempo")
+
+    def __init__(self, nombre, modelo, columnas, marca_tiempo):
+        self.nombre = nombre
+        self.modelo = modelo
+        self.columnas = columnas
+        self.marca_tiempo = marca_tiempo
+
+    def esquema(self):
+        return pa.schema([(c, _tipo_arrow(getattr(self.modelo, c))) for c in self.columnas])
+
+
+TABLAS = (
+    TablaIncremental(
+        "votes", models.Vote,
+        ("id", "survey_id", "question_id", "option_id", "usuario_id", "creado_en"),
+        models.Vote.creado_en,
+    ),
+    TablaIncremental(
+        "participaciones", models.Participacion,
+        ("id", "survey_id", "usuario_id", "fecha_participacion", "creado_en"),
+        models.Participacion.creado_en,
+    ),
+    TablaIncremental(
+        "sponsor_transactions", models.SponsorTransaction,
+        ("id", "survey_id", "sponsor_id", "beneficiario_id", "monto_dinero", "puntos", "timestamp"),
+        models.SponsorTransaction.timestamp,
+    ),
+)
+
+
+def _tipo_arrow(columna):
+    tipo = columna.type
+    if isinstance(tipo, Integer):
+        return pa.int64()
+    if isinstance(tipo, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+# -------------------
+# Escritura
+# -------------------
+class Candado:
+    """Archivo de exclusión entre procesos (un snapshot a la vez por directorio)."""
+
+    def __init__(self, directorio: str):
+        self.ruta = os.path.join(directorio, "_candado")
+        self.tomado = False
+
+    def __enter__(self):
+        try:
+            os.close(os.open(self.ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # 👇 un proceso que murió a mitad de snapshot no bloquea para siempre
+            if time.time() - os.path.getmtime(self.ruta) < CANDADO_VENCE_SEGUNDOS:
+                return None
+            os.utime(self.ruta)
+        self.tomado = True
+        return self
+
+    def __exit__(self, *exc):
+        if self.tomado and os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+
+def _leer_marcas(directorio: str) -> dict:
+    ruta = os.path.join(directorio, "_marcas.json")
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_marcas(directorio: str, marcas: dict) -> None:
+    ruta = os.path.join(directorio, "_marcas.json")
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(marcas, f)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def _lotes(db: Session, columnas, condicion, esquema):
+    """RecordBatches desde un cursor del lado del servidor (yield_per)."""
+    stmt = select(*columnas).where(*condicion).execution_options(yield_per=SNAPSHOT_LOTE)
+    for filas in db.execute(stmt).partitions():
+        valores = list(zip(*filas))
+        yield pa.record_batch(
+            [pa.array(v, type=campo.type) for v, campo in zip(valores, esquema)],
+            schema=esquema,
+        )
+
+
+def exportar_tabla(
+    db: Session, tabla: TablaIncremental, directorio: str, desde: int, corte: Optional[datetime] = None
+) -> int:
+    """
+    Exporta las filas con id en (desde, tope] a <directorio>/<tabla>/survey_id=<n>/,
+    un archivo por partición y corrida. Devuelve la marca nueva (el tope).
+    Los archivos se llaman desde-<desde>-*.parquet: si una corrida se corta
+    antes de guardar la marca, la siguiente los borra y reescribe.
+    """
+    corte = corte or datetime.utcnow() - timedelta(seconds=SNAPSHOT_MARGEN_SEGUNDOS)
+    tope = db.execute(
+        select(func.max(tabla.modelo.id)).where(tabla.marca_tiempo < corte)
+    ).scalar() or desde
+    if tope <= desde:
+        return desde
+
+    base = os.path.join(directorio, tabla.nombre)
+    for viejo in glob.glob(os.path.join(base, "*", f"desde-{desde}-*.parquet")):
+        os.remove(viejo)
+
+    esquema = tabla.esquema()
+    columnas = [getattr(tabla.modelo, c) for c in tabla.columnas]
+    lotes = _lotes(db, columnas, [tabla.modelo.id > desde, tabla.modelo.id <= tope], esquema)
+    ds.write_dataset(
+        pa.RecordBatchReader.from_batches(esquema, lotes),
+        base,
+        format="parquet",
+        partitioning=["survey_id"],
+        partitioning_flavor="hive",
+        basename_template=f"desde-{desde}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return tope
+
+
+# -------------------
+# Compactación
+# -------------------
+def _recuperar_compactacion(directorio: str) -> None:
+    """
+    Termina o deshace una compactación cortada. El cambio de una partición
+    son dos rename (vieja → _compactacion/<p>.viejo, nueva → su lugar):
+    si la partición falta, la nueva ya estaba completa y se pone en su lugar.
+    """
+    trabajo = os.path.join(directorio, "_compactacion")
+    for tabla in TABLAS:
+        for pendiente in glob.glob(os.path.join(trabajo, tabla.nombre, "*.viejo")):
+            particion = os.path.join(directorio, tabla.nombre, os.path.basename(pendiente)[:-len(".viejo")])
+            nueva = pendiente[:-len(".viejo")] + ".nueva"
+            if not os.path.exists(particion):
+                os.rename(nueva if os.path.exists(nueva) else pendiente, particion)
+    shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def compactar_tabla(directorio: str, tabla: TablaIncremental, tope: int) -> int:
+    """
+    Cada corrida deja un archivo por partición: las particiones con más de
+    SNAPSHOT_MAX_ARCHIVOS se reescriben en un único compacto-<tope>.parquet.
+    La nueva se arma fuera del dataset y se cambia con rename (ver
+    _recuperar_compactacion). Devuelve cuántas particiones compactó.
+    """
+    base = os.path.join(directorio, tabla.nombre)
+    trabajo = os.path.join(directorio, "_compactacion", tabla.nombre)
+    compactadas = 0
+    for particion in glob.glob(os.path.join(base, "survey_id=*")):
+        archivos = sorted(glob.glob(os.path.join(particion, "*.parquet")))
+        if len(archivos) <= SNAPSHOT_MAX_ARCHIVOS:
+            continue
+
+        nombre = os.path.basename(particion)
+        nueva = os.path.join(trabajo, nombre + ".nueva")
+        os.makedirs(nueva, exist_ok=True)
+        with pq.ParquetWriter(os.path.join(nueva, f"compacto-{tope}.parquet"), pq.read_schema(archivos[0])) as escritor:
+            for archivo in archivos:
+                escritor.write_table(pq.read_table(archivo))
+
+        viejo = os.path.join(trabajo, nombre + ".viejo")
+        os.rename(particion, viejo)
+        os.rename(nueva, particion)
+        shutil.rmtree(viejo)
+        compactadas += 1
+    return compactadas
+
+
+def exportar_usuarios(db: Session, directorio: str) -> None:
+    """
+    Proyección demográfica de usuarios (id + campos de segmentación). Los
+    usuarios cambian sus datos y no hay marca de actualización: se reescribe
+    entera, en lotes, y se reemplaza de forma atómica.
+    """
+    esquema = pa.schema([("id", pa.int64()), *[(c, pa.string()) for c in CAMPOS_SEGMENTACION]])
+    columnas = [models.Usuario.id, *[getattr(models.Usuario, c) for c in CAMPOS_SEGMENTACION]]
+    os.makedirs(os.path.join(directorio, "usuarios"), exist_ok=True)
+    ruta = os.path.join(directorio, "usuarios", "usuarios.parquet")
+
+    with pq.ParquetWriter(ruta + ".tmp", esquema) as escritor:
+        for lote in _lotes(db, columnas, [], esquema):
+            escritor.write_batch(lote)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def exportar_snapshots(db: Session, directorio: Optional[str] = None) -> dict:
+    """
+    Una corrida incremental: cada tabla desde su marca de agua y la
+    proyección de usuarios completa. Devuelve {tabla: marca nueva}, o {}
+    si otro proceso ya está exportando al mismo directorio.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow no está instalado")
+    directorio = directorio or SNAPSHOT_DIR
+    os.makedirs(directorio, exist_ok=True)
+
+    with Candado(directorio) as candado:
+        if candado is None:
+            logger.info("📦 Snapshot en curso en otro proceso; se omite esta corrida")
+            return {}
+
+        _recuperar_compactacion(directorio)
+        marcas = _leer_marcas(directorio)
+        corte = datetime.utcnow() - timedelta(seconds=SNAPSHOT_MARGEN_SEGUNDOS)
+        for tabla in TABLAS:
+            anterior = marcas.get(tabla.nombre, 0)
+            marcas[tabla.nombre] = exportar_tabla(db, tabla, directorio, anterior, corte)
+            # 👇 marca guardada por tabla: un fallo no repite las ya exportadas
+            _guardar_marcas(directorio, marcas)
+            compactadas = compactar_tabla(directorio, tabla, marcas[tabla.nombre])
+            logger.info(f"📦 {tabla.nombre}: ids {anterior + 1}..{marcas[tabla.nombre]}, {compactadas} particiones compactadas")
+
+        exportar_usuarios(db, directorio)
+        marcas["corte"] = corte.isoformat()   # 👈 todo lo anterior a esto está en los Parquet
+        marcas["actualizado_en"] = datetime.utcnow().isoformat()
+        _guardar_marcas(directorio, marcas)
+        return marcas
+
+
+# -------------------
+# Consultas sobre los snapshots
+# -------------------
+def _usuarios(directorio: str, filtros: Optional[dict]):
+    usuarios = pq.read_table(os.path.join(directorio, "usuarios", "usuarios.parquet"))
+    for campo, valores in (filtros or {}).items():
+        if valores:
+            usuarios = usuarios.filter(pc.is_in(usuarios[campo], value_set=pa.array(valores, pa.string())))
+    return usuarios.rename_columns(["usuario_id", *CAMPOS_SEGMENTACION])
+
+
+def _votos(directorio: str):
+    return ds.dataset(os.path.join(directorio, "votes"), format="parquet", partitioning="hive")
+
+
+def analizar_votos_snapshot(
+    survey_id: int,
+    filtros: Optional[dict] = None,
+    crosstab: Optional[str] = None,
+    directorio: Optional[str] = None,
+) -> dict:
+    """
+    Igual que utils.analitica.analizar_votos, pero sobre los Parquet: solo
+    se lee la partición survey_id=<n> y los agrupamientos son vectorizados
+    (Arrow), sin tocar Postgres. Los datos llegan hasta la última corrida
+    de exportar_snapshots (ver _marcas.json).
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow no está instalado")
+    if crosstab is not None and crosstab not in CAMPOS_SEGMENTACION:
+        raise ValueError(f"Dimensión de crosstab inválida: {crosstab}")
+    directorio = directorio or SNAPSHOT_DIR
+
+    votos = _votos(directorio).to_table(
+        columns=["id", "option_id", "usuario_id", "creado_en"],
+        filter=ds.field("survey_id") == survey_id,
+    )
+    votos = votos.join(_usuarios(directorio, filtros), keys="usuario_id", join_type="inner")
+    votos = votos.append_column("fecha", pc.cast(votos["creado_en"], pa.date32()))
+
+    resultado = {
+        "total_votes": votos.num_rows,
+        "total_participants": pc.count_distinct(votos["usuario_id"]).as_py(),
+        "por_opcion": {},
+        "votos_por_fecha": {},
+        "participantes_por_fecha": {},
+        "segmentos": {campo: [] for campo in CAMPOS_SEGMENTACION},
+        "crosstab": [],
+    }
+
+    for fila in votos.group_by("option_id").aggregate([("id", "count")]).to_pylist():
+        resultado["por_opcion"][fila["option_id"]] = fila["id_count"]
+
+    por_fecha = votos.group_by("fecha").aggregate([("id", "count"), ("usuario_id", "count_distinct")])
+    for fila in por_fecha.to_pylist():
+        if fila["fecha"] is not None:
+            resultado["votos_por_fecha"][str(fila["fecha"])] = fila["id_count"]
+            resultado["participantes_por_fecha"][str(fila["fecha"])] = fila["usuario_id_count_distinct"]
+
+    for campo in CAMPOS_SEGMENTACION:
+        for fila in votos.group_by(campo).aggregate([("id", "count")]).to_pylist():
+            if fila[campo]:
+                resultado["segmentos"][campo].append({"segment": fila[campo], "votes": fila["id_count"]})
+
+    if crosstab is not None:
+        for fila in votos.group_by(["option_id", crosstab]).aggregate([("id", "count")]).to_pylist():
+            if fila[crosstab]:
+                resultado["crosstab"].append((fila["option_id"], fila[crosstab], fila["id_count"]))
+
+    return resultado
+
+
+def analizar_votos_cerrada(db: Session, survey: models.Survey, filtros: dict, crosstab: Optional[str]) -> Optional[dict]:
+    """
+    Analítica de una encuesta cerrada desde los snapshots, o None si hay
+    que ir a la base: SNAPSHOT_RESULTADOS apagado, encuesta abierta o
+    pausada, cerrada después del corte de la última corrida, o con votos
+    que el snapshot no tiene (total de vote_tallies, una lectura por índice).
+    """
+    if not (SNAPSHOT_RESULTADOS and SNAPSHOT_DIR) or pa is None:
+        return None
+    if survey.active or survey.closed_reason in (None, "paused") or survey.closed_at is None:
+        return None
+    try:
+        corte = _leer_marcas(SNAPSHOT_DIR).get("corte")
+        if corte is None or survey.closed_at >= datetime.fromisoformat(corte):
+            return None
+        votos_base = sum(contar_votos(db, [survey.id]).por_pregunta.values())
+        if _votos(SNAPSHOT_DIR).count_rows(filter=ds.field("survey_id") == survey.id) != votos_base:
+            return None
+        return analizar_votos_snapshot(survey.id, filtros, crosstab, SNAPSHOT_DIR)
+    except Exception as e:
+        # 👇 el snapshot nunca tumba el dashboard: se calcula en Postgres
+        logger.warning(f"⚠️ Snapshot no utilizable para encuesta {survey.id}: {e}")
+        return None
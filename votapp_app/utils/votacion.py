@@ -0,0 +1,242 @@
+# votapp_app/utils/votacion.py
+
+import logging
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+
+from votapp_app import models
+from votapp_app.utils.gamificacion import encolar_voto
+from votapp_app.utils.resultados import insert_dialecto, sumar_votos
+
+
+# -------------------
+# Pipeline de voto (una sola transacción)
+# -------------------
+def validar_respuestas(db: Session, survey_id: int, answers) -> None:
+    """
+    Valida todas las respuestas con una sola consulta: cada opción debe
+    existir, pertenecer a la pregunta indicada y la pregunta a la encuesta.
+    """
+    if not answers:
+        raise HTTPException(status_code=400, detail="No se enviaron respuestas")
+
+    preguntas = [a.question_id for a in answers]
+    if len(set(preguntas)) != len(preguntas):
+        raise HTTPException(status_code=400, detail="Respuesta duplicada para una misma pregunta")
+
+    filas = db.execute(
+        select(models.Option.id, models.Option.question_id, models.Question.survey_id)
+        .join(models.Question, models.Question.id == models.Option.question_id)
+        .where(models.Option.id.in_([a.option_id for a in answers]))
+    ).all()
+    opciones = {option_id: (question_id, sid) for option_id, question_id, sid in filas}
+
+    for answer in answers:
+        if opciones.get(answer.option_id) != (answer.question_id, survey_id):
+            logging.error(f"❌ Opción inválida detectada: question_id={answer.question_id}, option_id={answer.option_id}")
+            raise HTTPException(status_code=400, detail="Opción inválida")
+
+
+def insertar_votos(db: Session, survey_id: int, usuario_id: int, answers) -> list:
+    """
+    Un único INSERT multi-fila con ON CONFLICT DO NOTHING sobre
+    unique_vote_per_question (usuario_id, question_id). Si vuelven menos
+    filas que respuestas, el usuario ya había votado alguna pregunta.
+    """
+    ahora = datetime.utcnow()
+    insert = insert_dialecto(db)
+    stmt = (
+        insert(models.Vote)
+        .values([
+            {
+                "survey_id": survey_id,
+                "question_id": a.question_id,
+                "option_id": a.option_id,
+                "usuario_id": usuario_id,
+                "creado_en": ahora,
+            }
+            for a in answers
+        ])
+        .on_conflict_do_nothing(index_elements=["usuario_id", "question_id"])
+        .returning(models.Vote.survey_id, models.Vote.question_id, models.Vote.option_id)
+    )
+    insertados = db.execute(stmt).all()
+
+    if len(insertados) < len(answers):
+        nuevas = {fila.question_id for fila in insertados}
+        repetida = next(a.question_id for a in answers if a.question_id not in nuevas)
+        logging.warning(f"❌ Ya existe voto previo en question_id={repetida}")
+        raise HTTPException(status_code=400, detail=f"Ya votaste en la pregunta {repetida}")
+    return insertados
+
+
+def registrar_participacion(db: Session, survey_id: int, usuario_id: int) -> bool:
+    """True si es la primera participación del usuario en la encuesta."""
+    existe = db.query(models.Participacion.id).filter(
+        models.Participacion.usuario_id == usuario_id,
+        models.Participacion.survey_id == survey_id
+    ).first()
+    if not existe:
+        ahora = datetime.utcnow()
+        db.add(models.Participacion(
+            usuario_id=usuario_id,
+            survey_id=survey_id,
+            fecha_participacion=ahora,
+            creado_en=ahora
+        ))
+        return True
+    return False
+
+
+def _asegurar_wallets(db: Session, usuario_ids) -> dict:
+    """usuario_id → wallet_id, creando las billeteras que falten (sin carreras)."""
+    insert = insert_dialecto(db)
+    db.execute(
+        insert(models.Wallet)
+        .values([{"usuario_id": uid, "balance": 0, "actualizado_en": datetime.utcnow()} for uid in usuario_ids])
+        .on_conflict_do_nothing(index_elements=["usuario_id"])
+    )
+    filas = db.execute(
+        select(models.Wallet.usuario_id, models.Wallet.id).where(models.Wallet.usuario_id.in_(list(usuario_ids)))
+    ).all()
+    return dict(filas)
+
+
+def _mover_saldo(db: Session, wallet_id: int, monto: int):
+    """UPDATE atómico balance = balance + monto; devuelve el balance nuevo."""
+    return db.execute(
+        models.Wallet.__table__.update()
+        .where(models.Wallet.id == wallet_id)
+        .values(balance=models.Wallet.balance + monto, actualizado_en=datetime.utcnow())
+        .returning(models.Wallet.balance)
+    ).scalar()
+
+
+def pagar_recompensa(db: Session, survey: models.Survey, usuario: models.Usuario):
+    """
+    Transacción de patrocinio: crédito al votante y débito al sponsor con
+    UPDATE atómicos (sin leer-modificar-escribir). Devuelve el balance
+    nuevo del votante.
+    """
+    sponsor = db.get(models.Usuario, survey.usuario_id)
+    if not sponsor or sponsor.rol != "sponsor":
+        raise HTTPException(status_code=400, detail="Sponsor inválido para encuesta patrocinada")
+
+    monto = survey.recompensa_dinero or 0
+    ahora = datetime.utcnow()
+    transaccion = models.SponsorTransaction(
+        survey_id=survey.id,
+        sponsor_id=sponsor.id,
+        beneficiario_id=usuario.id,
+        monto_dinero=monto,
+        puntos=survey.recompensa_puntos or 0,
+        timestamp=ahora
+    )
+    db.add(transaccion)
+
+    wallets = _asegurar_wallets(db, {usuario.id, sponsor.id})
+    balance_votante = _mover_saldo(db, wallets[usuario.id], monto)
+    _mover_saldo(db, wallets[sponsor.id], -monto)
+
+    db.add_all([
+        models.MovimientoWallet(
+            wallet_id=wallets[usuario.id], tipo="ingreso", monto=monto,
+            fecha=ahora, sponsor_transaction=transaccion
+        ),
+        models.MovimientoWallet(
+            wallet_id=wallets[sponsor.id], tipo="egreso", monto=monto,
+            fecha=ahora, sponsor_transaction=transaccion
+        ),
+    ])
+    return balance_votante
+
+
+def cobrar_presupuesto(db: Session, survey: models.Survey) -> int:
+    """
+    Cobra una recompensa al presupuesto con un único UPDATE condicional:
+
+        UPDATE surveys SET spent_budget = spent_budget + :r, ...
+        WHERE id = :id AND remaining_budget >= :r
+        RETURNING remaining_budget
+
+    Costo constante (sin COUNT de votos). Si el cobro deja la encuesta sin
+    fondos para otra recompensa, el mismo UPDATE la cierra ("funds").
+    Sin fila de vuelta = fondos insuficientes → 400 y rollback del voto.
+    """
+    recompensa = survey.recompensa_dinero or 0
+    umbral = max(recompensa, 1)   # igual que FONDOS_AGOTADOS_SQL
+    surveys = models.Survey.__table__
+    agota = (surveys.c.remaining_budget - recompensa) < umbral
+
+    restante = db.execute(
+        surveys.update()
+        .where(surveys.c.id == survey.id, surveys.c.remaining_budget >= recompensa)
+        .values(
+            spent_budget=surveys.c.spent_budget + recompensa,
+            active=case((agota, False), else_=surveys.c.active),
+            closed_reason=case((agota, "funds"), else_=surveys.c.closed_reason),
+            closed_at=case((agota, datetime.utcnow()), else_=surveys.c.closed_at),
+        )
+        .returning(surveys.c.remaining_budget)
+    ).scalar()
+
+    if restante is None:
+        raise HTTPException(status_code=400, detail="Presupuesto agotado para esta encuesta patrocinada")
+
+    # 👇 el UPDATE fue por Core: que el ORM relea la fila si se vuelve a usar
+    db.expire(survey, ["spent_budget", "remaining_budget", "fondos_agotados", "active", "closed_reason", "closed_at"])
+    if restante < umbral:
+        logging.warning(f"💰 Encuesta {survey.id} cerrada automáticamente por presupuesto agotado")
+    return restante
+
+
+def registrar_voto(db: Session, survey_id: int, usuario: models.Usuario, answers) -> dict:
+    """
+    Voto completo sin commits intermedios: validación, votos, conteos,
+    participación, recompensa, presupuesto y evento de gamificación. El llamador hace un
+    único commit (o rollback si algo falla).
+
+    Orden de bloqueos, siempre el mismo: vote_tallies → encuesta (UPDATE
+    del presupuesto, solo patrocinadas) → billeteras. El perfil ya no se
+    bloquea aquí: lo actualiza el worker de gamificación.
+    """
+    survey = db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Encuesta no encontrada")
+
+    if survey.patrocinada and survey.fondos_agotados:
+        raise HTTPException(status_code=400, detail="Presupuesto agotado para esta encuesta patrocinada")
+
+    validar_respuestas(db, survey_id, answers)
+    nuevos_votos = insertar_votos(db, survey_id, usuario.id, answers)
+    sumar_votos(db, nuevos_votos)
+    nuevo_participante = registrar_participacion(db, survey_id, usuario.id)
+
+    balance = None
+    presupuesto_restante = survey.presupuesto_total
+    # Solo ejecutar si la encuesta está activa y no está pausada.
+    # La recompensa se paga (y cobra) una vez por participante, no por pregunta.
+    if survey.patrocinada:
+        presupuesto_restante = survey.remaining_budget
+        if nuevo_participante and survey.active and survey.closed_reason != "paused":
+            presupuesto_restante = cobrar_presupuesto(db, survey)
+            balance = pagar_recompensa(db, survey, usuario)
+
+    # 👇 Racha, puntos y logros van al outbox; se responde con la proyección
+    perfil = encolar_voto(db, usuario.id, survey)
+
+    if balance is None:
+        balance = db.query(models.Wallet.balance).filter(models.Wallet.usuario_id == usuario.id).scalar()
+
+    return {
+        "message": "Votos y participación registrados correctamente",
+        "survey_id": survey.id,
+        "presupuesto_restante": presupuesto_restante,
+        "usuario_puntos": perfil.puntos if perfil else 0,
+        "usuario_balance": balance,
+        "usuario_nivel": perfil.nivel if perfil else 0,
+        "usuario_racha": perfil.racha_dias if perfil else 0
+    }